@@ -1,52 +1,220 @@
 # Format Python code here
+import time
+
+BOOT_STARTED = time.perf_counter()  # origin of the startup profile
+
 import asyncio
-import io
+import bisect
+import calendar
+import copy
+import functools
+import gzip
+import heapq
+import importlib
+import itertools
 import json
 import os
-import platform
 import random
 import re
-import time
+import sqlite3
+import sys
 import traceback
-from datetime import UTC, datetime, timedelta, timezone
-from difflib import get_close_matches
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import UTC, datetime, timezone
 
 import aiohttp
 import discord
-import psutil
-import requests
 from discord.ext import commands, tasks
 from discord.ui import Button, Select, View
 from dotenv import load_dotenv
-from PIL import Image, ImageDraw, ImageFont
 
-WARN_FILE = "warns.json"
+MODERATION_DB = "moderation.db"
 RR_FILE = "reaction_roles.json"
 # ------------------ Load Token ------------------
 load_dotenv()
 TOKEN = os.getenv("DISCORD_TOKEN")
+DEFAULT_PREFIX = os.getenv("PREFIX", "!")
 
 # ------------------ Bot Config ------------------
 
-intents = discord.Intents.all()
-bot = commands.Bot(command_prefix="!", intents=intents)
+
+class StartupTimeline:
+    """Startup profile: when each phase was reached and what it cost.
+
+    Phases are printed as they are reached with the time since boot and since
+    the previous phase. Modules loaded through `lazy_import` are timed too.
+    """
+
+    def __init__(self, started: float):
+        self.t0 = started
+        self.marks = {}
+        self.lazy = {}  # module name -> seconds spent importing it
+
+    def mark(self, phase: str):
+        if phase in self.marks:
+            return  # reconnects fire the same events again
+        previous = max(self.marks.values(), default=0.0)
+        self.marks[phase] = time.perf_counter() - self.t0
+        print(
+            f"⏱️ Startup: {phase} after {self.marks[phase]:.2f}s "
+            f"(+{self.marks[phase] - previous:.2f}s)"
+        )
+
+
+startup = StartupTimeline(BOOT_STARTED)
+startup.mark("imports")
+
+
+def lazy_import(name: str):
+    """Import `name` the first time a feature needs it, timing the import.
+
+    Heavy optional modules (system stats, platform details, fuzzy matching)
+    stay out of the cold start until their command or event first fires.
+    """
+    module = sys.modules.get(name)
+    if module is None:
+        started = time.perf_counter()
+        module = importlib.import_module(name)
+        startup.lazy[name] = time.perf_counter() - started
+        print(f"⏱️ Loaded {name} on first use in {startup.lazy[name] * 1000:.0f}ms")
+    return module
+
+
+class EnforcerBot(commands.Bot):
+    """commands.Bot that counts changes to its command registry."""
+
+    registry_version = 0
+
+    def add_command(self, command):
+        super().add_command(command)
+        self.registry_version += 1
+
+    def remove_command(self, name):
+        command = super().remove_command(name)
+        self.registry_version += 1
+        return command
+
+    async def setup_hook(self):
+        """Runs after login, before the gateway connects.
+
+        Everything that doesn't need the guild cache starts here, so commands
+        are served as soon as the gateway is ready. Member lists are chunked
+        later by `chunk_queue`.
+        """
+        startup.mark("logged in")
+        # Panels decode their state from custom_id, so these survive restarts.
+        self.add_dynamic_items(HelpPageButton, HelpSectionSelect, RoleMenuButton)
+        if not autosave_data.is_running():
+            autosave_data.start()
+        if METRICS_PORT:
+            await metrics.start(METRICS_HOST, METRICS_PORT)
+
+    async def close(self):
+        """Write out pending journal changes and stop the metrics endpoint."""
+        try:
+            await journal.flush(compact=True)
+        except Exception as e:
+            print(f"⚠️ Could not flush data on shutdown: {e}")
+        await metrics.stop()
+        await super().close()
+
+
+def require_permissions(**perms):
+    """`commands.has_permissions` that also records the names for the help pages."""
+    check = commands.has_permissions(**perms)
+
+    def decorator(func):
+        callback = func.callback if isinstance(func, commands.Command) else func
+        callback.required_permissions = [p for p, v in perms.items() if v]
+        return check(func)
+
+    return decorator
+
+
+def resolve_prefix(bot, message):
+    """Prefix for a message: the guild's own (held in memory) or a mention."""
+    return commands.when_mentioned_or(guild_config.prefix(message.guild))(bot, message)
+
+
+# Gateway profile. "full" requests every intent and caches every member;
+# "lean" only requests what the enabled features need. Without the "logging"
+# feature it keeps no member cache and fetches members on demand through
+# `member_fetcher`. discord.py only dispatches on_member_update for cached
+# members, so "logging" (role-removal logs/DMs, nickname updates of the member
+# name index) keeps a `joined` member cache even in lean mode. Lean guilds are
+# never chunked, so that cache only holds members who joined or changed since
+# startup (discord.py caches a member on their first update without
+# dispatching it); it stays small, and a member's first change is not logged.
+BOT_PROFILE = os.getenv("SX2_PROFILE", "full").strip().lower()
+FEATURE_INTENTS = {
+    "commands": ("guilds", "guild_messages", "dm_messages", "message_content"),
+    "moderation": ("members", "moderation"),
+    "welcome": ("members",),
+    "logging": ("members",),  # also needs the member cache, see above
+    "reaction_roles": ("guild_reactions",),
+    "presence": ("presences",),  # only the status line of !userinfo
+}
+DEFAULT_FEATURES = "commands,moderation,welcome,reaction_roles"
+BOT_FEATURES = [
+    f.strip().lower()
+    for f in (os.getenv("SX2_FEATURES") or DEFAULT_FEATURES).split(",")
+    if f.strip()
+]
+
+
+def build_intents(features) -> discord.Intents:
+    """The smallest intent set that covers `features`."""
+    intents = discord.Intents.none()
+    intents.guilds = True
+    for feature in features:
+        if feature not in FEATURE_INTENTS:
+            print(f"⚠️ Unknown feature '{feature}' in SX2_FEATURES, ignoring it.")
+            continue
+        for flag in FEATURE_INTENTS[feature]:
+            setattr(intents, flag, True)
+    return intents
+
+
+if BOT_PROFILE == "lean":
+    intents = build_intents(BOT_FEATURES)
+    if "logging" in BOT_FEATURES:
+        member_cache_flags = discord.MemberCacheFlags(voice=False, joined=True)
+        print(
+            "ℹ️ Lean profile with 'logging': members are cached as they join or "
+            "change, so each member's first role/nickname change is not logged."
+        )
+    else:
+        member_cache_flags = discord.MemberCacheFlags.none()
+        print(
+            "ℹ️ Lean profile without 'logging': no member cache, so role-removal "
+            "logs/DMs and member update tracking are off."
+        )
+else:
+    intents = discord.Intents.all()
+    member_cache_flags = discord.MemberCacheFlags.from_intents(intents)
+
+# REST calls are counted through this trace (see the Metrics section).
+http_trace = aiohttp.TraceConfig()
+
+bot = EnforcerBot(
+    command_prefix=resolve_prefix,
+    intents=intents,
+    member_cache_flags=member_cache_flags,
+    chunk_guilds_at_startup=False,  # chunk_queue fills member lists after ready
+    http_trace=http_trace,
+)
 bot.remove_command("help")  # Optional if you have a custom help command
 
 
 BOT_NAME = "SX2 Enforcer"
 
 # ------------------ Events ------------------
-@bot.event
-async def on_ready():
-    print(f"✅ {BOT_NAME} is online as {bot.user}!")
-    await bot.change_presence(activity=discord.Game(name="!help for commands"))
-
-
 # Welcome new members
 @bot.event
 async def on_member_join(member):
     # Find the welcome channel
-    channel = discord.utils.get(member.guild.text_channels, name="👋⤬welcome")
+    channel = guild_config.welcome_channel(member.guild)
     if not channel:
         return
 
@@ -89,58 +257,1486 @@ async def on_member_join(member):
 
 
 # ------------------ Data Persistence ------------------
-# load warns
-try:
-    if os.path.exists(WARN_FILE):
-        with open(WARN_FILE, "r") as f:
-            warns = json.load(f)
-            # if keys are strings, convert to int keys for convenience (optional)
-            warns = {int(k): int(v) for k, v in warns.items()}
-    else:
-        warns = {}
-except Exception:
-    warns = {}
-
-# load reaction_roles (message_id -> {emoji: role_id})
-try:
-    if os.path.exists(RR_FILE):
-        with open(RR_FILE, "r") as f:
-            reaction_roles = json.load(f)
-            # convert keys to ints where appropriate
-            reaction_roles = {
-                int(k): {ek: int(ev) for ek, ev in v.items()}
-                for k, v in reaction_roles.items()
-            }
+# Mutations are written to an append-only journal instead of rewriting the
+# whole JSON files. The journal is folded back into the snapshot files once it
+# has grown past JOURNAL_COMPACT_EVERY records.
+JOURNAL_FILE = "data.journal"
+JOURNAL_COMPACT_EVERY = 500
+
+
+def _apply_journal_record(data: dict, record: dict):
+    """Replay one `set`/`del` record onto a nested dict of string keys."""
+    *parents, last = record["k"]
+    node = data
+    for key in parents:
+        if record["op"] == "set":
+            node = node.setdefault(key, {})
+        else:
+            node = node.get(key)
+            if not isinstance(node, dict):
+                return
+    if record["op"] == "set":
+        node[last] = record["v"]
     else:
-        reaction_roles = {}
-except Exception:
-    reaction_roles = {}
+        node.pop(last, None)
+
+
+class WriteBehindJournal:
+    """Append-only change log backing the JSON data files.
+
+    `record()` only queues a small change record in memory. `flush()` appends the
+    queued records to the journal off the event loop and, every
+    `compact_every` records, writes fresh snapshots and truncates the journal.
+    Records hold absolute values, so replaying one twice is harmless. A
+    compaction appends its batch before writing any snapshot, so a crash
+    between snapshots replays the full history onto each and never reverts
+    a key.
+    """
+
+    def __init__(self, path: str, compact_every: int = JOURNAL_COMPACT_EVERY):
+        self.path = path
+        self.compact_every = compact_every
+        self.stores = {}  # name -> (snapshot path, callable returning JSON-ready data)
+        self.pending = []
+        self.journal_records = 0
+        self._replay = None
+        self._lock = asyncio.Lock()
+
+    def _read_journal(self):
+        if self._replay is None:
+            self._replay = []
+            if os.path.exists(self.path):
+                with open(self.path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            self._replay.append(json.loads(line))
+                        except ValueError:
+                            break  # torn write at the tail, ignore the rest
+            self.journal_records = len(self._replay)
+        return self._replay
+
+    def load(self, name: str, snapshot_path: str) -> dict:
+        """Return the snapshot of `name` with journalled changes replayed on top."""
+        data = {}
+        try:
+            if os.path.exists(snapshot_path):
+                with open(snapshot_path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+        except Exception as e:
+            print(f"⚠️ Could not read {snapshot_path}: {e}")
+        for record in self._read_journal():
+            if record.get("s") == name:
+                _apply_journal_record(data, record)
+        return data
+
+    def register(self, name: str, snapshot_path: str, source):
+        """Register a store so compaction can snapshot it."""
+        self.stores[name] = (snapshot_path, source)
+
+    def record(self, store: str, op: str, path, value=None):
+        """Queue a `set` or `del` of the (nested) key `path` in `store`."""
+        record = {"s": store, "op": op, "k": [str(p) for p in path]}
+        if op == "set":
+            record["v"] = value
+        self.pending.append(record)
+
+    @property
+    def dirty(self) -> bool:
+        return bool(self.pending)
+
+    def _append(self, batch):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in batch))
+
+    def _compact(self, batch, snapshots):
+        if batch:
+            self._append(batch)
+        for snapshot_path, payload in snapshots.items():
+            tmp = snapshot_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(payload)
+            os.replace(tmp, snapshot_path)
+        with open(self.path, "w", encoding="utf-8"):
+            pass
+
+    async def flush(self, compact: bool = False):
+        """Write queued records (or a full compaction) without blocking the loop."""
+        async with self._lock:
+            if not self.pending and not compact:
+                return
+            batch, self.pending = self.pending, []
+            try:
+                if compact or self.journal_records + len(batch) >= self.compact_every:
+                    # Serialise on the loop so the snapshot is consistent; only
+                    # the file I/O is handed to the worker thread.
+                    snapshots = {
+                        path: json.dumps(source(), ensure_ascii=False)
+                        for path, source in self.stores.values()
+                    }
+                    await asyncio.to_thread(self._compact, batch, snapshots)
+                    self.journal_records = 0
+                else:
+                    await asyncio.to_thread(self._append, batch)
+                    self.journal_records += len(batch)
+            except Exception:
+                self.pending[:0] = batch  # retry on the next flush
+                raise
+
+
+journal = WriteBehindJournal(JOURNAL_FILE)
 
-# autosave task
-@tasks.loop(seconds=60.0)
+
+# autosave task: cheap no-op unless something changed since the last run
+@tasks.loop(seconds=5.0)
 async def autosave_data():
     try:
-        with open(WARN_FILE, "w") as f:
-            json.dump({str(k): v for k, v in warns.items()}, f, indent=2)
-        with open(RR_FILE, "w") as f:
-            json.dump(
-                {
-                    str(k): {ek: ev for ek, ev in v.items()}
-                    for k, v in reaction_roles.items()
-                },
-                f,
-                indent=2,
-            )
+        await journal.flush()
     except Exception as e:
         print("Autosave error:", e)
 
 
+# ------------------ Outbound DMs ------------------
+DM_WORKERS = 4
+DM_QUEUE_SIZE = 1000
+DM_CLOSED_TTL = 3600  # seconds to remember users whose DMs are closed
+DM_PRIORITY_MODERATION = 0
+DM_PRIORITY_ROLES = 1
+
+
+class DMDispatcher:
+    """Central DM queue drained by a bounded pool of worker tasks.
+
+    Commands enqueue DMs instead of awaiting them, so a slow or rate-limited
+    DM never holds up the moderation action that triggered it. Moderation
+    notices are served before role-change courtesy DMs; when the queue is full
+    courtesy DMs are dropped and moderation notices wait for room. Users whose
+    DMs are closed are skipped for `closed_ttl` seconds.
+    """
+
+    def __init__(
+        self, workers=DM_WORKERS, maxsize=DM_QUEUE_SIZE, closed_ttl=DM_CLOSED_TTL
+    ):
+        self.workers = workers
+        self.maxsize = maxsize
+        self.closed_ttl = closed_ttl
+        self.closed = {}  # user_id -> monotonic expiry
+        self.queue = None  # created on first use, inside the running loop
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        self._seq = itertools.count()
+        self._tasks = []
+
+    def start(self):
+        if self._tasks:
+            return
+        self.queue = asyncio.PriorityQueue(self.maxsize)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    def dms_closed(self, user_id: int) -> bool:
+        expiry = self.closed.get(user_id)
+        if expiry is None:
+            return False
+        if expiry <= time.monotonic():
+            del self.closed[user_id]
+            return False
+        return True
+
+    def _mark_closed(self, user_id: int):
+        now = time.monotonic()
+        if len(self.closed) >= 10_000:
+            self.closed = {u: t for u, t in self.closed.items() if t > now}
+        self.closed[user_id] = now + self.closed_ttl
+
+    async def post(
+        self, user, content=None, *, priority=DM_PRIORITY_MODERATION, **kwargs
+    ):
+        """Queue a DM without waiting for delivery.
+
+        `on_forbidden` (a coroutine function) runs if the user's DMs are closed,
+        including when that is already known and the DM is skipped.
+        Returns False if the DM was skipped or dropped.
+        """
+        return await self._enqueue(user, content, priority, None, **kwargs)
+
+    async def deliver(self, user, content=None, *, timeout: float = 5.0, **kwargs):
+        """Queue a DM at moderation priority and wait (bounded) for the result.
+
+        Used before kick/ban, where the DM must go out while the member still
+        shares a guild with the bot. On timeout the DM is abandoned: it is
+        skipped if still queued, and a late Forbidden (the member is already
+        gone) doesn't mark their DMs closed.
+        """
+        future = asyncio.get_running_loop().create_future()
+        if not await self._enqueue(
+            user, content, DM_PRIORITY_MODERATION, future, **kwargs
+        ):
+            return False
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            future.cancel()
+            return False
+
+    async def _enqueue(
+        self, user, content, priority, future, on_forbidden=None, **kwargs
+    ):
+        self.start()
+        if self.dms_closed(user.id):
+            if on_forbidden:
+                await on_forbidden()
+            return False
+        job = (priority, next(self._seq), (user, content, kwargs, on_forbidden, future))
+        if priority > DM_PRIORITY_MODERATION:
+            try:
+                self.queue.put_nowait(job)
+            except asyncio.QueueFull:
+                self.dropped += 1
+                return False
+        else:
+            await self.queue.put(job)
+        return True
+
+    async def _worker(self):
+        while True:
+            _, _, (user, content, kwargs, on_forbidden, future) = await self.queue.get()
+            ok = False
+            try:
+                if future is None or not future.cancelled():
+                    ok = await self._send(user, content, kwargs, on_forbidden, future)
+            except Exception as e:
+                print(f"⚠️ DM worker error: {e}")
+            finally:
+                self.queue.task_done()
+                if future and not future.done():
+                    future.set_result(ok)
+
+    async def _send(self, user, content, kwargs, on_forbidden, future=None):
+        if self.dms_closed(user.id):
+            if on_forbidden:
+                await on_forbidden()
+            return False
+        try:
+            await user.send(content, **kwargs)
+        except discord.Forbidden:
+            if future is None or not future.cancelled():
+                self._mark_closed(user.id)
+            self.failed += 1
+            if on_forbidden:
+                await on_forbidden()
+            return False
+        except discord.HTTPException as e:
+            self.failed += 1
+            print(f"⚠️ Could not DM {user}: {e}")
+            return False
+        self.sent += 1
+        return True
+
+
+dm_dispatcher = DMDispatcher()
+
+
+# ------------------ Log Channel Sink ------------------
+LOG_FLUSH_INTERVAL = 2.0  # seconds a log item may wait for company
+LOG_MAX_EMBEDS = 10  # Discord's per-message embed limit
+LOG_PROGRESS_LIMIT = 1900  # characters before a new progress message is started
+LOG_PROGRESS_IDLE = 60.0  # seconds of quiet before lines start a new message
+
+
+class _LogBuffer:
+    __slots__ = (
+        "channel",
+        "items",
+        "embeds",
+        "oldest",
+        "wake",
+        "task",
+        "progress",
+        "progress_text",
+        "progress_at",
+    )
+
+    def __init__(self, channel):
+        self.channel = channel
+        self.items = []  # embeds and plain-text lines, in arrival order
+        self.embeds = 0  # embeds in `items`
+        self.oldest = None  # monotonic time of the oldest unflushed item
+        self.wake = asyncio.Event()
+        self.task = None
+        self.progress = None  # message that plain-text lines are folded into
+        self.progress_text = ""
+        self.progress_at = 0.0
+
+
+class ModLogSink:
+    """Buffered writer for log channels.
+
+    Items go out in arrival order: runs of embeds are packed up to ten per
+    message and runs of plain-text lines are folded into one progress message
+    that is edited as lines arrive; an embed closes the progress message so
+    later lines appear below it. A channel's
+    buffer is flushed after `interval` seconds, or straight away once it holds
+    a full message of embeds, so a raid costs a handful of requests per
+    channel instead of one per event.
+    """
+
+    def __init__(self, interval=LOG_FLUSH_INTERVAL):
+        self.interval = interval
+        self.buffers = {}  # channel_id -> _LogBuffer
+        self.flushes = 0
+        self.last_flush_latency = 0.0  # seconds from enqueue to delivery
+        self.avg_flush_latency = 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(len(b.items) for b in self.buffers.values())
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self.queue_depth,
+            "channels": len(self.buffers),
+            "flushes": self.flushes,
+            "last_flush_latency": self.last_flush_latency,
+            "avg_flush_latency": self.avg_flush_latency,
+        }
+
+    def _buffer(self, channel):
+        buf = self.buffers.get(channel.id)
+        if buf is None:
+            buf = self.buffers[channel.id] = _LogBuffer(channel)
+        buf.channel = channel
+        if buf.oldest is None:
+            buf.oldest = time.monotonic()
+        if buf.task is None or buf.task.done():
+            buf.task = asyncio.create_task(self._run(buf))
+        return buf
+
+    def post_embed(self, channel, embed: discord.Embed):
+        """Queue an embed for `channel` (no-op if channel is None)."""
+        if channel is None:
+            return
+        buf = self._buffer(channel)
+        buf.items.append(embed)
+        buf.embeds += 1
+        if buf.embeds >= LOG_MAX_EMBEDS:
+            buf.wake.set()
+
+    def post_line(self, channel, text: str):
+        """Queue a plain-text line for `channel`'s progress message."""
+        if channel is None:
+            return
+        self._buffer(channel).items.append(text)
+
+    async def _run(self, buf: _LogBuffer):
+        while buf.items:
+            try:
+                await asyncio.wait_for(buf.wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            buf.wake.clear()
+            try:
+                await self._flush(buf)
+            except discord.HTTPException as e:
+                print(f"⚠️ Could not write to log channel {buf.channel}: {e}")
+            if buf.items:
+                buf.oldest = time.monotonic()
+            else:
+                buf.oldest = None
+
+    async def _flush(self, buf: _LogBuffer):
+        started = buf.oldest or time.monotonic()
+        items, buf.items, buf.embeds = buf.items, [], 0
+        i = 0
+        while i < len(items):
+            is_embed = isinstance(items[i], discord.Embed)
+            j = i + 1
+            while (
+                j < len(items)
+                and isinstance(items[j], discord.Embed) == is_embed
+                and not (is_embed and j - i >= LOG_MAX_EMBEDS)
+            ):
+                j += 1
+            try:
+                if is_embed:
+                    await buf.channel.send(embeds=items[i:j])
+                    buf.progress = None  # later lines go below these embeds
+                    buf.progress_text = ""
+                else:
+                    await self._fold_lines(buf, items[i:j])
+            except discord.HTTPException:
+                # drop the failed run, keep the rest for the next flush
+                rest = items[j:]
+                buf.items[:0] = rest
+                buf.embeds += sum(isinstance(x, discord.Embed) for x in rest)
+                raise
+            i = j
+        latency = time.monotonic() - started
+        self.flushes += 1
+        self.last_flush_latency = latency
+        self.avg_flush_latency += (latency - self.avg_flush_latency) / min(
+            self.flushes, 20
+        )
+
+    async def _fold_lines(self, buf: _LogBuffer, lines):
+        now = time.monotonic()
+        if now - buf.progress_at > LOG_PROGRESS_IDLE:
+            buf.progress = None
+            buf.progress_text = ""
+        buf.progress_at = now
+        text = buf.progress_text
+        for line in lines:
+            line = line[:LOG_PROGRESS_LIMIT]
+            if text and len(text) + 1 + len(line) > LOG_PROGRESS_LIMIT:
+                await self._write_progress(buf, text)
+                buf.progress = None  # current message is full, start another
+                text = line
+            else:
+                text = f"{text}\n{line}" if text else line
+        await self._write_progress(buf, text)
+
+    async def _write_progress(self, buf: _LogBuffer, text: str):
+        if buf.progress is None:
+            buf.progress = await buf.channel.send(text)
+        elif text != buf.progress_text:
+            await buf.progress.edit(content=text)
+        buf.progress_text = text
+
+
+log_sink = ModLogSink()
+
+
+# ------------------ Guild Configuration ------------------
+GUILD_CONFIG_FILE = "guild_config.json"
+DEFAULT_LOG_CHANNEL = "mod-log"
+DEFAULT_WELCOME_CHANNEL = "👋⤬welcome"
+DEFAULT_MUTE_ROLE = "Muted"
+
+
+class GuildConfigStore:
+    """Per-guild settings: log/welcome channel, mute role and prefix.
+
+    The settings file is loaded at startup and changes go through the
+    write-behind journal. Resolved channel and role objects are cached per
+    guild (misses included) and dropped by the channel/role events below, so
+    hot paths never scan `guild.text_channels` or `guild.roles`.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        # guild_id (str) -> {key: value}. Loaded and registered up front: a
+        # journal compaction before first use would otherwise drop this
+        # store's records without a snapshot.
+        self._config = journal.load("guild_config", path)
+        journal.register("guild_config", path, lambda: self._config)
+        self._resolved = {}  # (guild_id, key) -> channel/role object or None
+
+    def get(self, guild_id: int, key: str, default=None):
+        return self._config.get(str(guild_id), {}).get(key, default)
+
+    def set(self, guild_id: int, key: str, value):
+        """Store `value` for `key`; None removes the setting."""
+        gid = str(guild_id)
+        settings = self._config.setdefault(gid, {})
+        if value is None:
+            settings.pop(key, None)
+            journal.record("guild_config", "del", [gid, key])
+        else:
+            settings[key] = value
+            journal.record("guild_config", "set", [gid, key], value)
+        self._resolved.pop((guild_id, key), None)
+
+    def prefix(self, guild) -> str:
+        """Command prefix of `guild` (None for DMs); a dict lookup, no disk access."""
+        if guild is None:
+            return DEFAULT_PREFIX
+        return self.get(guild.id, "prefix", DEFAULT_PREFIX)
+
+    def invalidate(self, guild_id: int):
+        """Forget every cached object of a guild."""
+        for key in ("log_channel_id", "welcome_channel_id", "mute_role_id"):
+            self._resolved.pop((guild_id, key), None)
+
+    def _resolve(self, guild, key, by_id, default_name, candidates):
+        cache_key = (guild.id, key)
+        try:
+            return self._resolved[cache_key]
+        except KeyError:
+            pass
+        obj_id = self.get(guild.id, key)
+        if obj_id:
+            obj = by_id(obj_id)
+        else:
+            obj = discord.utils.get(candidates, name=default_name)
+        self._resolved[cache_key] = obj
+        return obj
+
+    def log_channel(self, guild: discord.Guild):
+        return self._resolve(
+            guild,
+            "log_channel_id",
+            guild.get_channel,
+            DEFAULT_LOG_CHANNEL,
+            guild.text_channels,
+        )
+
+    def welcome_channel(self, guild: discord.Guild):
+        return self._resolve(
+            guild,
+            "welcome_channel_id",
+            guild.get_channel,
+            DEFAULT_WELCOME_CHANNEL,
+            guild.text_channels,
+        )
+
+    def mute_role(self, guild: discord.Guild):
+        return self._resolve(
+            guild, "mute_role_id", guild.get_role, DEFAULT_MUTE_ROLE, guild.roles
+        )
+
+
+guild_config = GuildConfigStore(GUILD_CONFIG_FILE)
+
+
+@bot.listen("on_guild_channel_create")
+@bot.listen("on_guild_channel_delete")
+async def _config_channel_changed(channel):
+    guild_config.invalidate(channel.guild.id)
+
+
+@bot.listen("on_guild_channel_update")
+async def _config_channel_updated(before, after):
+    if before.name != after.name:
+        guild_config.invalidate(after.guild.id)
+
+
+@bot.listen("on_guild_role_create")
+@bot.listen("on_guild_role_delete")
+async def _config_role_changed(role):
+    guild_config.invalidate(role.guild.id)
+
+
+@bot.listen("on_guild_role_update")
+async def _config_role_updated(before, after):
+    if before.name != after.name:
+        guild_config.invalidate(after.guild.id)
+
+
+# ------------------ Name Indexes ------------------
+class GuildNameIndex:
+    """Per-guild casefolded name -> roles/channels index.
+
+    Built on first use from the guild cache and kept current by the
+    role/channel events below, so name lookups are one dict probe instead of a
+    scan over `guild.roles` or `guild.channels`. An exact-case match wins over
+    other objects with the same folded name; misses can ask for near matches.
+    """
+
+    def __init__(self):
+        self._guilds = {}  # guild_id -> {"roles"|"channels": {folded name: [obj]}}
+
+    @staticmethod
+    def _bucket(obj) -> str:
+        return "roles" if isinstance(obj, discord.Role) else "channels"
+
+    def _index(self, guild: discord.Guild) -> dict:
+        index = self._guilds.get(guild.id)
+        if index is None:
+            index = self._guilds[guild.id] = {"roles": {}, "channels": {}}
+            for obj in itertools.chain(guild.roles, guild.channels):
+                self._insert(index, obj)
+        return index
+
+    def _insert(self, index, obj):
+        entries = index[self._bucket(obj)].setdefault(obj.name.casefold(), [])
+        if all(e.id != obj.id for e in entries):
+            entries.append(obj)
+
+    def _lookup(self, guild, bucket, name, kind=None, exact=False):
+        entries = self._index(guild)[bucket].get(name.strip().casefold(), ())
+        if kind is not None:
+            entries = [e for e in entries if isinstance(e, kind)]
+        for obj in entries:
+            if obj.name == name.strip():
+                return obj
+        return None if exact or not entries else entries[0]
+
+    def role(self, guild: discord.Guild, name: str, exact: bool = False):
+        return self._lookup(guild, "roles", name, exact=exact)
+
+    def channel(self, guild: discord.Guild, name: str, kind=None, exact=False):
+        """Find a channel by name; `kind` narrows it to a channel class."""
+        return self._lookup(guild, "channels", name, kind, exact)
+
+    def unique(self, guild: discord.Guild, bucket: str, name: str):
+        """Return (obj, candidates) for commands that must not guess.
+
+        A numeric `name` is taken as an ID. Otherwise exact-case matches are
+        preferred over case-insensitive ones; if more than one object is left,
+        obj is None and `candidates` lists them.
+        """
+        name = name.strip()
+        if name.isdigit():
+            getter = guild.get_role if bucket == "roles" else guild.get_channel
+            obj = getter(int(name))
+            if obj:
+                return obj, []
+        entries = self._index(guild)[bucket].get(name.casefold(), ())
+        candidates = [e for e in entries if e.name == name] or list(entries)
+        if len(candidates) == 1:
+            return candidates[0], []
+        return None, candidates
+
+    def suggest(self, guild: discord.Guild, bucket: str, name: str, n: int = 3):
+        """Names in `bucket` ("roles"/"channels") that are close to `name`."""
+        index = self._index(guild)[bucket]
+        matches = lazy_import("difflib").get_close_matches(
+            name.strip().casefold(), index.keys(), n, 0.6
+        )
+        return [index[m][0].name for m in matches]
+
+    def not_found(self, guild: discord.Guild, bucket: str, label: str, name: str):
+        """The "not found" reply, with near matches when there are any."""
+        text = f"❌ {label} **{name}** not found."
+        suggestions = self.suggest(guild, bucket, name)
+        if suggestions:
+            text += " Did you mean: " + ", ".join(f"`{s}`" for s in suggestions) + "?"
+        return text
+
+    def add(self, obj):
+        index = self._guilds.get(obj.guild.id)
+        if index is not None:
+            self._insert(index, obj)
+
+    def discard(self, obj, name: str = None):
+        """Remove `obj`, filed under `name` (its old name) if given."""
+        index = self._guilds.get(obj.guild.id)
+        if index is None:
+            return
+        bucket = index[self._bucket(obj)]
+        key = (name or obj.name).casefold()
+        entries = [e for e in bucket.get(key, ()) if e.id != obj.id]
+        if entries:
+            bucket[key] = entries
+        else:
+            bucket.pop(key, None)
+
+    def forget(self, guild_id: int):
+        self._guilds.pop(guild_id, None)
+
+
+name_index = GuildNameIndex()
+
+
+@bot.listen("on_guild_role_create")
+@bot.listen("on_guild_channel_create")
+async def _name_index_created(obj):
+    name_index.add(obj)
+
+
+@bot.listen("on_guild_role_delete")
+@bot.listen("on_guild_channel_delete")
+async def _name_index_deleted(obj):
+    name_index.discard(obj)
+
+
+@bot.listen("on_guild_role_update")
+@bot.listen("on_guild_channel_update")
+async def _name_index_updated(before, after):
+    if before.name != after.name:
+        name_index.discard(after, before.name)
+        name_index.add(after)
+
+
+@bot.listen("on_guild_remove")
+async def _name_index_guild_removed(guild):
+    name_index.forget(guild.id)
+
+
+class MemberNameIndex:
+    """Per-guild sorted index of member usernames, global names and nicknames.
+
+    Each guild keeps one sorted list of `(casefolded name, member_id)` pairs,
+    so exact and prefix lookups are a bisect instead of a scan over
+    `guild.members`. It is built on first use and updated from the member
+    join/update/remove and user update events.
+    """
+
+    def __init__(self):
+        # guild_id -> (sorted [(name, member_id)], {member_id: names})
+        self._guilds = {}
+
+    @staticmethod
+    def names(member) -> tuple:
+        names = {member.name.casefold()}
+        if member.global_name:
+            names.add(member.global_name.casefold())
+        if member.nick:
+            names.add(member.nick.casefold())
+        return tuple(names)
+
+    @staticmethod
+    def rank(member, query: str):
+        """Sort key of `member` for a casefolded `query`; None if no name matches.
+
+        Exact matches rank above prefix matches; then a match on the username
+        beats the global name, which beats the nickname; then shorter names.
+        """
+        best = None
+        for field, name in enumerate((member.name, member.global_name, member.nick)):
+            if not name:
+                continue
+            name = name.casefold()
+            if name.startswith(query):
+                rank = (name != query, field, len(name))
+                if best is None or rank < best:
+                    best = rank
+        return best
+
+    def _index(self, guild: discord.Guild):
+        index = self._guilds.get(guild.id)
+        if index is None:
+            keys = {m.id: self.names(m) for m in guild.members}
+            entries = sorted((n, mid) for mid, names in keys.items() for n in names)
+            index = self._guilds[guild.id] = (entries, keys)
+        return index
+
+    def add(self, member: discord.Member):
+        index = self._guilds.get(member.guild.id)
+        if index is None:
+            return
+        self.remove(member)
+        entries, keys = index
+        keys[member.id] = self.names(member)
+        for name in keys[member.id]:
+            bisect.insort(entries, (name, member.id))
+
+    def remove(self, member):
+        index = self._guilds.get(member.guild.id)
+        if index is None:
+            return
+        entries, keys = index
+        for name in keys.pop(member.id, ()):
+            i = bisect.bisect_left(entries, (name, member.id))
+            if i < len(entries) and entries[i] == (name, member.id):
+                del entries[i]
+
+    def forget(self, guild_id: int):
+        self._guilds.pop(guild_id, None)
+
+    def search(self, guild: discord.Guild, query: str, limit: int = 10) -> list:
+        """Members whose names equal or start with `query`, best match first.
+
+        Results are ordered by `rank`. All exact matches are considered, but
+        the walk stops once `limit` members have been found, so a short
+        prefix costs O(log n + limit) and prefix matches are taken in name
+        order rather than from every member they match.
+        """
+        entries, _ = self._index(guild)
+        query = query.casefold()
+        ranked = {}
+        i = bisect.bisect_left(entries, (query,))
+        while i < len(entries) and entries[i][0].startswith(query):
+            name, member_id = entries[i]
+            if name != query and len(ranked) >= limit:
+                break
+            i += 1
+            member = guild.get_member(member_id)
+            if member is None or member_id in ranked:
+                continue
+            rank = self.rank(member, query)
+            if rank is not None:  # None: entry is stale
+                ranked[member_id] = (rank, member)
+        best = sorted(ranked.values(), key=lambda r: r[0])
+        return [member for _, member in best[:limit]]
+
+
+member_index = MemberNameIndex()
+
+
+@bot.listen("on_member_join")
+async def _member_index_joined(member):
+    member_index.add(member)
+
+
+@bot.listen("on_member_remove")
+async def _member_index_removed(member):
+    member_index.remove(member)
+
+
+@bot.listen("on_member_update")
+async def _member_index_updated(before, after):
+    if before.nick != after.nick:
+        member_index.add(after)
+
+
+@bot.listen("on_user_update")
+async def _member_index_user_updated(before, after):
+    if before.name != after.name or before.global_name != after.global_name:
+        for guild in after.mutual_guilds:
+            member = guild.get_member(after.id)
+            if member:
+                member_index.add(member)
+
+
+@bot.listen("on_guild_remove")
+async def _member_index_guild_removed(guild):
+    member_index.forget(guild.id)
+
+
+# ------------------ On-demand Member Fetching ------------------
+MEMBER_LRU_SIZE = int(os.getenv("SX2_MEMBER_LRU", "2000"))
+MEMBER_LRU_TTL = 300  # seconds before a fetched member is fetched again
+
+
+class MemberFetcher:
+    """Member lookups that keep working with a trimmed member cache.
+
+    The gateway cache is checked first, then a small LRU of recently fetched
+    members, and only then the API. Concurrent fetches of the same member
+    share one request. Entries expire after `MEMBER_LRU_TTL` because
+    discord.py sends no update events for members it doesn't cache.
+    """
+
+    def __init__(self, size: int = MEMBER_LRU_SIZE):
+        self.size = size
+        self.cache = OrderedDict()  # (guild_id, user_id) -> (fetched_at, member)
+        self.inflight = {}
+        self.hits = 0
+        self.fetches = 0
+
+    def put(self, member: discord.Member):
+        key = (member.guild.id, member.id)
+        self.cache[key] = (time.monotonic(), member)
+        self.cache.move_to_end(key)
+        while len(self.cache) > self.size:
+            self.cache.popitem(last=False)
+
+    def get(self, guild: discord.Guild, user_id: int):
+        """A cached member or None; never touches the API."""
+        member = guild.get_member(user_id)
+        if member is not None:
+            return member
+        key = (guild.id, user_id)
+        entry = self.cache.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry[0] > MEMBER_LRU_TTL:
+            del self.cache[key]
+            return None
+        self.cache.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    async def fetch(self, guild: discord.Guild, user_id: int, fresh: bool = False):
+        """The member, fetched if needed; None if they are not in the guild.
+
+        `fresh` skips the LRU for callers that write back the member's roles.
+        """
+        member = guild.get_member(user_id) if fresh else self.get(guild, user_id)
+        if member is not None:
+            return member
+
+        key = (guild.id, user_id)
+        future = self.inflight.get(key)
+        if future is None:
+            future = self.inflight[key] = asyncio.ensure_future(
+                self._fetch(guild, user_id)
+            )
+            future.add_done_callback(lambda _: self.inflight.pop(key, None))
+        return await asyncio.shield(future)
+
+    async def _fetch(self, guild, user_id):
+        self.fetches += 1
+        try:
+            member = await guild.fetch_member(user_id)
+        except discord.NotFound:
+            self.cache.pop((guild.id, user_id), None)
+            return None
+        self.put(member)
+        return member
+
+    def forget(self, guild_id: int, user_id: int = None):
+        if user_id is not None:
+            self.cache.pop((guild_id, user_id), None)
+            return
+        for key in [k for k in self.cache if k[0] == guild_id]:
+            del self.cache[key]
+
+    def guild_entries(self, guild_id: int) -> int:
+        return sum(1 for k in self.cache if k[0] == guild_id)
+
+
+member_fetcher = MemberFetcher()
+
+
+@bot.listen("on_raw_member_remove")
+async def _member_fetcher_removed(payload):
+    member_fetcher.forget(payload.guild_id, payload.user.id)
+
+
+@bot.listen("on_member_update")
+async def _member_fetcher_updated(before, after):
+    if (after.guild.id, after.id) in member_fetcher.cache:
+        member_fetcher.put(after)
+
+
+@bot.listen("on_guild_remove")
+async def _member_fetcher_guild_removed(guild):
+    member_fetcher.forget(guild.id)
+
+
+class MemberAmbiguous(commands.BadArgument):
+    """A member name had no single exact match; `candidates` are ranked."""
+
+    def __init__(self, argument: str, candidates):
+        self.argument = argument
+        self.candidates = candidates
+        listed = "\n".join(f"• {m} ({m.display_name}) — `{m.id}`" for m in candidates)
+        if len(candidates) == 1:
+            header = f'No member is named exactly "{argument}". Did you mean:'
+        else:
+            header = f'Several members match "{argument}":'
+        super().__init__(f"{header}\n{listed}\nUse the full name, a mention or ID.")
+
+
+class IndexedMember(commands.Converter):
+    """Member converter backed by `member_index`.
+
+    Mentions and IDs resolve from the cache (or one fetch); names resolve
+    through the sorted index, plus a gateway member query while the guild is
+    not chunked. Only exact matches are accepted: a unique username match
+    wins, then a single exact match of any name (case-insensitive). Anything
+    else, including a lone prefix match, is reported as ranked candidates.
+    """
+
+    limit = 5  # candidates listed (and queried) per lookup
+
+    async def candidates(self, guild: discord.Guild, query: str, limit: int) -> list:
+        """Ranked name matches, plus a gateway query while the guild is unchunked."""
+        found = member_index.search(guild, query, limit=limit)
+        if guild.chunked:
+            return found
+        try:
+            queried = await guild.query_members(query, limit=limit, cache=False)
+        except (asyncio.TimeoutError, discord.ClientException):
+            queried = []
+        members = {m.id: m for m in found}
+        for member in queried:
+            member_fetcher.put(member)
+            members.setdefault(member.id, member)
+        folded = query.casefold()
+        ranked = [(member_index.rank(m, folded), m) for m in members.values()]
+        ranked = sorted((r for r in ranked if r[0] is not None), key=lambda r: r[0])
+        return [member for _, member in ranked[:limit]]
+
+    async def convert(self, ctx, argument: str) -> discord.Member:
+        guild = ctx.guild
+        match = re.fullmatch(r"<@!?(\d{15,20})>|(\d{15,20})", argument)
+        if match:
+            member_id = int(match.group(1) or match.group(2))
+            try:
+                member = await member_fetcher.fetch(guild, member_id)
+            except discord.HTTPException:
+                member = None
+            if member is None:
+                raise commands.MemberNotFound(argument)
+            return member
+
+        name, _, discriminator = argument.rpartition("#")
+        if name and len(discriminator) == 4 and discriminator.isdigit():
+            for member in await self.candidates(guild, name, limit=25):
+                if member.discriminator == discriminator:
+                    return member
+
+        candidates = await self.candidates(guild, argument, limit=self.limit)
+        folded = argument.casefold()
+        exact = [m for m in candidates if folded in member_index.names(m)]
+        usernames = [m for m in exact if m.name.casefold() == folded]
+        if len(usernames) == 1:
+            return usernames[0]
+        if len(exact) == 1:
+            return exact[0]
+        if candidates:
+            raise MemberAmbiguous(argument, exact or candidates)
+        raise commands.MemberNotFound(argument)
+
+
+@bot.group(
+    name="config",
+    invoke_without_command=True,
+    extras={"section": "Server Setup / Utilities"},
+)
+@require_permissions(administrator=True)
+async def config_group(ctx):
+    """Show this server's log/welcome channels and mute role."""
+    guild = ctx.guild
+    log_channel = guild_config.log_channel(guild)
+    welcome_channel = guild_config.welcome_channel(guild)
+    mute_role = guild_config.mute_role(guild)
+    embed = discord.Embed(
+        title=f"⚙️ Configuration — {guild.name}", color=discord.Color.blurple()
+    )
+    embed.add_field(
+        name="Log channel",
+        value=log_channel.mention if log_channel else "Not set",
+        inline=False,
+    )
+    embed.add_field(
+        name="Welcome channel",
+        value=welcome_channel.mention if welcome_channel else "Not set",
+        inline=False,
+    )
+    embed.add_field(
+        name="Mute role",
+        value=mute_role.mention if mute_role else "Not set",
+        inline=False,
+    )
+    embed.set_footer(
+        text="Use !config log|welcome <#channel>, !config muterole <@role> or !config reset <setting>"
+    )
+    await ctx.send(embed=embed)
+
+
+@config_group.command(name="log")
+@require_permissions(administrator=True)
+async def config_log(ctx, channel: discord.TextChannel):
+    """Set the moderation log channel."""
+    guild_config.set(ctx.guild.id, "log_channel_id", channel.id)
+    await ctx.send(f"✅ Moderation logs will be posted in {channel.mention}.")
+
+
+@config_group.command(name="welcome")
+@require_permissions(administrator=True)
+async def config_welcome(ctx, channel: discord.TextChannel):
+    """Set the welcome channel."""
+    guild_config.set(ctx.guild.id, "welcome_channel_id", channel.id)
+    await ctx.send(f"✅ Welcome messages will be posted in {channel.mention}.")
+
+
+@config_group.command(name="muterole")
+@require_permissions(administrator=True)
+async def config_muterole(ctx, role: discord.Role):
+    """Set the role used by mute/tempmute/unmute."""
+    guild_config.set(ctx.guild.id, "mute_role_id", role.id)
+    await ctx.send(f"✅ Mute role set to **{role.name}**.")
+
+
+@config_group.command(name="reset")
+@require_permissions(administrator=True)
+async def config_reset(ctx, setting: str):
+    """Reset a setting back to its name-based default."""
+    keys = {
+        "log": "log_channel_id",
+        "welcome": "welcome_channel_id",
+        "muterole": "mute_role_id",
+    }
+    key = keys.get(setting.lower())
+    if not key:
+        return await ctx.send(
+            "⚠️ Setting must be one of: `log`, `welcome`, `muterole`."
+        )
+    guild_config.set(ctx.guild.id, key, None)
+    await ctx.send(f"✅ `{setting.lower()}` reset to its default.")
+
+
+MAX_PREFIX_LENGTH = 5
+
+
+@bot.group(
+    name="prefix",
+    invoke_without_command=True,
+    extras={"section": "Server Setup / Utilities"},
+)
+async def prefix_group(ctx):
+    """Show this server's command prefix."""
+    prefix = guild_config.prefix(ctx.guild)
+    await ctx.send(
+        f"🔧 My prefix here is `{prefix}` (mentioning me works too).\n"
+        f"Admins can change it with `{prefix}prefix set <prefix>`."
+    )
+
+
+@prefix_group.command(name="set")
+@commands.guild_only()
+@require_permissions(administrator=True)
+async def prefix_set(ctx, new_prefix: str):
+    """Change the command prefix for this server."""
+    if len(new_prefix) > MAX_PREFIX_LENGTH:
+        return await ctx.send(
+            f"⚠️ A prefix can be at most {MAX_PREFIX_LENGTH} characters."
+        )
+    guild_config.set(
+        ctx.guild.id, "prefix", None if new_prefix == DEFAULT_PREFIX else new_prefix
+    )
+    await ctx.send(f"✅ Prefix set to `{new_prefix}`. Try `{new_prefix}help`.")
+
+
+@prefix_group.command(name="reset")
+@commands.guild_only()
+@require_permissions(administrator=True)
+async def prefix_reset(ctx):
+    """Go back to the default prefix."""
+    guild_config.set(ctx.guild.id, "prefix", None)
+    await ctx.send(f"✅ Prefix reset to `{DEFAULT_PREFIX}`.")
+
+
+# ------------------ Scheduled Jobs ------------------
+SCHEDULE_FILE = "scheduled_jobs.json"
+
+
+class Scheduler:
+    """Disk-persisted expiry queue driven by a single task.
+
+    Jobs are `{kind, run_at, data}` records stored under a caller-chosen ID
+    and ordered in a min-heap on `run_at` (epoch seconds). One loop sleeps
+    until the earliest job is due, or until an earlier job is added, and hands
+    it to the handler registered for its kind. Jobs go through the
+    write-behind journal, so they survive restarts and overdue jobs run as
+    soon as the scheduler starts. A job is only forgotten once its handler
+    has finished, so handlers must be safe to run twice. `call_later` puts
+    short-lived in-memory timers (prompt timeouts) on the same heap; they
+    start the loop themselves, while persisted jobs are held back until
+    `start` is called from on_ready, since their handlers need the guild
+    cache. A failing timer callback is logged and the loop carries on.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.jobs = journal.load("scheduled_jobs", path)  # job_id -> job
+        journal.register("scheduled_jobs", path, lambda: self.jobs)
+        self.handlers = {}  # kind -> coroutine function(data)
+        self.timers = {}  # timer_id -> (run_at, callback); in memory only
+        self._timer_ids = itertools.count()
+        # Heap entries are (run_at, seq, key); `_queued` holds the live
+        # (run_at, seq) per key, so replaced or cancelled entries are skipped.
+        self._seq = itertools.count()
+        self._queued = {}
+        self._heap = []
+        for job_id, job in self.jobs.items():
+            self._push(job["run_at"], job_id)
+        self._held = []  # due jobs popped before start(), pushed back by it
+        self._jobs_live = False
+        self._wake = None
+        self._task = None
+
+    def handler(self, kind: str):
+        """Decorator registering the coroutine that runs jobs of `kind`."""
+
+        def decorator(func):
+            self.handlers[kind] = func
+            return func
+
+        return decorator
+
+    def start(self):
+        """Start running persisted jobs (and the loop, if timers haven't)."""
+        self._jobs_live = True
+        for entry in self._held:
+            heapq.heappush(self._heap, entry)
+        self._held.clear()
+        self._ensure_loop()
+        self._wake.set()
+
+    def _ensure_loop(self):
+        if self._task is None or self._task.done():
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    def _push(self, run_at: float, key: str):
+        """Queue `key` at `run_at` unless it is already queued for that time."""
+        queued = self._queued.get(key)
+        if queued is not None and queued[0] == run_at:
+            return
+        entry = (run_at, next(self._seq), key)
+        self._queued[key] = entry[:2]
+        heapq.heappush(self._heap, entry)
+        # Stale entries otherwise sit in the heap until they come due.
+        if len(self._heap) > 64 and len(self._heap) > 2 * len(self._queued):
+            self._heap = [e for e in self._heap if self._queued.get(e[2]) == e[:2]]
+            heapq.heapify(self._heap)
+        if self._wake and self._heap[0] is entry:
+            self._wake.set()
+
+    def schedule(self, job_id: str, kind: str, run_at: float, data: dict):
+        """Add (or replace) a job due at `run_at` epoch seconds."""
+        job = {"kind": kind, "run_at": run_at, "data": data}
+        self.jobs[job_id] = job
+        journal.record("scheduled_jobs", "set", [job_id], job)
+        self._push(run_at, job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        """Drop a pending job; its heap entry is skipped lazily."""
+        self._queued.pop(job_id, None)
+        if self.jobs.pop(job_id, None) is None:
+            return False
+        journal.record("scheduled_jobs", "del", [job_id])
+        return True
+
+    def call_later(self, delay: float, callback) -> str:
+        """Run a plain callback after `delay` seconds; not persisted."""
+        timer_id = f"timer:{next(self._timer_ids)}"
+        run_at = time.time() + delay
+        self.timers[timer_id] = (run_at, callback)
+        self._ensure_loop()
+        self._push(run_at, timer_id)
+        return timer_id
+
+    def cancel_timer(self, timer_id: str):
+        self.timers.pop(timer_id, None)
+        self._queued.pop(timer_id, None)
+
+    def get(self, job_id: str):
+        return self.jobs.get(job_id)
+
+    @property
+    def backlog(self) -> int:
+        return len(self.jobs)
+
+    async def _run(self):
+        while True:
+            now = time.time()
+            while self._heap and self._heap[0][0] <= now:
+                entry = heapq.heappop(self._heap)
+                job_id = entry[2]
+                if self._queued.get(job_id) != entry[:2]:
+                    continue  # cancelled or rescheduled
+                timer = self.timers.pop(job_id, None)
+                if timer is not None:
+                    del self._queued[job_id]
+                    try:
+                        timer[1]()
+                    except Exception as e:
+                        print(f"⚠️ Timer {job_id} callback failed: {e}")
+                    continue
+                if not self._jobs_live:
+                    self._held.append(entry)
+                    continue
+                del self._queued[job_id]
+                job = self.jobs.get(job_id)
+                if job is not None:
+                    asyncio.create_task(self._dispatch(job_id, job))
+            timeout = self._heap[0][0] - now if self._heap else None
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _dispatch(self, job_id: str, job: dict):
+        handler = self.handlers.get(job["kind"])
+        try:
+            if handler:
+                await handler(job["data"])
+            else:
+                print(f"⚠️ No handler for scheduled job kind '{job['kind']}'")
+        except Exception as e:
+            print(f"⚠️ Scheduled job {job_id} failed: {e}")
+        if self.jobs.get(job_id) is job:
+            self.cancel(job_id)
+
+
+scheduler = Scheduler(SCHEDULE_FILE)
+
+
+# ------------------ Conversations ------------------
+CONVERSATION_CANCEL_WORDS = ("cancel", "stop", "abort")
+
+
+class ConversationCancelled(Exception):
+    """The user answered a prompt with one of the cancel words."""
+
+
+class ConversationRouter:
+    """Deliver replies to interactive prompts.
+
+    Every open prompt is a future keyed by `(channel_id, author_id)`, and a
+    single `on_message` listener hands each message to its prompt with one
+    dict lookup, instead of every `bot.wait_for` check running against every
+    message. Prompt timeouts are timers on the shared scheduler.
+
+    The router only carries replies; it keeps no per-step state. The setup
+    wizard's answers stay in `setup_sessions`, because that dict is also the
+    plan that `!setup add*`, templates and `!setup confirm` operate on.
+    """
+
+    def __init__(self):
+        self.pending = {}  # (channel_id, author_id) -> asyncio.Future
+
+    async def ask(
+        self, ctx, prompt=None, *, embed=None, timeout: float = 120, cancel=True
+    ) -> discord.Message:
+        """Send `prompt` and wait for the author's next message in the channel.
+
+        Raises asyncio.TimeoutError after `timeout` seconds, and
+        ConversationCancelled for a cancel word unless `cancel` is False.
+        A newer prompt for the same user and channel replaces this one.
+        """
+        if prompt is not None or embed is not None:
+            await ctx.send(prompt, embed=embed)
+        key = (ctx.channel.id, ctx.author.id)
+        previous = self.pending.get(key)
+        if previous is not None and not previous.done():
+            previous.set_exception(asyncio.TimeoutError())
+        future = asyncio.get_running_loop().create_future()
+        self.pending[key] = future
+
+        def expire():
+            if not future.done():
+                future.set_exception(asyncio.TimeoutError())
+
+        timer = scheduler.call_later(timeout, expire)
+        try:
+            message = await future
+        finally:
+            scheduler.cancel_timer(timer)
+            if self.pending.get(key) is future:
+                del self.pending[key]
+        if cancel and message.content.strip().lower() in CONVERSATION_CANCEL_WORDS:
+            raise ConversationCancelled()
+        return message
+
+    def dispatch(self, message: discord.Message):
+        future = self.pending.get((message.channel.id, message.author.id))
+        if future is not None and not future.done():
+            future.set_result(message)
+
+
+conversations = ConversationRouter()
+
+
+@bot.listen("on_message")
+async def _route_conversation_reply(message):
+    if conversations.pending:
+        conversations.dispatch(message)
+
+
+# ------------------ Staged Startup ------------------
+CHUNK_QUEUE_DELAY = 0.5  # seconds between background guild chunk requests
+
+
+class GuildChunkQueue:
+    """Fills guild member lists after ready instead of before it.
+
+    Guilds wait in `pending` and one background task chunks them one at a
+    time, always picking the guild with the most messages seen since startup
+    (smaller guilds first on ties). Code that needs a full member list calls
+    `members`, which chunks that guild right away or joins the running request.
+    The lean profile never chunks into the cache; `members` makes a one-off
+    uncached request there instead.
+    """
+
+    def __init__(self):
+        self.pending = set()
+        self.activity = {}  # guild_id -> messages seen while pending
+        self.inflight = {}  # guild_id -> chunk future
+        self.task = None
+
+    @property
+    def enabled(self) -> bool:
+        # Lean keeps a small member cache on purpose, and without a member
+        # cache the chunked members would not be kept anyway.
+        return (
+            BOT_PROFILE != "lean" and bot.intents.members and member_cache_flags.joined
+        )
+
+    def touch(self, guild):
+        if guild.id in self.pending:
+            self.activity[guild.id] = self.activity.get(guild.id, 0) + 1
+
+    def start(self, guilds):
+        if not self.enabled:
+            return
+        self.pending.update(g.id for g in guilds if not g.chunked)
+        if self.pending and (self.task is None or self.task.done()):
+            self.task = asyncio.create_task(self._run())
+
+    async def ensure(self, guild: discord.Guild):
+        """Chunk `guild` now unless it already is (or is being) chunked."""
+        if guild.chunked:
+            return
+        self.pending.discard(guild.id)
+        future = self.inflight.get(guild.id)
+        if future is None:
+            future = self.inflight[guild.id] = asyncio.ensure_future(guild.chunk())
+            future.add_done_callback(functools.partial(self._chunked, guild.id))
+        await asyncio.shield(future)
+
+    async def members(self, guild: discord.Guild) -> list:
+        """Every member of `guild`, even while its cached list is partial."""
+        if guild.chunked:
+            return guild.members
+        if self.enabled:
+            await self.ensure(guild)
+            return guild.members
+        if bot.intents.members:
+            return await guild.chunk(cache=False)
+        return guild.members  # best effort without the members intent
+
+    def _chunked(self, guild_id: int, future):
+        self.inflight.pop(guild_id, None)
+        # The member name index may have been built from a partial member
+        # list; drop it so the next lookup rebuilds it from the full one.
+        member_index.forget(guild_id)
+
+    def _next(self):
+        def priority(gid):
+            guild = bot.get_guild(gid)
+            size = (guild.member_count or 0) if guild else 0
+            return (self.activity.get(gid, 0), -size)
+
+        gid = max(self.pending, key=priority)
+        self.pending.discard(gid)
+        self.activity.pop(gid, None)
+        return bot.get_guild(gid)
+
+    async def _run(self):
+        while self.pending:
+            guild = self._next()
+            if not guild or guild.chunked:
+                continue
+            try:
+                await self.ensure(guild)
+            except Exception as e:
+                print(f"⚠️ Chunking {guild.name} failed: {e}")
+            await asyncio.sleep(CHUNK_QUEUE_DELAY)
+        startup.mark("all guilds chunked")
+
+
+chunk_queue = GuildChunkQueue()
+
+
+@bot.listen("on_connect")
+async def _startup_connected():
+    startup.mark("gateway connected")
+
+
+@bot.listen("on_message")
+async def _chunk_activity(message):
+    if message.guild and chunk_queue.pending:
+        chunk_queue.touch(message.guild)
+
+
+@bot.listen("on_command")
+async def _startup_first_command(ctx):
+    startup.mark("first command")
+
+
+@bot.listen("on_guild_join")
+async def _chunk_joined_guild(guild):
+    chunk_queue.start([guild])
+
+
 @bot.event
 async def on_ready():
-    # start autosave if not running
-    if not autosave_data.is_running():
-        autosave_data.start()
-    # existing on_ready actions follow...
+    startup.mark("ready")
+    bot_stats.recount(bot.guilds)
+    if not sample_resources.is_running():
+        sample_resources.start()
+    # expirations (tempmute, temprole) need the guild cache, so start them here
+    scheduler.start()
+    bulk_roles.resume_all()
+    # member lists fill in the background, busiest guilds first
+    chunk_queue.start(bot.guilds)
     print(f"✅ {BOT_NAME} is online as {bot.user}!")
     await bot.change_presence(activity=discord.Game(name="Enforcing the Server"))
 
@@ -155,26 +1751,28 @@ async def on_member_update(before, after):
         if not removed_roles:
             return  # No roles removed, ignore
 
-        # Get log channel (replace with your actual log channel ID)
-        log_channel_id = 1422329487227355366  # 🔧 CHANGE THIS
-        log_channel = bot.get_channel(log_channel_id)
+        # Get log channel (configured with !config log)
+        log_channel = guild_config.log_channel(after.guild)
 
         # Build message
         removed_names = ", ".join([role.name for role in removed_roles])
 
         # 📨 Send DM to the user
-        try:
-            await after.send(
-                f"⚠️ One or more roles were removed from your account in **{after.guild.name}**:\n"
-                f"❌ **Removed:** {removed_names}\n\n"
-                "If you believe this was a mistake, please contact a server moderator."
-            )
-        except discord.Forbidden:
+        async def dms_closed():
             # User's DMs are closed
-            if log_channel:
-                await log_channel.send(
-                    f"📪 Could not DM **{after}** about role removal: DMs closed."
-                )
+            log_sink.post_line(
+                log_channel,
+                f"📪 Could not DM **{after}** about role removal: DMs closed.",
+            )
+
+        await dm_dispatcher.post(
+            after,
+            f"⚠️ One or more roles were removed from your account in **{after.guild.name}**:\n"
+            f"❌ **Removed:** {removed_names}\n\n"
+            "If you believe this was a mistake, please contact a server moderator.",
+            priority=DM_PRIORITY_ROLES,
+            on_forbidden=dms_closed,
+        )
 
         # 🧾 Log in the moderation log channel
         if log_channel:
@@ -188,351 +1786,366 @@ async def on_member_update(before, after):
             )
             embed.add_field(name="🧾 Roles Removed", value=removed_names, inline=False)
             embed.set_footer(text=f"Guild: {after.guild.name}")
-            await log_channel.send(embed=embed)
+            log_sink.post_embed(log_channel, embed)
 
     except Exception as e:
         print(f"⚠️ Error in on_member_update: {e}")
 
 
 # ---------------- Help System ----------------
-# Data structure: category -> list of (command, description, usage)
-HELP_CATEGORIES = {
-    "General": [
-        ("invite", "Get the bot invite link.", "!invite"),
-        ("help", "Show this help message.", "!help"),
-        ("ping", "Check bot latency.", "!ping"),
-        ("bot_info", "Get bot info.", "!bot_info"),
-        (
-            "clear",
-            "Delete last N messages. Requires manage messages permission.",
-            "!clear <amount>",
-        ),
-        (
-            "say",
-            "Make the bot say something. Requires manage messages permission.",
-            "!say <message>",
-        ),
-        ("serverinfo", "Get server information.", "!serverinfo"),
-        ("userinfo", "Get user information.", "!userinfo [@user]"),
-    ],
-    "Moderation": [
-        ("kick", "Kick a member. Requires kick permissions.", "!kick @user <reason>"),
-        ("ban", "Ban a member. Requires ban permissions.", "!ban @user <reason>"),
-        (
-            "unban",
-            "Unban a member by ID. Requires ban permissions.",
-            "!unban <user_id> <reason>",
-        ),
-        (
-            "warn",
-            "Warn a member. Kicks after 3 warnings. Requires kick permissions.",
-            "!warn @user <reason>",
-        ),
-        (
-            "checkwarnings",
-            "Check how many warnings a member has.",
-            "!checkwarnings @user",
-        ),
-        (
-            "clearwarn",
-            "Clear warnings for a member. Requires kick permissions.",
-            "!clearwarn @user",
-        ),
-        (
-            "mute",
-            "Mute a member. Requires manage roles permission.",
-            "!mute @user <reason>",
-        ),
-        (
-            "mutetime",
-            "Check remaining mute time. Requires manage roles permission.",
-            "!mutetime",
-        ),
-        (
-            "tempmute",
-            "Temporarily mute a member. Requires manage roles permission.",
-            "!tempmute @user <time> [m/h/d]",
-        ),
-        (
-            "unmute",
-            "Unmute a member. Requires manage roles permission.",
-            "!unmute @user",
-        ),
-        (
-            "softban",
-            "Softban a member (ban and unban). Requires ban permissions.",
-            "!softban @user <reason>",
-        ),
-        (
-            "lockdown",
-            "Lock a channel. Requires manage channels permission.",
-            "!lockdown [#channel]",
-        ),
-        (
-            "unlock",
-            "Unlock a channel. Requires manage channels permission.",
-            "!unlock [#channel]",
-        ),
-        (
-            "nick",
-            "Change a member's nickname. Requires manage nicknames permission.",
-            "!nick @user <new_nickname>",
-        ),
-        (
-            "announce",
-            "Make an announcement in the current channel. Requires administrator permission.",
-            "!announce <message>",
-        ),
-        (
-            "purgebot",
-            "Delete bot messages only. Requires manage messages permission.",
-            "!purgebot <amount>",
-        ),
-        (
-            "warnings",
-            "View warnings for a member. Requires kick permissions.",
-            "!warnings @user",
-        ),
-        (
-            "slowmode",
-            "Set slowmode for a channel. Requires manage channels permission.",
-            "!slowmode #channel <seconds>",
-        ),
-    ],
-    "Server Setup / Utilities": [
-        (
-            "setupserver",
-            "Interactive server setup wizard. Requires administrator permission.",
-            "!setupserver",
-        ),
-        (
-            "deleterole",
-            "Delete a role by name. Requires manage roles permission.",
-            "!deleterole <role_name>",
-        ),
-        (
-            "deletechannel",
-            "Delete a channel by name. Requires manage channels permission.",
-            "!deletechannel <channel_name>",
-        ),
-        (
-            "renamechannel",
-            "Rename a channel. Requires manage channels permission.",
-            "!renamechannel <old_name> <new_name>",
-        ),
-        (
-            "renamerole",
-            "Rename a role. Requires manage roles permission.",
-            "!renamerole <old_name> <new_name>",
-        ),
-        (
-            "add_role",
-            "Create a role with a custom name. Requires administrator permission.",
-            "!add_role <role_name>",
-        ),
-        (
-            "addtext",
-            "Create a text channel with a custom name. Requires administrator permission.",
-            "!addtext <channel_name>",
-        ),
-        (
-            "addvoice",
-            "Create a voice channel with a custom name. Requires administrator permission.",
-            "!addvoice <channel_name>",
-        ),
-        (
-            "addrole",
-            "Add a role to a member. Requires manage roles permission.",
-            "!addrole @user @role",
-        ),
-        (
-            "removerole",
-            "Remove a role from a member. Requires manage roles permission.",
-            "!removerole @user @role",
-        ),
-        (
-            "temprole",
-            "Temporarily assign a role to a member. Requires manage roles permission.",
-            "!temprole @user @role <time_in_seconds>",
-        ),
-        (
-            "massrole",
-            "Assign a role to all members. Requires administrator permission.",
-            "!massrole @role",
-        ),
-        ("roleinfo", "Get information about a role.", "!roleinfo @role"),
-        (
-            "reactionrole",
-            "Set up a reaction role message. Requires manage messages permission.",
-            "!reactionrole #channel <message_id> <emoji> @role",
-        ),
-    ],
-}
+# Section order of the help pages. Each command names its own section with
+# extras={"section": ...}; names, usage, descriptions and permissions come from
+# the registered commands, and commands without a section show under "Other".
+HELP_SECTIONS = (
+    "General",
+    "Moderation",
+    "Server Setup / Utilities",
+)
+HELP_OTHER_SECTION = "Other"
 
 # Configuration
 ITEMS_PER_PAGE = 4
 
 
-def make_help_embed(category: str, page: int = 0):
-    """Return a discord.Embed for the given category and page."""
-    commands_list = HELP_CATEGORIES.get(category, [])
-    total_items = len(commands_list)
-    pages = max(1, (total_items + ITEMS_PER_PAGE - 1) // ITEMS_PER_PAGE)
+def command_permissions(command) -> list:
+    """Permission names declared through `require_permissions`."""
+    return getattr(command.callback, "required_permissions", [])
+
+
+def help_entry(command) -> tuple:
+    """(field name, description, usages) for one command; usages lack the prefix."""
+    title = f"**{command.name}**"
+    if command.aliases:
+        title += f" ({', '.join(command.aliases)})"
+
+    desc = command.short_doc or "No description."
+    if not desc.endswith((".", "!", ")")):
+        desc += "."
+    perms = command_permissions(command)
+    if perms:
+        names = ", ".join(p.replace("_", " ") for p in perms)
+        desc += f" Requires {names} permission."
+
+    usages = []
+    if not isinstance(command, commands.Group) or command.signature:
+        usages.append(f"{command.qualified_name} {command.signature}".strip())
+    if isinstance(command, commands.Group):
+        for sub in dict.fromkeys(command.all_commands.values()):
+            if not sub.hidden:
+                usages.append(f"{sub.qualified_name} {sub.signature}".strip())
+    return title, desc, usages
+
+
+class HelpCatalog:
+    """Help pages built from the live command registry.
+
+    Entries are regenerated only when `bot.registry_version` changes, and each
+    rendered (section, page, prefix) embed is kept until then so paging is a
+    lookup.
+    """
+
+    def __init__(self):
+        self.version = None
+        self.sections = {}
+        self.pages = {}
+
+    def refresh(self):
+        if self.version == bot.registry_version:
+            return
+        sections = {section: [] for section in HELP_SECTIONS}
+        # all_commands also maps aliases; dict.fromkeys keeps registration order
+        for command in dict.fromkeys(bot.all_commands.values()):
+            if not command.hidden:
+                section = command.extras.get("section", HELP_OTHER_SECTION)
+                sections.setdefault(section, []).append(help_entry(command))
+        self.sections = {s: entries for s, entries in sections.items() if entries}
+        self.pages.clear()
+        self.version = bot.registry_version
+
+    def section_names(self) -> list:
+        self.refresh()
+        return list(self.sections)
+
+    def count(self, section: str) -> int:
+        self.refresh()
+        return len(self.sections.get(section, ()))
+
+    def page(self, section: str, page: int = 0, prefix: str = DEFAULT_PREFIX):
+        """Return (embed, page count) for a section page, rendering it once."""
+        self.refresh()
+        entries = self.sections.get(section, [])
+        pages = max(1, (len(entries) + ITEMS_PER_PAGE - 1) // ITEMS_PER_PAGE)
+        page = max(0, min(page, pages - 1))
+        embed = self.pages.get((section, page, prefix))
+        if embed is None:
+            embed = discord.Embed(
+                title=f"**{section} Commands**",
+                description=f"Page **{page+1}/{pages}** — Use the buttons or select menu to navigate categories.",
+                color=discord.Color.gold(),
+            )
+            start = page * ITEMS_PER_PAGE
+            for name, desc, usages in entries[start : start + ITEMS_PER_PAGE]:
+                usage = " • ".join(f"`{prefix}{u}`" for u in usages)
+                embed.add_field(
+                    name=name, value=f"{desc}\nUsage: {usage}", inline=False
+                )
+            embed.set_footer(
+                text=f"Tip: Use {prefix} before commands. Slash commands coming soon!"
+            )
+            self.pages[(section, page, prefix)] = embed
+        return embed, pages
+
+
+help_catalog = HelpCatalog()
+
+
+# ---------------- Help View ----------------
+# Help panels hold no per-message state: each component's custom_id carries the
+# owner, section and page, and the DynamicItems below decode it on every click.
+
+
+def stateless_view(*items) -> View:
+    """A View used only as a component layout for a message.
+
+    It is stopped before sending so discord.py doesn't keep it per message;
+    clicks are routed to the registered DynamicItems by custom_id instead.
+    """
+    view = View(timeout=None)
+    for item in items:
+        view.add_item(item)
+    view.stop()
+    return view
+
+
+def help_panel(author_id: int, section: str, page: int = 0, guild=None):
+    """Return (embed, view) for one page of a help panel."""
+    sections = help_catalog.section_names()
+    if section not in sections:
+        section = sections[0]
+    embed, pages = help_catalog.page(section, page, guild_config.prefix(guild))
     page = max(0, min(page, pages - 1))
+    return embed, stateless_view(
+        HelpSectionSelect(author_id, section),
+        HelpPageButton("prev", author_id, section, page),
+        HelpPageButton("next", author_id, section, page),
+        HelpPageButton("close", author_id, section, page),
+    )
+
 
-    start = page * ITEMS_PER_PAGE
-    end = start + ITEMS_PER_PAGE
-    chunk = commands_list[start:end]
+async def check_help_owner(interaction: discord.Interaction, author_id: int) -> bool:
+    if interaction.user.id != author_id:
+        await interaction.response.send_message(
+            "This help panel isn't for you.", ephemeral=True
+        )
+        return False
+    return True
+
+
+class HelpPageButton(
+    discord.ui.DynamicItem[Button],
+    template=r"help:(?P<action>prev|next|close):(?P<author>\d+):(?P<page>\d+):(?P<section>.+)",
+):
+    STYLES = {
+        "prev": ("⬅ Prev", discord.ButtonStyle.secondary),
+        "next": ("Next ➡", discord.ButtonStyle.secondary),
+        "close": ("Close ❌", discord.ButtonStyle.danger),
+    }
 
-    embed = discord.Embed(
-        title=f"**{category} Commands**",
-        description=f"Page **{page+1}/{pages}** — Use the buttons or select menu to navigate categories.",
-        color=discord.Color.gold(),
-    )
+    def __init__(self, action: str, author_id: int, section: str, page: int):
+        label, style = self.STYLES[action]
+        super().__init__(
+            Button(
+                label=label,
+                style=style,
+                custom_id=f"help:{action}:{author_id}:{page}:{section}",
+            )
+        )
+        self.action = action
+        self.author_id = author_id
+        self.section = section
+        self.page = page
 
-    for cmd, desc, usage in chunk:
-        embed.add_field(
-            name=f"**{cmd}**", value=f"{desc}\nUsage: `{usage}`", inline=False
+    @classmethod
+    async def from_custom_id(cls, interaction, item, match):
+        return cls(
+            match["action"], int(match["author"]), match["section"], int(match["page"])
         )
 
-    embed.set_footer(text="Tip: Use ! before commands. Slash commands coming soon!")
-    return embed, pages
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        return await check_help_owner(interaction, self.author_id)
 
+    async def callback(self, interaction: discord.Interaction):
+        if self.action == "close":
+            await interaction.response.edit_message(
+                content="Help panel closed.", embed=None, view=None
+            )
+            return
+        step = -1 if self.action == "prev" else 1
+        embed, view = help_panel(
+            self.author_id, self.section, self.page + step, interaction.guild
+        )
+        await interaction.response.edit_message(embed=embed, view=view)
 
-# ---------------- Help View ----------------
-class HelpView(View):
-    def __init__(self, author_id: int, initial_category: str = "General"):
-        super().__init__(timeout=180)
-        self.author_id = author_id
-        self.category = initial_category
-        self.page = 0
-        self.max_pages = 1
 
-        # Select menu for categories
+class HelpSectionSelect(
+    discord.ui.DynamicItem[Select], template=r"help:section:(?P<author>\d+)"
+):
+    def __init__(self, author_id: int, section: str = ""):
         options = [
             discord.SelectOption(
-                label=cat, description=f"{len(HELP_CATEGORIES[cat])} commands"
+                label=name,
+                description=f"{help_catalog.count(name)} commands",
+                default=name == section,
             )
-            for cat in HELP_CATEGORIES
+            for name in help_catalog.section_names()
         ]
-        self.add_item(
+        super().__init__(
             Select(
                 placeholder="Choose category...",
                 options=options,
-                custom_id="help_select",
+                custom_id=f"help:section:{author_id}",
             )
         )
+        self.author_id = author_id
 
-        # Navigation buttons
-        self.prev_button = Button(label="⬅ Prev", style=discord.ButtonStyle.secondary)
-        self.next_button = Button(label="Next ➡", style=discord.ButtonStyle.secondary)
-        self.close_button = Button(label="Close ❌", style=discord.ButtonStyle.danger)
-
-        self.prev_button.callback = self.on_prev
-        self.next_button.callback = self.on_next
-        self.close_button.callback = self.on_close
-
-        self.add_item(self.prev_button)
-        self.add_item(self.next_button)
-        self.add_item(self.close_button)
+    @classmethod
+    async def from_custom_id(cls, interaction, item, match):
+        return cls(int(match["author"]))
 
     async def interaction_check(self, interaction: discord.Interaction) -> bool:
-        if interaction.user.id != self.author_id:
-            await interaction.response.send_message(
-                "This help panel isn't for you.", ephemeral=True
-            )
-            return False
-        return True
+        return await check_help_owner(interaction, self.author_id)
 
-    async def on_prev(self, interaction: discord.Interaction):
-        await interaction.response.defer(ephemeral=True)
-        self.page = max(0, self.page - 1)
-        embed, pages = make_help_embed(self.category, self.page)
-        self.max_pages = pages
-        await interaction.followup.edit_message(
-            interaction.message.id, embed=embed, view=self
+    async def callback(self, interaction: discord.Interaction):
+        embed, view = help_panel(
+            self.author_id, self.item.values[0], guild=interaction.guild
         )
+        await interaction.response.edit_message(embed=embed, view=view)
 
-    async def on_next(self, interaction: discord.Interaction):
-        await interaction.response.defer(ephemeral=True)
-        _, pages = make_help_embed(self.category, self.page)
-        self.max_pages = pages
-        self.page = min(self.max_pages - 1, self.page + 1)
-        embed, _ = make_help_embed(self.category, self.page)
-        await interaction.followup.edit_message(
-            interaction.message.id, embed=embed, view=self
-        )
 
-    async def on_close(self, interaction: discord.Interaction):
-        await interaction.response.defer(ephemeral=True)
-        try:
-            await interaction.followup.edit_message(
-                interaction.message.id,
-                content="Help panel closed.",
-                embed=None,
-                view=None,
-            )
-        except Exception:
-            pass
-        self.stop()
+# ---------------- General Commands ----------------
 
+# ----- Bot-wide Stats -----
+STATS_SAMPLE_SECONDS = 10
+STATS_WINDOW = 360  # samples kept (one hour at the interval above)
 
-# ---------------- Select Callback ----------------
-@discord.ui.select(custom_id="help_select")
-async def help_select_callback(
-    select: discord.ui.Select, interaction: discord.Interaction
-):
-    view: HelpView = select.view
-    if not view:
-        await interaction.response.send_message(
-            "This help panel has expired.", ephemeral=True
-        )
-        return
-    await interaction.response.defer(ephemeral=True)
-    view.category = select.values[0]
-    view.page = 0
-    embed, pages = make_help_embed(view.category, view.page)
-    view.max_pages = pages
-    await interaction.followup.edit_message(
-        interaction.message.id, embed=embed, view=view
-    )
 
+def percentile(values, pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(pct / 100 * len(values)))]
 
-Select.callback = help_select_callback
 
-# ---------------- General Commands ----------------
+class BotStats:
+    """Bot-wide counters and resource usage that are cheap to read.
+
+    Guild and member totals are recounted once on ready and then adjusted
+    from guild join/remove and member join/remove events. CPU and RAM are
+    sampled by `sample_resources` into a rolling window, and the percentile
+    summary is recomputed there, so readers only pick up `snapshot`.
+    """
+
+    def __init__(self):
+        self.guilds = 0
+        self.users = 0
+        self.member_counts = {}  # guild_id -> member count included in users
+        self.cpu = deque(maxlen=STATS_WINDOW)
+        self.ram = deque(maxlen=STATS_WINDOW)
+        self.snapshot = None
+
+    def recount(self, guilds):
+        self.member_counts = {g.id: g.member_count or 0 for g in guilds}
+        self.guilds = len(self.member_counts)
+        self.users = sum(self.member_counts.values())
+
+    def guild_joined(self, guild: discord.Guild):
+        count = guild.member_count or 0
+        previous = self.member_counts.get(guild.id)
+        if previous is None:
+            self.guilds += 1
+        else:
+            self.users -= previous
+        self.member_counts[guild.id] = count
+        self.users += count
+
+    def guild_left(self, guild_id: int):
+        previous = self.member_counts.pop(guild_id, None)
+        if previous is not None:
+            self.guilds -= 1
+            self.users -= previous
+
+    def members_changed(self, guild_id: int, delta: int):
+        if guild_id in self.member_counts:
+            self.member_counts[guild_id] += delta
+            self.users += delta
+
+    def sample(self, psutil):
+        self.cpu.append(psutil.cpu_percent())
+        self.ram.append(psutil.virtual_memory().percent)
+        cpu, ram = sorted(self.cpu), sorted(self.ram)
+        self.snapshot = {
+            "cpu": self.cpu[-1],
+            "cpu_p95": percentile(cpu, 95),
+            "ram": self.ram[-1],
+            "ram_p95": percentile(ram, 95),
+            "window": len(cpu) * STATS_SAMPLE_SECONDS,
+        }
+
+
+bot_stats = BotStats()
+
+
+@tasks.loop(seconds=STATS_SAMPLE_SECONDS)
+async def sample_resources():
+    bot_stats.sample(lazy_import("psutil"))
+
+
+@sample_resources.before_loop
+async def before_sample_resources():
+    # cpu_percent() compares against the previous call, so prime it once.
+    lazy_import("psutil").cpu_percent()
+    await asyncio.sleep(1)
+
+
+@bot.listen("on_guild_join")
+async def _stats_guild_joined(guild):
+    bot_stats.guild_joined(guild)
+
+
+@bot.listen("on_guild_remove")
+async def _stats_guild_removed(guild):
+    bot_stats.guild_left(guild.id)
 
-# ----- Invite Command -----
-import datetime
 
-now = datetime.datetime.now()
-# Global stats (updated in background)
-bot_stats = {"guilds": 0, "users": 0}
+@bot.listen("on_member_join")
+async def _stats_member_joined(member):
+    bot_stats.members_changed(member.guild.id, 1)
 
-# Background task to keep stats live
-@tasks.loop(minutes=5)
-async def update_bot_stats():
-    bot_stats["guilds"] = len(bot.guilds)
-    bot_stats["users"] = sum(g.member_count for g in bot.guilds)
 
+@bot.listen("on_raw_member_remove")
+async def _stats_member_removed(payload):
+    bot_stats.members_changed(payload.guild_id, -1)
 
-@update_bot_stats.before_loop
-async def before_update_bot_stats():
-    await bot.wait_until_ready()
-    bot_stats["guilds"] = len(bot.guilds)
-    bot_stats["users"] = sum(g.member_count for g in bot.guilds)
 
+def describe_usage(current_key: str, p95_key: str) -> str:
+    """Latest value and p95 of a resource, e.g. "12% (p95 30% over 1h)"."""
+    snap = bot_stats.snapshot
+    if not snap:
+        return "sampling…"
+    minutes = snap["window"] // 60
+    window = f"{minutes // 60}h" if minutes >= 60 else f"{max(1, minutes)}m"
+    return f"{snap[current_key]:.0f}% (p95 {snap[p95_key]:.0f}% over {window})"
 
-@bot.command(name="invite", aliases=["botinfo", "sx2"])
+
+# ----- Invite Command -----
+
+
+@bot.command(name="invite", aliases=["botinfo", "sx2"], extras={"section": "General"})
 async def invite(ctx):
     """Shows SX2 bot info, features, and invite links."""
 
-    # Ensure stats are ready
-    if not update_bot_stats.is_running():
-        update_bot_stats.start()
-
-    guild_count = bot_stats["guilds"]
-    user_count = bot_stats["users"]
+    guild_count = bot_stats.guilds
+    user_count = bot_stats.users
 
     # Generate bot invite link
     permissions = discord.Permissions(
@@ -583,7 +2196,7 @@ async def invite(ctx):
             f"**:question: !help to see all my commands**."
         ),
         color=discord.Color.blurple(),
-        timestamp=datetime.datetime.now(datetime.timezone.utc),
+        timestamp=datetime.now(timezone.utc),
     )
 
     embed.set_thumbnail(url=bot.user.display_avatar.url)
@@ -623,12 +2236,8 @@ async def invite(ctx):
 # ---------------- General Commands ----------------
 
 
-import discord
-from discord.ext import commands
-
-
-@commands.has_permissions(administrator=True)
-@bot.command(name="setup_support")
+@require_permissions(administrator=True)
+@bot.command(name="setup_support", extras={"section": "Server Setup / Utilities"})
 async def setup_support(ctx):
     """Sets up the official SX2 Enforcer Support Server structure"""
     guild = ctx.guild
@@ -695,16 +2304,15 @@ async def setup_support(ctx):
 # ---------------- General Commands ----------------
 
 
-@bot.command(name="help")
+@bot.command(name="help", extras={"section": "General"})
 async def prefix_help(ctx):
-    embed, pages = make_help_embed("General", 0)
-    view = HelpView(author_id=ctx.author.id, initial_category="General")
-    view.max_pages = pages
+    """Show this help message."""
+    embed, view = help_panel(ctx.author.id, "General", guild=ctx.guild)
     await ctx.send(embed=embed, view=view)
 
 
 # ---------------- INFO COMMANDS ----------------
-@bot.command(name="ping")
+@bot.command(name="ping", extras={"section": "General"})
 async def ping(ctx):
     """Check bot latency"""
     latency = round(bot.latency * 1000)
@@ -716,7 +2324,7 @@ async def ping(ctx):
 bot.launch_time = time.time()
 
 
-@bot.command(name="bot_info")
+@bot.command(name="bot_info", extras={"section": "General"})
 async def botinfo(ctx):
     """Displays information about the bot."""
     current_time = time.time()
@@ -726,12 +2334,10 @@ async def botinfo(ctx):
     # Basic info
     bot_user = bot.user
     latency = round(bot.latency * 1000)
-    servers = len(bot.guilds)
-    total_users = sum(g.member_count for g in bot.guilds)
-    python_version = platform.python_version()
+    servers = bot_stats.guilds
+    total_users = bot_stats.users
+    python_version = lazy_import("platform").python_version()
     discord_version = discord.__version__
-    cpu_usage = psutil.cpu_percent()
-    ram_usage = psutil.virtual_memory().percent
 
     embed = discord.Embed(
         title=f"🤖 Bot Information — {bot_user.name}",
@@ -754,8 +2360,8 @@ async def botinfo(ctx):
 
     # ─── PERFORMANCE ───────────────────────────────
     performance = (
-        f"**• CPU Usage:** {cpu_usage}%\n"
-        f"**• RAM Usage:** {ram_usage}%\n"
+        f"**• CPU Usage:** {describe_usage('cpu', 'cpu_p95')}\n"
+        f"**• RAM Usage:** {describe_usage('ram', 'ram_p95')}\n"
         f"**• Python Version:** {python_version}\n"
         f"**• Discord.py Version:** {discord_version}"
     )
@@ -768,7 +2374,7 @@ async def botinfo(ctx):
     stats = (
         f"**• Connected Servers:** {servers}\n"
         f"**• Total Users (Approx):** {total_users:,}\n"
-        f"**• Command Prefix:** `{bot.command_prefix}`"
+        f"**• Command Prefix:** `{guild_config.prefix(ctx.guild)}`"
     )
     embed.add_field(name="📊 ACTIVITY / STATS", value=stats, inline=False)
 
@@ -778,9 +2384,75 @@ async def botinfo(ctx):
     await ctx.send(embed=embed)
 
 
+def approx_size(obj) -> int:
+    """Bytes held by `obj` and the values of its slots (one level deep)."""
+    size = sys.getsizeof(obj)
+    for cls in type(obj).__mro__:
+        for name in getattr(cls, "__slots__", ()):
+            value = getattr(obj, name, None)
+            if value is not None:
+                size += sys.getsizeof(value)
+    return size
+
+
+def member_cache_bytes(guild: discord.Guild, sample: int = 200) -> int:
+    """Estimated memory of the guild's cached members, from a sample."""
+    members = guild.members
+    if not members:
+        return 0
+    picked = members[:sample]
+    return sum(approx_size(m) for m in picked) * len(members) // len(picked)
+
+
+@bot.command(name="cachestats", extras={"section": "General"})
+@require_permissions(administrator=True)
+async def cachestats(ctx):
+    """Show the gateway profile and how much this server occupies in the caches."""
+    guild = ctx.guild
+    cached = len(guild.members)
+    total = guild.member_count or cached
+    enabled = [name for name, on in bot.intents if on]
+    flags = [name for name, on in member_cache_flags if on]
+
+    embed = discord.Embed(
+        title=f"🧠 Cache Stats — {guild.name}", color=discord.Color.teal()
+    )
+    embed.add_field(
+        name="Profile",
+        value=(
+            f"**• Profile:** `{BOT_PROFILE}`\n"
+            f"**• Intents:** {', '.join(enabled)}\n"
+            f"**• Member cache:** {', '.join(flags) or 'none (fetched on demand)'}"
+        ),
+        inline=False,
+    )
+    embed.add_field(
+        name="This server",
+        value=(
+            f"**• Members cached:** {cached:,}/{total:,}\n"
+            f"**• Member cache size:** ~{member_cache_bytes(guild) / 1024:,.0f} KiB\n"
+            f"**• Fetched (LRU):** {member_fetcher.guild_entries(guild.id):,}\n"
+            f"**• Chunked:** {'yes' if guild.chunked else 'no'}"
+        ),
+        inline=False,
+    )
+    embed.add_field(
+        name="All servers",
+        value=(
+            f"**• Members cached:** {sum(len(g.members) for g in bot.guilds):,}\n"
+            f"**• Users cached:** {len(bot.users):,}\n"
+            f"**• LRU:** {len(member_fetcher.cache):,}/{member_fetcher.size:,} "
+            f"({member_fetcher.hits:,} hits, {member_fetcher.fetches:,} fetches)"
+        ),
+        inline=False,
+    )
+    await ctx.send(embed=embed)
+
+
 # ---------------- SERVER & USER INFO COMMANDS ----------------
-@bot.command(name="serverinfo")
+@bot.command(name="serverinfo", extras={"section": "General"})
 async def serverinfo(ctx):
+    """Get server information."""
     guild = ctx.guild
 
     # Find the most active text channel (by message count if cached, fallback to highest position)
@@ -841,8 +2513,8 @@ async def serverinfo(ctx):
     await ctx.send(embed=embed)
 
 
-@bot.command(name="userinfo")
-async def userinfo(ctx, member: discord.Member = None):
+@bot.command(name="userinfo", extras={"section": "General"})
+async def userinfo(ctx, member: IndexedMember = None):
     """Displays detailed and well-formatted user information."""
     member = member or ctx.author
 
@@ -871,7 +2543,7 @@ async def userinfo(ctx, member: discord.Member = None):
         f"**• Joined Server:** {member.joined_at.strftime('%b %d, %Y • %H:%M')}\n"
         f"**• Roles ({role_count}):** {', '.join(roles) if roles else 'No roles'}\n"
         f"**• Highest Role:** {member.top_role.mention}\n"
-        f"**• Status:** {str(member.status).title()}"
+        f"**• Status:** {str(member.status).title() if bot.intents.presences else 'Unknown'}"
     )
     embed.add_field(name="🏠 MEMBER INFO", value=member_info, inline=False)
 
@@ -884,8 +2556,8 @@ async def userinfo(ctx, member: discord.Member = None):
 
 
 # -----Say Command-----
-@bot.command()
-@commands.has_permissions(manage_messages=True)
+@bot.command(extras={"section": "General"})
+@require_permissions(manage_messages=True)
 async def say(ctx, *, message):
     """Bot repeats your message."""
     await ctx.message.delete()
@@ -893,9 +2565,10 @@ async def say(ctx, *, message):
 
 
 # ----Clear Command-----
-@bot.command(name="clear")
-@commands.has_permissions(manage_messages=True)
+@bot.command(name="clear", extras={"section": "General"})
+@require_permissions(manage_messages=True)
 async def clear(ctx, amount: int = 5):
+    """Delete the last N messages."""
     await ctx.channel.purge(limit=amount + 1)
     await ctx.send(f"🧹 Deleted {amount} messages.", delete_after=5)
 
@@ -937,7 +2610,7 @@ async def on_command_error(ctx, error):
     except:
         pass
     # optionally send full trace to mod-log channel if exists:
-    modlog = discord.utils.get(ctx.guild.text_channels, name="mod-log")
+    modlog = guild_config.log_channel(ctx.guild) if ctx.guild else None
     if modlog:
         # trim to a reasonable length
         short = tb if len(tb) < 1900 else tb[-1900:]
@@ -960,25 +2633,20 @@ async def on_command_error(ctx, error):
 async def mod_log(
     guild: discord.Guild, title: str, description: str, author: discord.Member = None
 ):
-    ch = discord.utils.get(guild.text_channels, name="mod-log")
+    ch = guild_config.log_channel(guild)
     embed = discord.Embed(
         title=title, description=description, color=discord.Color.red()
     )
     if author:
         embed.set_author(name=str(author), icon_url=author.display_avatar.url)
-    if ch:
-        await ch.send(embed=embed)
+    log_sink.post_embed(ch, embed)
 
 
-warns = {}
-
 # ---------- Kick Command ----------
-MOD_LOG_CHANNEL_ID = 1422329487227355366  # Replace with your mod-log channel ID
-
 
-@bot.command()
-@commands.has_permissions(kick_members=True)
-async def kick(ctx, member: discord.Member, *, reason="No reason provided"):
+@bot.command(extras={"section": "Moderation"})
+@require_permissions(kick_members=True)
+async def kick(ctx, member: IndexedMember, *, reason="No reason provided"):
     """Kick a member from the server with DM and mod-log."""
 
     if member == ctx.author:
@@ -989,13 +2657,11 @@ async def kick(ctx, member: discord.Member, *, reason="No reason provided"):
         return await ctx.send("❌ You cannot kick someone with an equal or higher role.")
 
     try:
-        # DM before kicking
-        try:
-            await member.send(
-                f"⚠️ You have been kicked from **{ctx.guild.name}**.\nReason: {reason}"
-            )
-        except:
-            pass
+        # DM before kicking (bounded wait, the member must still share a guild)
+        await dm_dispatcher.deliver(
+            member,
+            f"⚠️ You have been kicked from **{ctx.guild.name}**.\nReason: {reason}",
+        )
 
         await member.kick(reason=reason)
     except discord.Forbidden:
@@ -1021,15 +2687,15 @@ async def kick(ctx, member: discord.Member, *, reason="No reason provided"):
     await ctx.send(embed=embed)
 
     # Mod-log
-    mod_log = ctx.guild.get_channel(MOD_LOG_CHANNEL_ID)
+    mod_log = guild_config.log_channel(ctx.guild)
     if mod_log and mod_log.permissions_for(ctx.guild.me).send_messages:
-        await mod_log.send(embed=embed)
+        log_sink.post_embed(mod_log, embed)
 
 
 # ---------- Ban ----------
-@bot.command()
-@commands.has_permissions(ban_members=True)
-async def ban(ctx, member: discord.Member, *, reason="No reason provided"):
+@bot.command(extras={"section": "Moderation"})
+@require_permissions(ban_members=True)
+async def ban(ctx, member: IndexedMember, *, reason="No reason provided"):
     """Ban a member from the server with DM and mod-log."""
 
     if member == ctx.author:
@@ -1040,13 +2706,11 @@ async def ban(ctx, member: discord.Member, *, reason="No reason provided"):
         return await ctx.send("❌ You cannot ban someone with an equal or higher role.")
 
     try:
-        # DM before banning
-        try:
-            await member.send(
-                f"🔨 You have been banned from **{ctx.guild.name}**.\nReason: {reason}"
-            )
-        except:
-            pass
+        # DM before banning (bounded wait, the member must still share a guild)
+        await dm_dispatcher.deliver(
+            member,
+            f"🔨 You have been banned from **{ctx.guild.name}**.\nReason: {reason}",
+        )
 
         await member.ban(reason=reason)
     except discord.Forbidden:
@@ -1072,47 +2736,178 @@ async def ban(ctx, member: discord.Member, *, reason="No reason provided"):
     await ctx.send(embed=embed)
 
     # Mod-log
-    mod_log = ctx.guild.get_channel(MOD_LOG_CHANNEL_ID)
+    mod_log = guild_config.log_channel(ctx.guild)
     if mod_log and mod_log.permissions_for(ctx.guild.me).send_messages:
-        await mod_log.send(embed=embed)
+        log_sink.post_embed(mod_log, embed)
+
+
+# ---------- Ban Index ----------
+class _GuildBans:
+    __slots__ = ("users", "by_name", "names", "loaded", "lock", "unbanned")
+
+    def __init__(self):
+        self.users = {}  # user_id -> discord.User
+        self.by_name = {}  # normalized name / name#discriminator -> {user_id}
+        self.names = []  # sorted (normalized name, user_id) for prefix search
+        self.loaded = False
+        self.lock = asyncio.Lock()
+        self.unbanned = set()  # unbans seen while the initial fetch is streaming
+
+
+class BanIndex:
+    """Per-guild index of banned users.
+
+    Filled once per guild by streaming `guild.bans(limit=None)` and then kept
+    current by the ban/unban events, so `unban` resolves IDs, usernames
+    (with or without a legacy discriminator) and prefixes without paging the
+    ban list on every call.
+    """
+
+    def __init__(self):
+        self._guilds = {}  # guild_id -> _GuildBans
+
+    @staticmethod
+    def _keys(user):
+        name = user.name.casefold()
+        keys = [name]
+        if user.discriminator and user.discriminator != "0":
+            keys.append(f"{name}#{user.discriminator}")
+        return keys
+
+    def _bans(self, guild_id: int) -> _GuildBans:
+        bans = self._guilds.get(guild_id)
+        if bans is None:
+            bans = self._guilds[guild_id] = _GuildBans()
+        return bans
+
+    def _add(self, bans: _GuildBans, user):
+        if user.id in bans.users:
+            return
+        bans.users[user.id] = user
+        for key in self._keys(user):
+            bans.by_name.setdefault(key, set()).add(user.id)
+        bisect.insort(bans.names, (user.name.casefold(), user.id))
+
+    def _remove(self, bans: _GuildBans, user_id: int):
+        user = bans.users.pop(user_id, None)
+        if user is None:
+            return
+        for key in self._keys(user):
+            ids = bans.by_name.get(key)
+            if ids:
+                ids.discard(user_id)
+                if not ids:
+                    del bans.by_name[key]
+        entry = (user.name.casefold(), user_id)
+        i = bisect.bisect_left(bans.names, entry)
+        if i < len(bans.names) and bans.names[i] == entry:
+            del bans.names[i]
+
+    async def _ensure(self, guild: discord.Guild) -> _GuildBans:
+        bans = self._bans(guild.id)
+        if bans.loaded:
+            return bans
+        async with bans.lock:
+            if not bans.loaded:
+                try:
+                    async for entry in guild.bans(limit=None):
+                        if entry.user.id not in bans.unbanned:
+                            self._add(bans, entry.user)
+                    bans.loaded = True
+                finally:
+                    bans.unbanned.clear()
+        return bans
+
+    async def find(self, guild: discord.Guild, query: str):
+        """Return the banned user matching an ID, mention, name or name#tag."""
+        bans = await self._ensure(guild)
+        query = query.strip().strip("<@!>")
+        if query.isdigit():
+            return bans.users.get(int(query))
+        ids = bans.by_name.get(query.casefold().lstrip("@"), ())
+        if len(ids) == 1:
+            return bans.users[next(iter(ids))]
+        return None
+
+    async def search(self, guild: discord.Guild, prefix: str, limit: int = 10):
+        """Banned users whose username starts with `prefix`, sorted by name."""
+        bans = await self._ensure(guild)
+        prefix = prefix.strip().casefold().lstrip("@").split("#", 1)[0]
+        i = bisect.bisect_left(bans.names, (prefix,))
+        found = []
+        for name, user_id in itertools.islice(bans.names, i, None):
+            if not name.startswith(prefix) or len(found) >= limit:
+                break
+            found.append(bans.users[user_id])
+        return found
+
+    def banned(self, guild: discord.Guild, user):
+        bans = self._guilds.get(guild.id)
+        if bans is not None:
+            bans.unbanned.discard(user.id)
+            self._add(bans, user)
+
+    def unbanned(self, guild: discord.Guild, user):
+        bans = self._guilds.get(guild.id)
+        if bans is not None:
+            if not bans.loaded:
+                bans.unbanned.add(user.id)
+            self._remove(bans, user.id)
+
+    def forget(self, guild_id: int):
+        self._guilds.pop(guild_id, None)
+
+
+ban_index = BanIndex()
+
+
+@bot.listen("on_member_ban")
+async def _ban_index_banned(guild, user):
+    ban_index.banned(guild, user)
+
+
+@bot.listen("on_member_unban")
+async def _ban_index_unbanned(guild, user):
+    ban_index.unbanned(guild, user)
+
+
+@bot.listen("on_guild_remove")
+async def _ban_index_guild_removed(guild):
+    ban_index.forget(guild.id)
 
 
 # ---------- Unban ----------
-@bot.command()
-@commands.has_permissions(ban_members=True)
+@bot.command(extras={"section": "Moderation"})
+@require_permissions(ban_members=True)
 async def unban(ctx, user: str, *, reason="No reason provided"):
     """
-    Unban a member by ID or Username#Discriminator with DM and mod-log.
+    Unban a member by ID, username or Username#Discriminator with DM and mod-log.
     Usage: !unban 123456789012345678
+           !unban someuser
            !unban SomeUser#1234
     """
-    banned_user = None
-    async for ban_entry in ctx.guild.bans():
-        # Match by ID
-        if user.isdigit() and int(user) == ban_entry.user.id:
-            banned_user = ban_entry.user
-            break
-        # Match by username#discriminator
-        elif (
-            user.lower()
-            == f"{ban_entry.user.name}#{ban_entry.user.discriminator}".lower()
-        ):
-            banned_user = ban_entry.user
-            break
+    try:
+        banned_user = await ban_index.find(ctx.guild, user)
+    except discord.Forbidden:
+        return await ctx.send("❌ I do not have permission to view the ban list.")
 
     if banned_user is None:
-        return await ctx.send(f"❌ No banned user found matching `{user}`.")
+        suggestions = await ban_index.search(ctx.guild, user, limit=5)
+        hint = ""
+        if suggestions:
+            hint = "\nDid you mean: " + ", ".join(
+                f"`{u}` ({u.id})" for u in suggestions
+            )
+        return await ctx.send(f"❌ No banned user found matching `{user}`.{hint}")
 
     try:
         await ctx.guild.unban(banned_user, reason=reason)
 
         # DM after unban
-        try:
-            await banned_user.send(
-                f"✅ You have been unbanned from **{ctx.guild.name}**.\nReason: {reason}"
-            )
-        except:
-            pass
+        await dm_dispatcher.post(
+            banned_user,
+            f"✅ You have been unbanned from **{ctx.guild.name}**.\nReason: {reason}",
+        )
     except discord.Forbidden:
         return await ctx.send(f"❌ I do not have permission to unban {banned_user}.")
     except discord.HTTPException:
@@ -1139,17 +2934,112 @@ async def unban(ctx, user: str, *, reason="No reason provided"):
     await ctx.send(embed=embed)
 
     # Mod-log
-    mod_log = ctx.guild.get_channel(MOD_LOG_CHANNEL_ID)
+    mod_log = guild_config.log_channel(ctx.guild)
     if mod_log and mod_log.permissions_for(ctx.guild.me).send_messages:
-        await mod_log.send(embed=embed)
+        log_sink.post_embed(mod_log, embed)
+
+
+# ---------- Warn Storage ----------
+class ModerationStore:
+    """SQLite (WAL) store for warning history.
+
+    Every query runs on one dedicated worker thread, so the connection never
+    changes threads and the event loop never waits on disk. The
+    (guild_id, user_id, created_at) index keeps inserts and per-member lookups
+    logarithmic no matter how large the history grows.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS warnings (
+            id INTEGER PRIMARY KEY,
+            guild_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            moderator_id INTEGER,
+            reason TEXT NOT NULL,
+            created_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_warnings_member
+            ON warnings (guild_id, user_id, created_at);
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = None
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="moderation-db"
+        )
+
+    def _connect(self):
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(self.SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    async def _run(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
+
+    def _count(self, guild_id, user_id):
+        cur = self._connect().execute(
+            "SELECT COUNT(*) FROM warnings WHERE guild_id = ? AND user_id = ?",
+            (guild_id, user_id),
+        )
+        return cur.fetchone()[0]
+
+    def _add(self, guild_id, user_id, moderator_id, reason):
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT INTO warnings (guild_id, user_id, moderator_id, reason, created_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (guild_id, user_id, moderator_id, reason, time.time()),
+            )
+        return self._count(guild_id, user_id)
+
+    def _list(self, guild_id, user_id, limit):
+        cur = self._connect().execute(
+            "SELECT reason, moderator_id, created_at FROM warnings"
+            " WHERE guild_id = ? AND user_id = ?"
+            " ORDER BY created_at DESC LIMIT ?",
+            (guild_id, user_id, limit),
+        )
+        return cur.fetchall()
+
+    def _clear(self, guild_id, user_id):
+        conn = self._connect()
+        with conn:
+            cur = conn.execute(
+                "DELETE FROM warnings WHERE guild_id = ? AND user_id = ?",
+                (guild_id, user_id),
+            )
+        return cur.rowcount
+
+    async def add_warning(self, guild_id, user_id, moderator_id, reason) -> int:
+        """Record a warning and return the member's new total."""
+        return await self._run(self._add, guild_id, user_id, moderator_id, reason)
+
+    async def count_warnings(self, guild_id, user_id) -> int:
+        return await self._run(self._count, guild_id, user_id)
+
+    async def list_warnings(self, guild_id, user_id, limit: int = 10):
+        """Return the newest (reason, moderator_id, created_at) rows."""
+        return await self._run(self._list, guild_id, user_id, limit)
+
+    async def clear_warnings(self, guild_id, user_id) -> int:
+        """Delete a member's warnings and return how many were removed."""
+        return await self._run(self._clear, guild_id, user_id)
+
+
+moderation_store = ModerationStore(MODERATION_DB)
 
 
-# ---------- Warn Checks----------
-user_warnings = {}  # {guild_id: {user_id: [list of reasons]}}
 # ---------- Warn ----------
-@bot.command()
-@commands.has_permissions(kick_members=True)
-async def warn(ctx, member: discord.Member, *, reason="No reason provided"):
+@bot.command(extras={"section": "Moderation"})
+@require_permissions(kick_members=True)
+async def warn(ctx, member: IndexedMember, *, reason="No reason provided"):
     """Warn a member in the server with DM and mod-log."""
 
     # Prevent self-warn or bot-warn
@@ -1160,20 +3050,16 @@ async def warn(ctx, member: discord.Member, *, reason="No reason provided"):
     if member.top_role >= ctx.author.top_role:
         return await ctx.send("❌ You cannot warn someone with an equal or higher role.")
 
-    # Initialize guild warnings
-    guild_warns = user_warnings.setdefault(ctx.guild.id, {})
-    member_warns = guild_warns.setdefault(member.id, [])
-
     # Add the warning
-    member_warns.append(reason)
+    total_warns = await moderation_store.add_warning(
+        ctx.guild.id, member.id, ctx.author.id, reason
+    )
 
-    # DM the member
-    try:
-        await member.send(
-            f"⚠️ You have been warned in **{ctx.guild.name}**.\nReason: {reason}\nTotal warnings: {len(member_warns)}"
-        )
-    except:
-        pass  # Ignore if DMs are closed
+    # DM the member (skipped if DMs are closed)
+    await dm_dispatcher.post(
+        member,
+        f"⚠️ You have been warned in **{ctx.guild.name}**.\nReason: {reason}\nTotal warnings: {total_warns}",
+    )
 
     # Embed for public/mod-log
     embed = discord.Embed(
@@ -1187,7 +3073,7 @@ async def warn(ctx, member: discord.Member, *, reason="No reason provided"):
         name="Warned by", value=f"{ctx.author} ({ctx.author.id})", inline=False
     )
     embed.add_field(name="Reason", value=reason, inline=False)
-    embed.add_field(name="Total Warnings", value=str(len(member_warns)), inline=False)
+    embed.add_field(name="Total Warnings", value=str(total_warns), inline=False)
     embed.set_footer(
         text=f"Requested by {ctx.author}", icon_url=ctx.author.display_avatar.url
     )
@@ -1195,41 +3081,42 @@ async def warn(ctx, member: discord.Member, *, reason="No reason provided"):
     await ctx.send(embed=embed)
 
     # Mod-log
-    mod_log = ctx.guild.get_channel(MOD_LOG_CHANNEL_ID)
+    mod_log = guild_config.log_channel(ctx.guild)
     if mod_log and mod_log.permissions_for(ctx.guild.me).send_messages:
-        await mod_log.send(embed=embed)
+        log_sink.post_embed(mod_log, embed)
 
 
 # Optional: Check Warnings Command
-@bot.command(name="checkwarnings")
-@commands.has_permissions(kick_members=True)
-async def check_warnings(ctx, member: discord.Member):
+@bot.command(name="checkwarnings", extras={"section": "Moderation"})
+@require_permissions(kick_members=True)
+async def check_warnings(ctx, member: IndexedMember):
     """Check how many warnings a member has."""
-    guild_warns = user_warnings.get(ctx.guild.id, {})
-    member_warns = guild_warns.get(member.id, [])
+    count = await moderation_store.count_warnings(ctx.guild.id, member.id)
+    recent = await moderation_store.list_warnings(ctx.guild.id, member.id)
+    reasons = ", ".join(reason for reason, _, _ in recent)
 
     await ctx.send(
-        f"📋 {member} has {len(member_warns)} warning(s).\n"
-        f"Reasons: {member_warns if member_warns else 'None'}"
+        f"📋 {member} has {count} warning(s).\n"
+        f"Reasons: {reasons if reasons else 'None'}"
     )
 
 
 # ---------- Clear Warnings ----------
-@bot.command()
-@commands.has_permissions(kick_members=True)
-async def clearwarn(ctx, member: discord.Member):
+@bot.command(extras={"section": "Moderation"})
+@require_permissions(kick_members=True)
+async def clearwarn(ctx, member: IndexedMember):
     """Clear all warnings for a member."""
-    if member.id in warns:
-        warns.pop(member.id)
+    cleared = await moderation_store.clear_warnings(ctx.guild.id, member.id)
+    if cleared:
         await ctx.send(f"✅ Warnings for {member.mention} have been cleared.")
     else:
         await ctx.send(f"ℹ️ {member.mention} has no warnings.")
 
 
 # ---------- Mute ----------
-@bot.command()
-@commands.has_permissions(manage_roles=True)
-async def mute(ctx, member: discord.Member, *, reason="No reason provided"):
+@bot.command(extras={"section": "Moderation"})
+@require_permissions(manage_roles=True)
+async def mute(ctx, member: IndexedMember, *, reason="No reason provided"):
     """Mute a member in the server with DM and mod-log."""
 
     # Prevent self-mute or bot mute
@@ -1241,15 +3128,16 @@ async def mute(ctx, member: discord.Member, *, reason="No reason provided"):
         return await ctx.send("❌ You cannot mute someone with an equal or higher role.")
 
     # Get or create "Muted" role
-    muted_role = discord.utils.get(ctx.guild.roles, name="Muted")
+    muted_role = guild_config.mute_role(ctx.guild)
     if not muted_role:
         # Optionally create the role automatically
         try:
             muted_role = await ctx.guild.create_role(
-                name="Muted",
+                name=DEFAULT_MUTE_ROLE,
                 permissions=discord.Permissions(send_messages=False, speak=False),
                 reason="Muted role needed for muting members",
             )
+            guild_config.set(ctx.guild.id, "mute_role_id", muted_role.id)
             # Apply role to all text channels
             for channel in ctx.guild.channels:
                 await channel.set_permissions(
@@ -1265,12 +3153,9 @@ async def mute(ctx, member: discord.Member, *, reason="No reason provided"):
         await member.add_roles(muted_role, reason=reason)
 
         # DM notification
-        try:
-            await member.send(
-                f"🔇 You have been muted in **{ctx.guild.name}**.\nReason: {reason}"
-            )
-        except:
-            pass
+        await dm_dispatcher.post(
+            member, f"🔇 You have been muted in **{ctx.guild.name}**.\nReason: {reason}"
+        )
 
     except discord.Forbidden:
         return await ctx.send(f"❌ I do not have permission to mute {member}.")
@@ -1296,17 +3181,49 @@ async def mute(ctx, member: discord.Member, *, reason="No reason provided"):
     await ctx.send(embed=embed)
 
     # Mod-log
-    mod_log = ctx.guild.get_channel(MOD_LOG_CHANNEL_ID)
+    mod_log = guild_config.log_channel(ctx.guild)
     if mod_log and mod_log.permissions_for(ctx.guild.me).send_messages:
-        await mod_log.send(embed=embed)
+        log_sink.post_embed(mod_log, embed)
 
 
 # --------------------------Temporary mute command------------------
-temp_mutes = {}  # {guild_id: {user_id: datetime_end}}
+def tempmute_job_id(guild_id: int, user_id: int) -> str:
+    return f"unmute:{guild_id}:{user_id}"
+
+
+@scheduler.handler("unmute")
+async def expire_tempmute(data):
+    """Lift a temporary mute once its scheduled time has passed."""
+    guild = bot.get_guild(data["guild_id"])
+    if not guild:
+        return
+    muted_role = guild.get_role(data["role_id"])
+    member = await member_fetcher.fetch(guild, data["user_id"], fresh=True)
+    if not member:
+        return  # member left, nothing to undo
+    if not muted_role or muted_role not in member.roles:
+        return
+
+    await member.remove_roles(muted_role, reason="Temporary mute expired")
+
+    # Unmute embed
+    unmute_embed = discord.Embed(
+        title="✅ Temporary Mute Expired",
+        color=discord.Color.green(),
+        timestamp=discord.utils.utcnow(),
+    )
+    unmute_embed.add_field(name="Member", value=f"{member} ({member.id})", inline=False)
+    unmute_embed.add_field(name="Reason", value="Temporary mute expired", inline=False)
+    channel = guild.get_channel(data.get("channel_id"))
+    if channel:
+        await channel.send(embed=unmute_embed)
+    mod_log = guild_config.log_channel(guild)
+    if mod_log and mod_log.permissions_for(guild.me).send_messages:
+        log_sink.post_embed(mod_log, unmute_embed)
 
 
-@bot.command()
-@commands.has_permissions(manage_roles=True)
+@bot.command(extras={"section": "Moderation"})
+@require_permissions(manage_roles=True)
 async def tempmute(
     ctx, member: discord.Member, duration: int, *, reason="No reason provided"
 ):
@@ -1321,7 +3238,7 @@ async def tempmute(
     ):
         return await ctx.send("❌ You cannot mute this member.")
 
-    muted_role = discord.utils.get(ctx.guild.roles, name="Muted")
+    muted_role = guild_config.mute_role(ctx.guild)
     if not muted_role:
         return await ctx.send("❌ Muted role does not exist. Please create it first.")
     if muted_role in member.roles:
@@ -1329,24 +3246,30 @@ async def tempmute(
 
     await member.add_roles(muted_role, reason=reason)
 
-    # Store tempmute end time immediately
-    end_time = datetime.utcnow() + timedelta(minutes=duration)
-    guild_mutes = temp_mutes.setdefault(ctx.guild.id, {})
-    guild_mutes[member.id] = end_time
+    # Schedule the unmute immediately (persisted, survives restarts)
+    scheduler.schedule(
+        tempmute_job_id(ctx.guild.id, member.id),
+        "unmute",
+        time.time() + duration * 60,
+        {
+            "guild_id": ctx.guild.id,
+            "user_id": member.id,
+            "role_id": muted_role.id,
+            "channel_id": ctx.channel.id,
+        },
+    )
 
     # DM
-    try:
-        await member.send(
-            f"🔇 You have been muted in **{ctx.guild.name}** for {duration} minutes.\nReason: {reason}"
-        )
-    except:
-        pass
+    await dm_dispatcher.post(
+        member,
+        f"🔇 You have been muted in **{ctx.guild.name}** for {duration} minutes.\nReason: {reason}",
+    )
 
     # Embed
     embed = discord.Embed(
         title="🔇 Temporary Mute",
         color=discord.Color.dark_gray(),
-        timestamp=datetime.utcnow(),
+        timestamp=discord.utils.utcnow(),
     )
     embed.set_thumbnail(url=member.display_avatar.url)
     embed.add_field(name="Member", value=f"{member} ({member.id})", inline=False)
@@ -1361,56 +3284,29 @@ async def tempmute(
     await ctx.send(embed=embed)
 
     # Mod-log
-    mod_log = ctx.guild.get_channel(MOD_LOG_CHANNEL_ID)
+    mod_log = guild_config.log_channel(ctx.guild)
     if mod_log and mod_log.permissions_for(ctx.guild.me).send_messages:
-        await mod_log.send(embed=embed)
-
-    # Unmute after duration
-    async def unmute_task():
-        await asyncio.sleep(duration * 60)
-        if muted_role in member.roles:
-            await member.remove_roles(muted_role, reason="Temporary mute expired")
-            del guild_mutes[member.id]  # remove tracking
-
-            # Unmute embed
-            unmute_embed = discord.Embed(
-                title="✅ Temporary Mute Expired",
-                color=discord.Color.green(),
-                timestamp=datetime.utcnow(),
-            )
-            unmute_embed.add_field(
-                name="Member", value=f"{member} ({member.id})", inline=False
-            )
-            unmute_embed.add_field(
-                name="Reason", value="Temporary mute expired", inline=False
-            )
-            await ctx.send(embed=unmute_embed)
-            if mod_log and mod_log.permissions_for(ctx.guild.me).send_messages:
-                await mod_log.send(embed=unmute_embed)
-
-    bot.loop.create_task(unmute_task())
+        log_sink.post_embed(mod_log, embed)
 
 
 # ------------------- CHECK MUTE TIME -------------------
-@bot.command()
-async def mutetime(ctx, member: discord.Member = None):
+@bot.command(extras={"section": "Moderation"})
+async def mutetime(ctx, member: IndexedMember = None):
     """Check remaining mute time. Defaults to yourself if no member mentioned."""
     member = member or ctx.author
-    guild_mutes = temp_mutes.get(ctx.guild.id, {})
-    end_time = guild_mutes.get(member.id)
+    job = scheduler.get(tempmute_job_id(ctx.guild.id, member.id))
 
-    if not end_time:
+    if not job:
         if member == ctx.author:
             return await ctx.send("✅ You are not currently temporarily muted.")
         else:
             return await ctx.send(f"✅ {member} is not currently temporarily muted.")
 
-    remaining = end_time - datetime.utcnow()
-    if remaining.total_seconds() <= 0:
-        del guild_mutes[member.id]
+    remaining = job["run_at"] - time.time()
+    if remaining <= 0:
         return await ctx.send(f"✅ {member}'s temporary mute has already expired.")
 
-    hours, remainder = divmod(int(remaining.total_seconds()), 3600)
+    hours, remainder = divmod(int(remaining), 3600)
     minutes, seconds = divmod(remainder, 60)
 
     if member == ctx.author:
@@ -1424,25 +3320,24 @@ async def mutetime(ctx, member: discord.Member = None):
 
 
 # ---------- Unmute ----------
-@bot.command()
-@commands.has_permissions(manage_roles=True)
-async def unmute(ctx, member: discord.Member, *, reason="No reason provided"):
+@bot.command(extras={"section": "Moderation"})
+@require_permissions(manage_roles=True)
+async def unmute(ctx, member: IndexedMember, *, reason="No reason provided"):
     """Unmute a member in the server with DM and mod-log."""
 
-    muted_role = discord.utils.get(ctx.guild.roles, name="Muted")
+    muted_role = guild_config.mute_role(ctx.guild)
     if not muted_role or muted_role not in member.roles:
         return await ctx.send(f"⚠️ {member.mention} is not muted.")
 
     try:
         await member.remove_roles(muted_role, reason=reason)
+        scheduler.cancel(tempmute_job_id(ctx.guild.id, member.id))
 
         # DM notification
-        try:
-            await member.send(
-                f"✅ You have been unmuted in **{ctx.guild.name}**.\nReason: {reason}"
-            )
-        except:
-            pass
+        await dm_dispatcher.post(
+            member,
+            f"✅ You have been unmuted in **{ctx.guild.name}**.\nReason: {reason}",
+        )
 
     except discord.Forbidden:
         return await ctx.send(f"❌ I do not have permission to unmute {member}.")
@@ -1470,15 +3365,15 @@ async def unmute(ctx, member: discord.Member, *, reason="No reason provided"):
     await ctx.send(embed=embed)
 
     # Mod-log
-    mod_log = ctx.guild.get_channel(MOD_LOG_CHANNEL_ID)
+    mod_log = guild_config.log_channel(ctx.guild)
     if mod_log and mod_log.permissions_for(ctx.guild.me).send_messages:
-        await mod_log.send(embed=embed)
+        log_sink.post_embed(mod_log, embed)
 
 
 # ---------- Softban ----------
-@bot.command()
-@commands.has_permissions(ban_members=True)
-async def softban(ctx, member: discord.Member, *, reason="No reason provided"):
+@bot.command(extras={"section": "Moderation"})
+@require_permissions(ban_members=True)
+async def softban(ctx, member: IndexedMember, *, reason="No reason provided"):
     """Softban a member (ban and unban to delete messages)."""
     await member.ban(reason=reason, delete_message_days=7)
     await member.unban(reason="Softban complete")
@@ -1488,8 +3383,8 @@ async def softban(ctx, member: discord.Member, *, reason="No reason provided"):
 
 
 # ---------- Lockdown ----------
-@bot.command()
-@commands.has_permissions(manage_channels=True)
+@bot.command(extras={"section": "Moderation"})
+@require_permissions(manage_channels=True)
 async def lockdown(ctx, channel: discord.TextChannel = None):
     """Lock a text channel to prevent sending messages."""
     channel = channel or ctx.channel
@@ -1498,8 +3393,8 @@ async def lockdown(ctx, channel: discord.TextChannel = None):
 
 
 # ---------- Unlock ----------
-@bot.command()
-@commands.has_permissions(manage_channels=True)
+@bot.command(extras={"section": "Moderation"})
+@require_permissions(manage_channels=True)
 async def unlock(ctx, channel: discord.TextChannel = None):
     """Unlock a previously locked channel."""
     channel = channel or ctx.channel
@@ -1508,34 +3403,34 @@ async def unlock(ctx, channel: discord.TextChannel = None):
 
 
 # ---------- Nickname Change ----------
-@bot.command()
-@commands.has_permissions(manage_nicknames=True)
-async def nick(ctx, member: discord.Member, *, nickname):
+@bot.command(extras={"section": "Moderation"})
+@require_permissions(manage_nicknames=True)
+async def nick(ctx, member: IndexedMember, *, nickname):
     """Change a member's nickname."""
     await member.edit(nick=nickname)
     await ctx.send(f"✏️ Changed nickname of {member.mention} to **{nickname}**")
 
 
 # ---------- Role Management ----------
-@bot.command()
-@commands.has_permissions(manage_roles=True)
-async def addrole(ctx, member: discord.Member, role: discord.Role):
+@bot.command(extras={"section": "Server Setup / Utilities"})
+@require_permissions(manage_roles=True)
+async def addrole(ctx, member: IndexedMember, role: discord.Role):
     """Add a role to a member."""
     await member.add_roles(role)
     await ctx.send(f"✅ Added role {role.name} to {member.mention}")
 
 
-@bot.command()
-@commands.has_permissions(manage_roles=True)
-async def removerole(ctx, member: discord.Member, role: discord.Role):
+@bot.command(extras={"section": "Server Setup / Utilities"})
+@require_permissions(manage_roles=True)
+async def removerole(ctx, member: IndexedMember, role: discord.Role):
     """Remove a role from a member."""
     await member.remove_roles(role)
     await ctx.send(f"❌ Removed role {role.name} from {member.mention}")
 
 
 # ---------- Announcement ----------
-@bot.command()
-@commands.has_permissions(administrator=True)
+@bot.command(extras={"section": "Moderation"})
+@require_permissions(administrator=True)
 async def announce(ctx, *, message):
     """Send an announcement to the current channel."""
     embed = discord.Embed(
@@ -1545,8 +3440,8 @@ async def announce(ctx, *, message):
 
 
 # ---Purge Bot Messages Only---
-@bot.command()
-@commands.has_permissions(manage_messages=True)
+@bot.command(extras={"section": "Moderation"})
+@require_permissions(manage_messages=True)
 async def purgebot(ctx, amount: int = 10):
     """Delete bot messages only in the channel."""
     deleted = await ctx.channel.purge(
@@ -1556,18 +3451,19 @@ async def purgebot(ctx, amount: int = 10):
 
 
 # ---------- View Member Warnings ----------
-@bot.command()
-@commands.has_permissions(kick_members=True)
-async def warnings(ctx, member: discord.Member):
+@bot.command(extras={"section": "Moderation"})
+@require_permissions(kick_members=True)
+async def warnings(ctx, member: IndexedMember):
     """View warnings for a member."""
-    count = warns.get(member.id, 0)
+    count = await moderation_store.count_warnings(ctx.guild.id, member.id)
     await ctx.send(f"⚠️ {member.mention} has {count} warning(s).")
 
 
 # ---------- Set Slowmode ----------
-@bot.command(name="slowmode")
-@commands.has_permissions(manage_channels=True)
+@bot.command(name="slowmode", extras={"section": "Moderation"})
+@require_permissions(manage_channels=True)
 async def slowmode(ctx, channel: discord.TextChannel, seconds: int):
+    """Set slowmode for a channel."""
     try:
         await channel.edit(slowmode_delay=seconds)
         await ctx.send(f"✅ Slowmode set to `{seconds}` seconds in {channel.mention}")
@@ -1575,54 +3471,382 @@ async def slowmode(ctx, channel: discord.TextChannel, seconds: int):
         await ctx.send("❌ I don’t have permission to edit this channel.")
 
 
-# ---------- Announcement with Embed ----------
-@bot.command(name="announce_embed")
-@commands.has_permissions(administrator=True)
-async def announce(ctx, channel: discord.TextChannel, *, message: str):
-    embed = discord.Embed(
-        title="📢 Announcement", description=message, color=discord.Color.gold()
-    )
-    embed.set_footer(text=f"By {ctx.author}")
-    await channel.send(embed=embed)
-    await ctx.send(f"✅ Announcement sent to {channel.mention}")
+# ---------- Announcement with Embed ----------
+@bot.command(name="announce_embed", extras={"section": "Moderation"})
+@require_permissions(administrator=True)
+async def announce(ctx, channel: discord.TextChannel, *, message: str):
+    """Post an announcement embed in a channel."""
+    embed = discord.Embed(
+        title="📢 Announcement", description=message, color=discord.Color.gold()
+    )
+    embed.set_footer(text=f"By {ctx.author}")
+    await channel.send(embed=embed)
+    await ctx.send(f"✅ Announcement sent to {channel.mention}")
+
+
+# ---------- Temporary Role Assignment ----------
+@bot.command(name="temprole", extras={"section": "Server Setup / Utilities"})
+@require_permissions(manage_roles=True)
+async def temprole(ctx, member: IndexedMember, role: discord.Role, seconds: int = 60):
+    """Temporarily assign a role to a member."""
+    await member.add_roles(role, reason=f"Temporary role by {ctx.author}")
+    scheduler.schedule(
+        f"temprole:{ctx.guild.id}:{member.id}:{role.id}",
+        "temprole",
+        time.time() + seconds,
+        {
+            "guild_id": ctx.guild.id,
+            "user_id": member.id,
+            "role_id": role.id,
+            "channel_id": ctx.channel.id,
+        },
+    )
+    await ctx.send(
+        f"✅ Added role {role.name} to {member.mention} for {seconds} seconds."
+    )
+
+
+@scheduler.handler("temprole")
+async def expire_temprole(data):
+    guild = bot.get_guild(data["guild_id"])
+    if not guild:
+        return
+    role = guild.get_role(data["role_id"])
+    member = await member_fetcher.fetch(guild, data["user_id"], fresh=True)
+    if not role or not member or role not in member.roles:
+        return
+    await member.remove_roles(role, reason="Temporary role expired")
+    channel = guild.get_channel(data.get("channel_id"))
+    if channel:
+        await channel.send(f"⏳ Role {role.name} removed from {member.mention}")
+
+
+# ---------- Mass Role Assignment ----------
+BULK_JOBS_FILE = "bulk_jobs.json"
+BULK_CONCURRENCY = 4  # role edits in flight per guild
+BULK_EDITS_PER_SECOND = 4.0  # pacing below the per-guild member-edit limit
+BULK_CHECKPOINT_EVERY = 50  # members per checkpoint
+BULK_PROGRESS_INTERVAL = 5.0  # seconds between progress message edits
+BULK_ABORT_AFTER_FORBIDDEN = 5  # give up if the first edits are all refused
+
+
+def parse_bulk_filters(guild: discord.Guild, tokens) -> dict:
+    """Parse massrole filters: bots, humans, has:<role>, without:<role>,
+    joined>YYYY-MM-DD and joined<YYYY-MM-DD."""
+
+    def role_id(value):
+        value = value.strip("<@&>")
+        role = guild.get_role(int(value)) if value.isdigit() else None
+        role = role or discord.utils.get(guild.roles, name=value)
+        if not role:
+            raise commands.BadArgument(f"Role `{value}` not found.")
+        return role.id
+
+    def timestamp(value):
+        try:
+            return calendar.timegm(time.strptime(value, "%Y-%m-%d"))
+        except ValueError:
+            raise commands.BadArgument(
+                f"Dates must look like 2024-01-31, not `{value}`."
+            )
+
+    filters = {}
+    for token in tokens:
+        lowered = token.lower()
+        if lowered in ("bots", "humans"):
+            filters["bots"] = lowered == "bots"
+        elif lowered.startswith("has:"):
+            filters["has"] = role_id(token[4:])
+        elif lowered.startswith("without:"):
+            filters["without"] = role_id(token[8:])
+        elif lowered.startswith("joined>"):
+            filters["joined_after"] = timestamp(token[7:])
+        elif lowered.startswith("joined<"):
+            filters["joined_before"] = timestamp(token[7:])
+        else:
+            raise commands.BadArgument(f"Unknown filter `{token}`.")
+    return filters
+
+
+def describe_bulk_filters(guild: discord.Guild, filters: dict) -> str:
+    parts = []
+    if "bots" in filters:
+        parts.append("bots only" if filters["bots"] else "humans only")
+    for key, label in (("has", "with"), ("without", "without")):
+        if key in filters:
+            role = guild.get_role(filters[key])
+            parts.append(f"{label} {role.name if role else filters[key]}")
+    for key, label in (
+        ("joined_after", "joined after"),
+        ("joined_before", "joined before"),
+    ):
+        if key in filters:
+            parts.append(
+                f"{label} {time.strftime('%Y-%m-%d', time.gmtime(filters[key]))}"
+            )
+    return ", ".join(parts) or "all members"
+
+
+class BulkRoleEngine:
+    """Resumable bulk role add/remove for `massrole`.
+
+    Members are processed in ascending ID order with at most
+    `BULK_CONCURRENCY` edits in flight, paced to `BULK_EDITS_PER_SECOND`.
+    After every chunk of `BULK_CHECKPOINT_EVERY` members the highest finished
+    ID is checkpointed through the write-behind journal, so a job interrupted
+    by a restart resumes from there (edits are idempotent: members that
+    already have/lack the role are skipped). One message per job is edited
+    with the progress, rate and ETA.
+    """
+
+    def __init__(self, path: str):
+        self.jobs = journal.load("bulk_jobs", path)  # guild_id (str) -> job
+        journal.register("bulk_jobs", path, lambda: self.jobs)
+        self.tasks = {}  # guild_id (str) -> asyncio.Task
+
+    def running(self, guild_id: int) -> bool:
+        task = self.tasks.get(str(guild_id))
+        return task is not None and not task.done()
+
+    def _save(self, gid: str):
+        journal.record("bulk_jobs", "set", [gid], self.jobs[gid])
+
+    def start(self, guild, job: dict):
+        gid = str(guild.id)
+        self.jobs[gid] = job
+        self._save(gid)
+        self.tasks[gid] = asyncio.create_task(self._run(guild, gid))
+
+    def cancel(self, guild_id: int) -> bool:
+        gid = str(guild_id)
+        task = self.tasks.pop(gid, None)
+        if task and task is not asyncio.current_task():
+            task.cancel()
+        if self.jobs.pop(gid, None) is None:
+            return False
+        journal.record("bulk_jobs", "del", [gid])
+        return True
+
+    def resume_all(self):
+        """Restart every checkpointed job whose guild is available."""
+        for gid in list(self.jobs):
+            guild = bot.get_guild(int(gid))
+            if guild and not self.running(guild.id):
+                self.tasks[gid] = asyncio.create_task(self._run(guild, gid))
+
+    @staticmethod
+    def _wanted(member, role, job) -> bool:
+        filters = job["filters"]
+        has_role = role in member.roles
+        if has_role == (job["action"] == "add"):
+            return False
+        if "bots" in filters and member.bot != filters["bots"]:
+            return False
+        if "has" in filters and not member.get_role(filters["has"]):
+            return False
+        if "without" in filters and member.get_role(filters["without"]):
+            return False
+        joined = member.joined_at.timestamp() if member.joined_at else 0
+        if joined < filters.get("joined_after", 0):
+            return False
+        if joined > filters.get("joined_before", float("inf")):
+            return False
+        return True
+
+    async def _run(self, guild: discord.Guild, gid: str):
+        job = self.jobs[gid]
+        role = guild.get_role(job["role_id"])
+        channel = guild.get_channel(job["channel_id"])
+        verb = "Adding" if job["action"] == "add" else "Removing"
+        progress = None
+        if channel and job.get("message_id"):
+            progress = channel.get_partial_message(job["message_id"])
+
+        async def report(text):
+            nonlocal progress
+            if not channel:
+                return
+            try:
+                if progress is None:
+                    progress = await channel.send(text)
+                    job["message_id"] = progress.id
+                    self._save(gid)
+                else:
+                    await progress.edit(content=text)
+            except discord.HTTPException:
+                pass
+
+        if not role:
+            self.cancel(guild.id)
+            return await report("❌ Mass role job stopped: the role no longer exists.")
+
+        members = await chunk_queue.members(guild)
+        pending = sorted(
+            (m for m in members if m.id > job["cursor"] and self._wanted(m, role, job)),
+            key=lambda m: m.id,
+        )
+        job["total"] = job["done"] + job["failed"] + len(pending)
+        self._save(gid)
+
+        semaphore = asyncio.Semaphore(BULK_CONCURRENCY)
+        interval = 1.0 / BULK_EDITS_PER_SECOND
+        next_slot = time.monotonic()
+        started = time.monotonic()
+        processed = 0
+        last_report = 0.0
+        forbidden_streak = 0
+
+        async def edit(member):
+            nonlocal forbidden_streak
+            async with semaphore:
+                try:
+                    if job["action"] == "add":
+                        await member.add_roles(role, reason="massrole")
+                    else:
+                        await member.remove_roles(role, reason="massrole")
+                    job["done"] += 1
+                    forbidden_streak = 0
+                except discord.Forbidden:
+                    job["failed"] += 1
+                    forbidden_streak += 1
+                except discord.HTTPException:
+                    job["failed"] += 1
+
+        for start in range(0, len(pending), BULK_CHECKPOINT_EVERY):
+            chunk = pending[start : start + BULK_CHECKPOINT_EVERY]
+            tasks = []
+            for member in chunk:
+                delay = next_slot - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                next_slot = max(next_slot, time.monotonic()) + interval
+                tasks.append(asyncio.create_task(edit(member)))
+            await asyncio.gather(*tasks)
+            processed += len(chunk)
+            job["cursor"] = chunk[-1].id
+            self._save(gid)
+
+            if job["done"] == 0 and forbidden_streak >= BULK_ABORT_AFTER_FORBIDDEN:
+                self.cancel(guild.id)
+                return await report(
+                    f"❌ Mass role stopped: I can't manage **{role.name}** (check role hierarchy)."
+                )
+
+            now = time.monotonic()
+            if now - last_report >= BULK_PROGRESS_INTERVAL:
+                last_report = now
+                rate = processed / max(now - started, 1e-6)
+                left = job["total"] - job["done"] - job["failed"]
+                await report(
+                    f"⏳ {verb} **{role.name}** ({describe_bulk_filters(guild, job['filters'])}): "
+                    f"{job['done'] + job['failed']:,}/{job['total']:,} "
+                    f"• {rate:.1f}/s • ETA {int(left / rate) if rate else 0}s"
+                )
+
+        summary = (
+            f"✅ Role {role.name} {'given to' if job['action'] == 'add' else 'removed from'} "
+            f"{job['done']:,} members"
+            + (f" ({job['failed']:,} failed)." if job["failed"] else ".")
+        )
+        self.cancel(guild.id)
+        await report(summary)
+
+
+bulk_roles = BulkRoleEngine(BULK_JOBS_FILE)
+
+
+async def start_bulk_role_job(ctx, action: str, role: discord.Role, filters):
+    if bulk_roles.running(ctx.guild.id) or str(ctx.guild.id) in bulk_roles.jobs:
+        return await ctx.send(
+            "⚠️ A mass role job is already running here. Use `!massrole status` or `!massrole cancel`."
+        )
+    job = {
+        "action": action,
+        "role_id": role.id,
+        "filters": parse_bulk_filters(ctx.guild, filters),
+        "channel_id": ctx.channel.id,
+        "message_id": None,
+        "author_id": ctx.author.id,
+        "cursor": 0,
+        "done": 0,
+        "failed": 0,
+        "total": 0,
+    }
+    bulk_roles.start(ctx.guild, job)
+
+
+@bot.group(
+    name="massrole",
+    invoke_without_command=True,
+    extras={"section": "Server Setup / Utilities"},
+)
+@require_permissions(administrator=True)
+async def massrole(ctx, role: discord.Role = None):
+    """Assign a role to all members (see `massrole add/remove` for filters)."""
+    if role is None:
+        return await ctx.send(
+            "Usage: `!massrole add|remove @role [bots|humans|has:<role>|without:<role>|joined>YYYY-MM-DD|joined<YYYY-MM-DD]`, "
+            "`!massrole status`, `!massrole cancel`."
+        )
+    await start_bulk_role_job(ctx, "add", role, [])
+
+
+@massrole.command(name="add")
+@require_permissions(administrator=True)
+async def massrole_add(ctx, role: discord.Role, *filters):
+    """Give a role to every member matching the filters."""
+    await start_bulk_role_job(ctx, "add", role, filters)
 
 
-# ---------- Temporary Role Assignment ----------
-@bot.command(name="temprole")
-@commands.has_permissions(manage_roles=True)
-async def temprole(ctx, member: discord.Member, role: discord.Role, time: int = 60):
-    await member.add_roles(role, reason=f"Temporary role by {ctx.author}")
-    await ctx.send(f"✅ Added role {role.name} to {member.mention} for {time} seconds.")
+@massrole.command(name="remove")
+@require_permissions(administrator=True)
+async def massrole_remove(ctx, role: discord.Role, *filters):
+    """Take a role from every member matching the filters."""
+    await start_bulk_role_job(ctx, "remove", role, filters)
 
-    await asyncio.sleep(time)
-    await member.remove_roles(role, reason="Temporary role expired")
-    await ctx.send(f"⏳ Role {role.name} removed from {member.mention}")
+
+@massrole.command(name="status")
+@require_permissions(administrator=True)
+async def massrole_status(ctx):
+    """Show the progress of the running mass role job."""
+    job = bulk_roles.jobs.get(str(ctx.guild.id))
+    if not job:
+        return await ctx.send("ℹ️ No mass role job is running.")
+    role = ctx.guild.get_role(job["role_id"])
+    await ctx.send(
+        f"⏳ {job['action'].title()} **{role.name if role else job['role_id']}** "
+        f"({describe_bulk_filters(ctx.guild, job['filters'])}): "
+        f"{job['done'] + job['failed']:,}/{job['total']:,} processed."
+    )
 
 
-# ---------- Mass Role Assignment ----------
-@bot.command(name="massrole")
-@commands.has_permissions(administrator=True)
-async def massrole(ctx, role: discord.Role):
-    added = 0
-    for member in ctx.guild.members:
-        if role not in member.roles:
-            try:
-                await member.add_roles(role)
-                added += 1
-            except discord.Forbidden:
-                continue
-    await ctx.send(f"✅ Role {role.name} given to {added} members.")
+@massrole.command(name="cancel")
+@require_permissions(administrator=True)
+async def massrole_cancel(ctx):
+    """Stop the running mass role job."""
+    if bulk_roles.cancel(ctx.guild.id):
+        await ctx.send("🛑 Mass role job cancelled.")
+    else:
+        await ctx.send("ℹ️ No mass role job is running.")
 
 
 # ---------- Role Info ----------
-@bot.command(name="roleinfo")
+@bot.command(name="roleinfo", extras={"section": "General"})
 async def roleinfo(ctx, role: discord.Role):
-    members = [member.mention for member in role.members]
+    """Get information about a role."""
+    # role.members only sees cached members; unchunked guilds are asked in full
+    if ctx.guild.chunked:
+        members = role.members
+    else:
+        members = [m for m in await chunk_queue.members(ctx.guild) if role in m.roles]
+    mentions = ", ".join(m.mention for m in members)
+    if len(mentions) > 1024:
+        mentions = mentions[: mentions.rfind(", ", 0, 1020)] + ", …"
     embed = discord.Embed(title=f"ℹ️ Role Info: {role.name}", color=role.color)
     embed.add_field(name="ID", value=role.id, inline=False)
     embed.add_field(name="Color", value=str(role.color), inline=False)
     embed.add_field(
-        name="Members", value=", ".join(members) if members else "None", inline=False
+        name=f"Members ({len(members)})", value=mentions or "None", inline=False
     )
     embed.add_field(
         name="Permissions",
@@ -1637,35 +3861,133 @@ async def roleinfo(ctx, role: discord.Role):
 # --------------------------
 # Load / Save Reaction Roles
 # --------------------------
+# reaction_roles: {message_id (str): {emoji_key: role_id}}; changes go through
+# the write-behind journal and are flushed by autosave_data.
+def load_reaction_roles():
+    data = journal.load("reaction_roles", RR_FILE)
+    # Older files are keyed by the emoji as typed; rewrite them once so two
+    # spellings of the same emoji can't shadow each other.
+    for msg_id, mapping in data.items():
+        for emoji in [e for e in mapping if emoji_key(e) != e]:
+            key = emoji_key(emoji)
+            role_id = mapping.pop(emoji)
+            if mapping.setdefault(key, role_id) != role_id:
+                print(f"⚠️ Reaction role {emoji} on {msg_id} duplicates {key}, dropped")
+            journal.record("reaction_roles", "del", [msg_id, emoji])
+            journal.record("reaction_roles", "set", [msg_id, key], mapping[key])
+    return data
+
+
+def set_reaction_role(msg_id: str, emoji: str, role_id: int):
+    key = emoji_key(emoji)
+    reaction_roles.setdefault(msg_id, {})[key] = role_id
+    rr_index.add(int(msg_id), key, role_id)
+    journal.record("reaction_roles", "set", [msg_id, key], role_id)
+
+
+def delete_reaction_role(msg_id: str, emoji: str = None):
+    """Drop one emoji mapping, or the whole message when emoji is None/last."""
+    mapping = reaction_roles.get(msg_id)
+    if mapping is None:
+        return
+    if emoji is not None:
+        emoji = emoji_key(emoji)
+        mapping.pop(emoji, None)
+        rr_index.discard(int(msg_id), emoji)
+    if emoji is None or not mapping:
+        rr_index.discard(int(msg_id))
+        del reaction_roles[msg_id]
+        journal.record("reaction_roles", "del", [msg_id])
+    else:
+        journal.record("reaction_roles", "del", [msg_id, emoji])
+
+
 # --------------------------
-# File Storage
+# Reaction Role Index
 # --------------------------
-DATA_FILE = "reaction_roles.json"
+# <:name:id>, <a:name:id> or the bare name:id form
+_CUSTOM_EMOJI_RE = re.compile(r"<?(?:a?:)?\w+:(\d+)>?")
 
 
-def load_reaction_roles():
-    if os.path.exists(DATA_FILE):
-        with open(DATA_FILE, "r") as f:
-            return json.load(f)
-    return {}
+def emoji_key(emoji) -> str:
+    """Normalise a typed emoji string or a PartialEmoji to one lookup key."""
+    emoji_id = getattr(emoji, "id", None)
+    if emoji_id:
+        return str(emoji_id)
+    text = str(emoji).strip()
+    match = _CUSTOM_EMOJI_RE.fullmatch(text)
+    if match:
+        return match.group(1)
+    return text.replace("\ufe0f", "")  # drop variation selectors
 
 
-def save_reaction_roles():
-    with open(DATA_FILE, "w") as f:
-        json.dump(reaction_roles, f, indent=4)
+def emoji_display(key: str) -> str:
+    """Render a stored emoji key back into something Discord displays."""
+    if not key.isdigit():
+        return key
+    emoji = bot.get_emoji(int(key))
+    return str(emoji) if emoji else f"<:emoji:{key}>"
+
+
+class ReactionRoleIndex:
+    """Flat `(message_id, emoji_key) -> role_id` map for the reaction events.
+
+    `messages` doubles as the negative check: a reaction on any other message
+    is rejected with a single set/dict probe on the integer message ID.
+    """
+
+    __slots__ = ("messages", "roles")
+
+    def __init__(self):
+        self.messages = {}  # message_id -> set of emoji keys
+        self.roles = {}  # (message_id, emoji_key) -> role_id
+
+    def rebuild(self, mapping: dict):
+        self.messages.clear()
+        self.roles.clear()
+        for msg_id, emojis in mapping.items():
+            for emoji, role_id in emojis.items():
+                self.add(int(msg_id), emoji, role_id)
+
+    def add(self, message_id: int, emoji, role_id: int):
+        key = emoji_key(emoji)
+        self.messages.setdefault(message_id, set()).add(key)
+        self.roles[(message_id, key)] = int(role_id)
+
+    def discard(self, message_id: int, emoji=None):
+        """Forget one emoji on a message, or the whole message if emoji is None."""
+        keys = self.messages.get(message_id)
+        if keys is None:
+            return
+        drop = set(keys) if emoji is None else {emoji_key(emoji)}
+        for key in drop:
+            self.roles.pop((message_id, key), None)
+        keys -= drop
+        if not keys:
+            del self.messages[message_id]
+
+    def lookup(self, message_id: int, emoji):
+        return self.roles.get((message_id, emoji_key(emoji)))
 
 
 reaction_roles = load_reaction_roles()
+journal.register("reaction_roles", RR_FILE, lambda: reaction_roles)
+rr_index = ReactionRoleIndex()
+rr_index.rebuild(reaction_roles)
 
 # --------------------------
 # Reaction Role Command Group
 # --------------------------
-@bot.group(name="reactionrole", invoke_without_command=True)
-@commands.has_permissions(manage_roles=True)
+@bot.group(
+    name="reactionrole",
+    invoke_without_command=True,
+    extras={"section": "Server Setup / Utilities"},
+)
+@require_permissions(manage_roles=True)
 async def reactionrole(ctx):
     """Base command for reaction roles."""
     await ctx.send(
-        "⚙️ Use one of the subcommands: `add`, `list`, `remove`, or `clear`.\nExample: `!reactionrole add <message_id> <emoji> <role>`"
+        "⚙️ Use one of the subcommands: `add`, `menu`, `list`, `remove`, or `clear`.\nExample: `!reactionrole add <message_id> <emoji> <role>`"
     )
 
 
@@ -1680,11 +4002,7 @@ async def rr_add(ctx, message_id: int, emoji: str, role: discord.Role):
         await message.add_reaction(emoji)
 
         # Save reaction role data
-        if str(message_id) not in reaction_roles:
-            reaction_roles[str(message_id)] = {}
-
-        reaction_roles[str(message_id)][emoji] = role.id
-        save_reaction_roles()
+        set_reaction_role(str(message_id), emoji, role.id)
 
         await ctx.send(f"✅ Reaction role added: {emoji} → {role.name}", delete_after=6)
 
@@ -1712,7 +4030,10 @@ async def rr_list(ctx):
 
     for msg_id, mapping in reaction_roles.items():
         value = "\n".join(
-            [f"{emoji} → <@&{role_id}>" for emoji, role_id in mapping.items()]
+            [
+                f"{emoji_display(key)} → <@&{role_id}>"
+                for key, role_id in mapping.items()
+            ]
         )
         embed.add_field(name=f"Message ID: {msg_id}", value=value, inline=False)
 
@@ -1727,14 +4048,9 @@ async def rr_remove(ctx, message_id: int, emoji: str):
     """Remove a specific emoji from a message’s reaction roles."""
     msg_id = str(message_id)
 
-    if msg_id in reaction_roles and emoji in reaction_roles[msg_id]:
-        del reaction_roles[msg_id][emoji]
-
-        # If message has no roles left, remove the message ID entirely
-        if not reaction_roles[msg_id]:
-            del reaction_roles[msg_id]
-
-        save_reaction_roles()
+    if emoji_key(emoji) in reaction_roles.get(msg_id, {}):
+        # If message has no roles left, the message ID is removed entirely
+        delete_reaction_role(msg_id, emoji)
         await ctx.send(
             f"❌ Removed reaction role for {emoji} on message `{message_id}`.",
             delete_after=6,
@@ -1762,9 +4078,8 @@ async def on_member_update(before, after):
         if not added_roles and not removed_roles:
             return  # No role changes
 
-        # Get log channel (replace with your actual log channel ID)
-        log_channel_id = 1422329487227355366  # 🔧 CHANGE THIS
-        log_channel = bot.get_channel(log_channel_id)
+        # Get log channel (configured with !config log)
+        log_channel = guild_config.log_channel(after.guild)
 
         # Prepare text for DM and log
         added_names = ", ".join([r.name for r in added_roles]) if added_roles else None
@@ -1775,21 +4090,28 @@ async def on_member_update(before, after):
         # --------------------------
         # 💬 Send DM to the member
         # --------------------------
-        try:
-            msg_lines = [f"👋 Hello {after.display_name},"]
-            if added_names:
-                msg_lines.append(
-                    f"✅ You’ve been **given** the following role(s): {added_names}"
-                )
-            if removed_names:
-                msg_lines.append(
-                    f"❌ The following role(s) were **removed**: {removed_names}"
-                )
-            msg_lines.append(f"\nFrom **{after.guild.name}** server.")
-            await after.send("\n".join(msg_lines))
-        except discord.Forbidden:
-            if log_channel:
-                await log_channel.send(f"📪 Could not DM **{after}** (DMs closed).")
+        msg_lines = [f"👋 Hello {after.display_name},"]
+        if added_names:
+            msg_lines.append(
+                f"✅ You’ve been **given** the following role(s): {added_names}"
+            )
+        if removed_names:
+            msg_lines.append(
+                f"❌ The following role(s) were **removed**: {removed_names}"
+            )
+        msg_lines.append(f"\nFrom **{after.guild.name}** server.")
+
+        async def dms_closed():
+            log_sink.post_line(
+                log_channel, f"📪 Could not DM **{after}** (DMs closed)."
+            )
+
+        await dm_dispatcher.post(
+            after,
+            "\n".join(msg_lines),
+            priority=DM_PRIORITY_ROLES,
+            on_forbidden=dms_closed,
+        )
 
         # --------------------------
         # 🧾 Log to moderation channel
@@ -1810,7 +4132,7 @@ async def on_member_update(before, after):
                     name="❌ Roles Removed", value=removed_names, inline=False
                 )
             embed.set_footer(text=f"Guild: {after.guild.name}")
-            await log_channel.send(embed=embed)
+            log_sink.post_embed(log_channel, embed)
 
     except Exception as e:
         print(f"⚠️ Error in on_member_update: {e}")
@@ -1825,8 +4147,7 @@ async def rr_clear(ctx, message_id: int):
     msg_id = str(message_id)
 
     if msg_id in reaction_roles:
-        del reaction_roles[msg_id]
-        save_reaction_roles()
+        delete_reaction_role(msg_id)
         await ctx.send(
             f"🧹 All reaction roles for message `{message_id}` cleared!", delete_after=6
         )
@@ -1837,110 +4158,312 @@ async def rr_clear(ctx, message_id: int):
 
 
 # --------------------------
-# Reaction Add Event
+# Coalesced Role Edits
 # --------------------------
-@bot.event
-async def on_raw_reaction_add(payload):
-    if str(payload.message_id) in reaction_roles:
-        emoji = str(payload.emoji)
-        role_id = reaction_roles[str(payload.message_id)].get(emoji)
-        if not role_id:
-            return
+ROLE_EDIT_DEBOUNCE = 1.5  # seconds of quiet before a member's edits are applied
+ROLE_EDIT_MAX_DELAY = 5.0  # never hold a member's edits longer than this
 
-        guild = bot.get_guild(payload.guild_id)
-        role = guild.get_role(role_id)
-        if not role:
-            return
 
-        member = guild.get_member(payload.user_id)
-        if not member or member.bot:
+class RoleEditCoalescer:
+    """Merge bursts of reaction-role toggles into one member edit.
+
+    Every member has a pending `{role_id: add?}` map where the latest toggle
+    for a role wins. Once the member has been quiet for `delay` seconds the
+    net change is applied with a single `member.edit(roles=...)` and one
+    summary DM, instead of one REST call and one DM per reaction. Members
+    outside the gateway cache get per-role add/remove calls instead, since a
+    fetched copy can't see role changes made after it was fetched and a full
+    role list would overwrite them.
+    """
+
+    def __init__(self, delay=ROLE_EDIT_DEBOUNCE, max_delay=ROLE_EDIT_MAX_DELAY):
+        self.delay = delay
+        self.max_delay = max_delay
+        self.pending = {}  # (guild_id, member_id) -> {role_id: bool}
+        self.first_seen = {}  # (guild_id, member_id) -> loop time of first toggle
+        self.timers = {}  # (guild_id, member_id) -> asyncio.TimerHandle
+        self.tasks = set()  # running _apply tasks, so they aren't collected
+
+    def queue(self, member: discord.Member, role: discord.Role, add: bool):
+        loop = asyncio.get_running_loop()
+        key = (member.guild.id, member.id)
+        self.pending.setdefault(key, {})[role.id] = add
+        first = self.first_seen.setdefault(key, loop.time())
+
+        timer = self.timers.pop(key, None)
+        if timer:
+            timer.cancel()
+        delay = min(self.delay, max(0.0, first + self.max_delay - loop.time()))
+        self.timers[key] = loop.call_later(delay, self._fire, key)
+
+    def _fire(self, key):
+        self.timers.pop(key, None)
+        self.first_seen.pop(key, None)
+        changes = self.pending.pop(key, None)
+        if changes:
+            task = asyncio.create_task(self._apply(key, changes))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def _apply(self, key, changes):
+        guild_id, member_id = key
+        guild = bot.get_guild(guild_id)
+        if not guild:
+            return
+        try:
+            member = await member_fetcher.fetch(guild, member_id, fresh=True)
+        except discord.HTTPException:
+            member = None
+        if not member:
             return
 
+        current = {r.id for r in member.roles}
+        added = [
+            guild.get_role(rid)
+            for rid, add in changes.items()
+            if add and rid not in current
+        ]
+        added = [r for r in added if r]
+        removed = {rid for rid, add in changes.items() if not add and rid in current}
+        if not added and not removed:
+            return  # toggles cancelled each other out
+
         try:
-            await member.add_roles(role)
-            try:
-                await member.send(
-                    f"✅ You’ve been given the **{role.name}** role in **{guild.name}**!"
-                )
-            except discord.Forbidden:
-                pass
+            # Re-read the roles right before writing: a cached member is kept
+            # current by the gateway, so the full list only drops `removed`.
+            cached = guild.get_member(member_id)
+            if cached is not None:
+                added = [r for r in added if r not in cached.roles]
+                roles = [
+                    r
+                    for r in cached.roles
+                    if not r.is_default() and r.id not in removed
+                ]
+                await cached.edit(roles=roles + added, reason="Reaction roles")
+            else:
+                if added:
+                    await member.add_roles(*added, reason="Reaction roles")
+                if removed:
+                    await member.remove_roles(
+                        *(discord.Object(rid) for rid in removed),
+                        reason="Reaction roles",
+                    )
         except discord.Forbidden:
-            print(
-                f"⚠️ Missing permission to add role {role.name} to {member.display_name}"
+            print(f"⚠️ Missing permission to update roles for {member.display_name}")
+            return
+        except discord.HTTPException as e:
+            print(f"⚠️ Failed to update roles for {member.display_name}: {e}")
+            return
+
+        lines = []
+        if added:
+            lines.append(f"✅ Given: {', '.join(f'**{r.name}**' for r in added)}")
+        if removed:
+            names = [guild.get_role(rid) for rid in removed]
+            lines.append(
+                f"❎ Removed: {', '.join(f'**{r.name}**' for r in names if r)}"
+            )
+        lines.append(f"in **{guild.name}**.")
+        await dm_dispatcher.post(member, "\n".join(lines), priority=DM_PRIORITY_ROLES)
+
+
+role_edits = RoleEditCoalescer()
+
+
+# --------------------------
+# Button Role Menus
+# --------------------------
+# Each button's custom_id is "rolemenu:<role_id>", so menus need no stored
+# state and keep working across restarts.
+class RoleMenuButton(
+    discord.ui.DynamicItem[Button], template=r"rolemenu:(?P<role>\d+)"
+):
+    def __init__(self, role_id: int, label: str = "Role"):
+        super().__init__(
+            Button(
+                label=label[:80],
+                style=discord.ButtonStyle.primary,
+                custom_id=f"rolemenu:{role_id}",
+            )
+        )
+        self.role_id = role_id
+
+    @classmethod
+    async def from_custom_id(cls, interaction, item, match):
+        return cls(int(match["role"]), item.label or "Role")
+
+    async def callback(self, interaction: discord.Interaction):
+        member = interaction.user
+        role = interaction.guild.get_role(self.role_id) if interaction.guild else None
+        if not role or not isinstance(member, discord.Member):
+            await interaction.response.send_message(
+                "❌ That role no longer exists.", ephemeral=True
+            )
+            return
+
+        # Toggle against the pending edit too, so rapid clicks flip back and forth.
+        pending = role_edits.pending.get((member.guild.id, member.id), {})
+        add = not pending.get(role.id, member.get_role(role.id) is not None)
+        role_edits.queue(member, role, add=add)
+        if add:
+            text = f"✅ You'll get **{role.name}** in a moment."
+        else:
+            text = f"❎ **{role.name}** will be removed in a moment."
+        await interaction.response.send_message(text, ephemeral=True)
+
+
+@reactionrole.command(name="menu")
+async def rr_menu(
+    ctx, channel: discord.TextChannel, roles: commands.Greedy[discord.Role]
+):
+    """Post a button menu that toggles the given roles."""
+    if not roles:
+        return await ctx.send("⚠️ Mention at least one role.", delete_after=5)
+    if len(roles) > 25:
+        return await ctx.send("⚠️ A menu can hold at most 25 roles.", delete_after=5)
+    top = ctx.guild.me.top_role
+    blocked = [r.name for r in roles if r.managed or r >= top]
+    if blocked:
+        return await ctx.send(
+            f"❌ I can't assign: {', '.join(blocked)} (managed or above my role).",
+            delete_after=8,
+        )
+    if ctx.author != ctx.guild.owner:
+        above = [r.name for r in roles if r >= ctx.author.top_role]
+        if above:
+            return await ctx.send(
+                f"❌ You cannot hand out roles equal to or above your own: {', '.join(above)}.",
+                delete_after=8,
             )
 
+    embed = discord.Embed(
+        title="🎭 Pick your roles",
+        description="\n".join(f"• {r.mention}" for r in roles)
+        + "\n\nClick a button to add the role, click again to remove it.",
+        color=discord.Color.blurple(),
+    )
+    view = stateless_view(*(RoleMenuButton(r.id, r.name) for r in roles))
+    try:
+        await channel.send(embed=embed, view=view)
+    except discord.Forbidden:
+        return await ctx.send(
+            f"❌ Missing permission to post in {channel.mention}.", delete_after=5
+        )
+    await ctx.send(f"✅ Role menu posted in {channel.mention}.", delete_after=6)
+
+
+# --------------------------
+# Reaction Add Event
+# --------------------------
+@bot.event
+async def on_raw_reaction_add(payload):
+    # Reactions on ordinary messages stop at this single probe.
+    if payload.message_id not in rr_index.messages:
+        return
+    role_id = rr_index.lookup(payload.message_id, payload.emoji)
+    if not role_id:
+        return
+
+    guild = bot.get_guild(payload.guild_id)
+    if not guild:
+        return
+    role = guild.get_role(role_id)
+    if not role:
+        return
+
+    member = payload.member  # sent with every guild reaction add
+    if not member or member.bot:
+        return
+
+    role_edits.queue(member, role, add=True)
+
 
 # --------------------------
 # Reaction Remove Event
 # --------------------------
 @bot.event
 async def on_raw_reaction_remove(payload):
-    if str(payload.message_id) in reaction_roles:
-        emoji = str(payload.emoji)
-        role_id = reaction_roles[str(payload.message_id)].get(emoji)
-        if not role_id:
-            return
+    # Reactions on ordinary messages stop at this single probe.
+    if payload.message_id not in rr_index.messages:
+        return
+    role_id = rr_index.lookup(payload.message_id, payload.emoji)
+    if not role_id:
+        return
 
-        guild = bot.get_guild(payload.guild_id)
-        role = guild.get_role(role_id)
-        if not role:
-            return
+    guild = bot.get_guild(payload.guild_id)
+    if not guild:
+        return
+    role = guild.get_role(role_id)
+    if not role:
+        return
 
-        member = guild.get_member(payload.user_id)
-        if not member or member.bot:
-            return
+    try:
+        member = await member_fetcher.fetch(guild, payload.user_id)
+    except discord.HTTPException:
+        return
+    if not member or member.bot:
+        return
 
-        try:
-            await member.remove_roles(role)
-            try:
-                await member.send(
-                    f"❎ The **{role.name}** role has been removed in **{guild.name}**."
-                )
-            except discord.Forbidden:
-                pass
-        except discord.Forbidden:
-            print(
-                f"⚠️ Missing permission to remove role {role.name} from {member.display_name}"
-            )
+    role_edits.queue(member, role, add=False)
 
 
 # ---------------- Role & Channel Management ----------------
 
 # Delete a role
-@bot.command(name="deleterole")
-@commands.has_permissions(manage_roles=True)
+@bot.command(name="deleterole", extras={"section": "Server Setup / Utilities"})
+@require_permissions(manage_roles=True)
 async def deleterole(ctx, *, role_name: str):
-    role = discord.utils.get(ctx.guild.roles, name=role_name)
-    if role:
+    """Delete a role by name or ID."""
+    role, candidates = name_index.unique(ctx.guild, "roles", role_name)
+    if candidates:
+        listed = "\n".join(f"• **{r.name}** — `{r.id}`" for r in candidates)
+        await ctx.send(
+            f"⚠️ Several roles match **{role_name}**, nothing was deleted:\n{listed}\n"
+            f"Run `{ctx.prefix}deleterole <id>` with the one you mean."
+        )
+    elif role:
         try:
             await role.delete(reason=f"Deleted by {ctx.author}")
-            await ctx.send(f"✅ Role **{role_name}** has been deleted.")
+            await ctx.send(f"✅ Role **{role.name}** has been deleted.")
         except discord.Forbidden:
             await ctx.send("❌ I do not have permission to delete this role.")
     else:
-        await ctx.send(f"❌ Role **{role_name}** not found.")
+        await ctx.send(name_index.not_found(ctx.guild, "roles", "Role", role_name))
 
 
 # Delete a channel
-@bot.command(name="deletechannel")
-@commands.has_permissions(manage_channels=True)
+@bot.command(name="deletechannel", extras={"section": "Server Setup / Utilities"})
+@require_permissions(manage_channels=True)
 async def deletechannel(ctx, *, channel_name: str):
-    channel = discord.utils.get(ctx.guild.channels, name=channel_name)
-    if channel:
+    """Delete a channel by name or ID."""
+    channel, candidates = name_index.unique(ctx.guild, "channels", channel_name)
+    if candidates:
+        listed = "\n".join(
+            f"• **{c.name}** in {c.category.name if c.category else 'no category'} — `{c.id}`"
+            for c in candidates
+        )
+        await ctx.send(
+            f"⚠️ Several channels match **{channel_name}**, nothing was deleted:\n{listed}\n"
+            f"Run `{ctx.prefix}deletechannel <id>` with the one you mean."
+        )
+    elif channel:
         try:
             await channel.delete(reason=f"Deleted by {ctx.author}")
-            await ctx.send(f"✅ Channel **{channel_name}** has been deleted.")
+            await ctx.send(f"✅ Channel **{channel.name}** has been deleted.")
         except discord.Forbidden:
             await ctx.send("❌ I do not have permission to delete this channel.")
     else:
-        await ctx.send(f"❌ Channel **{channel_name}** not found.")
+        await ctx.send(
+            name_index.not_found(ctx.guild, "channels", "Channel", channel_name)
+        )
 
 
 # Rename a channel
-@bot.command(name="renamechannel")
-@commands.has_permissions(manage_channels=True)
+@bot.command(name="renamechannel", extras={"section": "Server Setup / Utilities"})
+@require_permissions(manage_channels=True)
 async def renamechannel(ctx, old_name: str, *, new_name: str):
-    channel = discord.utils.get(ctx.guild.channels, name=old_name)
+    """Rename a channel."""
+    channel = name_index.channel(ctx.guild, old_name)
     if channel:
         try:
             await channel.edit(name=new_name, reason=f"Renamed by {ctx.author}")
@@ -1948,14 +4471,15 @@ async def renamechannel(ctx, old_name: str, *, new_name: str):
         except discord.Forbidden:
             await ctx.send("❌ I do not have permission to rename this channel.")
     else:
-        await ctx.send(f"❌ Channel **{old_name}** not found.")
+        await ctx.send(name_index.not_found(ctx.guild, "channels", "Channel", old_name))
 
 
 # Rename a role
-@bot.command(name="renamerole")
-@commands.has_permissions(manage_roles=True)
+@bot.command(name="renamerole", extras={"section": "Server Setup / Utilities"})
+@require_permissions(manage_roles=True)
 async def renamerole(ctx, old_name: str, *, new_name: str):
-    role = discord.utils.get(ctx.guild.roles, name=old_name)
+    """Rename a role."""
+    role = name_index.role(ctx.guild, old_name)
     if role:
         try:
             await role.edit(name=new_name, reason=f"Renamed by {ctx.author}")
@@ -1963,7 +4487,7 @@ async def renamerole(ctx, old_name: str, *, new_name: str):
         except discord.Forbidden:
             await ctx.send("❌ I do not have permission to rename this role.")
     else:
-        await ctx.send(f"❌ Role **{old_name}** not found.")
+        await ctx.send(name_index.not_found(ctx.guild, "roles", "Role", old_name))
 
     # ----- Channels button------
     @discord.ui.button(label="📁 Channels", style=discord.ButtonStyle.secondary)
@@ -2008,28 +4532,34 @@ async def renamerole(ctx, old_name: str, *, new_name: str):
 # ---------------- CREATE CHANNEL, ROLES, VC, WITH INTERACTIVE PROMPTS ----------------
 
 
-@bot.command(name="create")
-@commands.has_permissions(administrator=True)
+@bot.command(name="create", extras={"section": "Server Setup / Utilities"})
+@require_permissions(administrator=True)
 async def create(ctx):
+    """Interactively create a channel, category or role."""
     # Step 1: Ask what to create
     options = ["text", "voice", "category", "role"]
-    await ctx.send("⚙️ What would you like to create? (text / voice / category / role)")
-
-    def check(m):
-        return m.author == ctx.author and m.channel == ctx.channel
+    try:
+        msg = await conversations.ask(
+            ctx,
+            "⚙️ What would you like to create? (text / voice / category / role)",
+            timeout=30,
+        )
+        choice = msg.content.lower()
 
-    msg = await bot.wait_for("message", check=check, timeout=30)
-    choice = msg.content.lower()
+        if choice not in options:
+            return await ctx.send(
+                "❌ Invalid choice. Please choose text/voice/category/role."
+            )
 
-    if choice not in options:
-        return await ctx.send(
-            "❌ Invalid choice. Please choose text/voice/category/role."
+        # Step 2: Ask for name
+        msg = await conversations.ask(
+            ctx, f"✏️ Enter a name for the new {choice}:", timeout=30
         )
-
-    # Step 2: Ask for name
-    await ctx.send(f"✏️ Enter a name for the new {choice}:")
-    msg = await bot.wait_for("message", check=check, timeout=30)
-    name = msg.content
+        name = msg.content
+    except ConversationCancelled:
+        return await ctx.send("❌ Cancelled.")
+    except asyncio.TimeoutError:
+        return await ctx.send("⌛ Timed out. Run `!create` again.")
 
     # Step 3: Create
     if choice == "text":
@@ -2058,12 +4588,13 @@ async def create_error(ctx, error):
 # ---------------- DYNAMIC ROLE COMMAND ----------------
 @bot.command(
     name="add_role",
+    extras={"section": "Server Setup / Utilities"},
 )
-@commands.has_permissions(administrator=True)
+@require_permissions(administrator=True)
 async def add_role(ctx, *, role_name: str):
     """Create a role with a custom name"""
     guild = ctx.guild
-    existing_role = discord.utils.get(guild.roles, name=role_name)
+    existing_role = name_index.role(guild, role_name, exact=True)
 
     if existing_role:
         await ctx.send(f"⚠️ Role `{role_name}` already exists.")
@@ -2074,12 +4605,14 @@ async def add_role(ctx, *, role_name: str):
 
 
 # ---------------- DYNAMIC TEXT CHANNEL COMMAND ----------------
-@bot.command(name="addtext")
-@commands.has_permissions(administrator=True)
+@bot.command(name="addtext", extras={"section": "Server Setup / Utilities"})
+@require_permissions(administrator=True)
 async def add_text_channel(ctx, *, channel_name: str):
     """Create a text channel with a custom name"""
     guild = ctx.guild
-    existing_channel = discord.utils.get(guild.text_channels, name=channel_name)
+    existing_channel = name_index.channel(
+        guild, text_channel_name(channel_name), discord.TextChannel
+    )
 
     if existing_channel:
         await ctx.send(f"⚠️ Text channel `{channel_name}` already exists.")
@@ -2090,12 +4623,14 @@ async def add_text_channel(ctx, *, channel_name: str):
 
 
 # ---------------- DYNAMIC VOICE CHANNEL COMMAND ----------------
-@bot.command(name="addvoice")
-@commands.has_permissions(administrator=True)
+@bot.command(name="addvoice", extras={"section": "Server Setup / Utilities"})
+@require_permissions(administrator=True)
 async def add_voice_channel(ctx, *, channel_name: str):
     """Create a voice channel with a custom name"""
     guild = ctx.guild
-    existing_channel = discord.utils.get(guild.voice_channels, name=channel_name)
+    existing_channel = name_index.channel(
+        guild, channel_name, discord.VoiceChannel, exact=True
+    )
 
     if existing_channel:
         await ctx.send(f"⚠️ Voice channel `{channel_name}` already exists.")
@@ -2105,10 +4640,6 @@ async def add_voice_channel(ctx, *, channel_name: str):
     await ctx.send(f"✅ Voice channel `{channel_name}` has been created!")
 
 
-import asyncio
-import json
-import os
-
 # ---------------- INTERACTIVE SERVER SETUP WIZARD ----------------
 # ---------------- INTERACTIVE SERVER SETUP WIZARD ----------------
 # ---------------- INTERACTIVE SERVER SETUP WIZARD ----------------
@@ -2117,9 +4648,6 @@ import os
 # ---------------- INTERACTIVE SERVER SETUP WIZARD ----------------
 # ---------------- INTERACTIVE SERVER SETUP WIZARD ----------------
 # ---------- Server Setup System (Hybrid) ----------
-import discord
-from discord.ext import commands
-
 SETUP_DATA = "setup_sessions.json"
 TEMPLATES_FILE = "server_templates.json"
 LOG_CHANNEL_NAME = "admin-mod-logs"  # created automatically if missing
@@ -2152,23 +4680,33 @@ def save_sessions():
     save_json(SETUP_DATA, setup_sessions)
 
 
+def _write_text(path, text):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+_sessions_write_lock = asyncio.Lock()
+
+
+async def save_sessions_async():
+    """save_sessions() off the event loop: serialize here, write in a thread."""
+    data = json.dumps(setup_sessions, indent=2, ensure_ascii=False)
+    async with _sessions_write_lock:
+        await asyncio.to_thread(_write_text, SETUP_DATA, data)
+
+
 def save_templates():
     save_json(TEMPLATES_FILE, templates)
 
 
 # --- utility functions ---
-def is_cancel_or_stop(msg_content: str):
-    return msg_content.strip().lower() in ("cancel", "stop", "abort")
-
-
 async def ensure_role_exists(guild: discord.Guild, role_name: str):
     """Return a Role object; create if doesn't exist (except @everyone)."""
     role_name = role_name.strip()
     if role_name == "@everyone":
         return guild.default_role
-    # try mention or ID
     # try by exact name first
-    role = discord.utils.find(lambda r: r.name == role_name, guild.roles)
+    role = name_index.role(guild, role_name, exact=True)
     if role:
         return role
     # try by id if numeric
@@ -2179,6 +4717,7 @@ async def ensure_role_exists(guild: discord.Guild, role_name: str):
     # create role
     try:
         new_role = await guild.create_role(name=role_name)
+        name_index.add(new_role)  # don't wait for the role-create event
         return new_role
     except discord.Forbidden:
         return None
@@ -2191,7 +4730,7 @@ def role_names_to_ids(guild: discord.Guild, names_list):
         name = name.strip()
         if not name:
             continue
-        r = discord.utils.find(lambda rr: rr.name == name, guild.roles)
+        r = name_index.role(guild, name, exact=True)
         if r:
             found.append(r.id)
         else:
@@ -2212,9 +4751,447 @@ def overwrite_from_choice(guild, role_id_or_name, allow_send=True, allow_view=Tr
     return perm
 
 
+# --- setup plan execution ---
+SETUP_CONCURRENCY = 4  # creations in flight; discord.py backs off on 429s itself
+SETUP_REQUEST_SECONDS = 0.6  # rough cost of one create/edit call, for estimates
+SETUP_SAVE_INTERVAL = 2.0  # seconds between progress writes while a plan runs
+
+
+class SetupNode:
+    """One plan step: create, edit or delete a role, category or channel."""
+
+    __slots__ = ("key", "kind", "name", "deps", "data")
+
+    def __init__(self, key, kind, name, deps=(), data=None):
+        self.key = key
+        self.kind = kind  # "role", "category", "text" or "voice"
+        self.name = name
+        self.deps = list(deps)
+        self.data = data or {}
+
+
+def compile_setup_plan(session) -> list:
+    """Compile a setup session into plan nodes (roles -> categories -> channels)."""
+    nodes = {}
+
+    def unique(key):
+        base, n = key, 2
+        while key in nodes:
+            key, n = f"{base}#{n}", n + 1
+        return key
+
+    def add_role(name):
+        key = f"role:{name}"
+        if key not in nodes:
+            nodes[key] = SetupNode(key, "role", name)
+        return key
+
+    for name in session.get("roles", []):
+        if name.strip() and name.strip() != "@everyone":
+            add_role(name.strip())
+    # roles named in allow lists are created for the overwrite, as before
+    for c in session.get("categories", []):
+        for name in c.get("permissions", {}).get("allow", []):
+            if name != "@everyone":
+                add_role(name)
+
+    for c in session.get("categories", []):
+        perms = c.get("permissions", {})
+        allow = perms.get("allow", [])
+        deny = perms.get("deny", [])
+        deps = [f"role:{n}" for n in allow + deny if f"role:{n}" in nodes]
+        cat_key = unique(f"category:{c['name']}")
+        nodes[cat_key] = SetupNode(
+            cat_key, "category", c["name"], deps, {"allow": allow, "deny": deny}
+        )
+        for kind, names in (
+            ("text", c.get("text_channels", [])),
+            ("voice", c.get("voice_channels", [])),
+        ):
+            for name in names:
+                key = unique(f"{kind}:{cat_key[9:]}/{name}")
+                nodes[key] = SetupNode(key, kind, name, [cat_key])
+    return list(nodes.values())
+
+
+def category_overwrites(guild: discord.Guild, roles: dict, allow, deny) -> dict:
+    """Overwrites for a setup category: locked for @everyone, opened per role."""
+    overwrites = {guild.default_role: discord.PermissionOverwrite(view_channel=False)}
+    for name in allow:
+        role = roles.get(name)
+        if role:
+            overwrites[role] = discord.PermissionOverwrite(
+                view_channel=True, send_messages=True
+            )
+    for name in deny:
+        role = roles.get(name)
+        if role:
+            overwrites[role] = discord.PermissionOverwrite(
+                view_channel=False, send_messages=False
+            )
+    return overwrites
+
+
+class SetupPlanRunner:
+    """Run a compiled setup plan against a guild.
+
+    A node starts as soon as its dependencies have finished, with at most
+    `SETUP_CONCURRENCY` creations in flight. Roles are resolved through one
+    name index built up front instead of scanning `guild.roles` per lookup.
+    Each finished node stores the object's ID in `session["progress"]`, so
+    running the plan again after a failure only does the remaining nodes.
+    Progress is written at most every `SETUP_SAVE_INTERVAL` seconds and once
+    more when the run ends.
+    """
+
+    def __init__(self, guild: discord.Guild, session: dict, persist: bool = True):
+        self.guild = guild
+        self.session = session
+        self.persist = persist
+        self.progress = session.setdefault("progress", {})  # node key -> object id
+        self.roles = {r.name: r for r in guild.roles}
+        self.objects = {}  # node key -> role/channel
+        self.created = {}  # kind -> count
+        self.reused = 0
+        self.failed = []  # (node, exception)
+        self.skipped = []  # nodes whose parent failed
+        self.semaphore = asyncio.Semaphore(SETUP_CONCURRENCY)
+        self.dirty = False
+        self.saved_at = time.monotonic()
+
+    async def _save(self, force: bool = False):
+        if not (self.persist and self.dirty):
+            return
+        if force or time.monotonic() - self.saved_at >= SETUP_SAVE_INTERVAL:
+            self.dirty = False
+            self.saved_at = time.monotonic()
+            await save_sessions_async()
+
+    def _restore(self, node):
+        obj_id = self.progress.get(node.key)
+        if "run" in node.data or node.kind in ("overwrites", "delete"):
+            return None
+        if node.kind == "role":
+            role = self.guild.get_role(obj_id) if obj_id else None
+            return role or self.roles.get(node.name)
+        return self.guild.get_channel(obj_id) if obj_id else None
+
+    def _overwrites(self, node):
+        return category_overwrites(
+            self.guild, self.roles, node.data["allow"], node.data["deny"]
+        )
+
+    async def _create(self, node):
+        if "run" in node.data:
+            return await node.data["run"]()
+        if node.kind == "role":
+            role = await self.guild.create_role(name=node.name)
+            self.roles[role.name] = role
+            return role
+        if node.kind == "category":
+            return await self.guild.create_category(
+                node.name, overwrites=self._overwrites(node)
+            )
+        if node.kind == "overwrites":
+            # Merge, so Muted-role denies and hand-made overwrites survive
+            category = self.guild.get_channel(node.data["category_id"])
+            overwrites = dict(category.overwrites)
+            overwrites.update(self._overwrites(node))
+            await category.edit(overwrites=overwrites)
+            return category
+        if node.kind == "delete":
+            channel = self.guild.get_channel(node.data["channel_id"])
+            await channel.delete(reason="Pruned by setup template")
+            return channel
+        if node.deps:
+            category = self.objects[node.deps[0]]
+        else:
+            category = self.guild.get_channel(node.data["category_id"])
+        if node.kind == "text":
+            return await self.guild.create_text_channel(node.name, category=category)
+        return await self.guild.create_voice_channel(node.name, category=category)
+
+    async def _run_node(self, node):
+        obj = self._restore(node)
+        if obj is None:
+            async with self.semaphore:
+                obj = await self._create(node)
+            self.created[node.kind] = self.created.get(node.kind, 0) + 1
+        else:
+            self.reused += 1
+        self.objects[node.key] = obj
+        self.progress[node.key] = obj.id
+        self.dirty = True
+
+    async def run(self, nodes):
+        by_key = {n.key: n for n in nodes}
+        waiting = {n.key: {d for d in n.deps if d in by_key} for n in nodes}
+        children = {}
+        for key, deps in waiting.items():
+            for dep in deps:
+                children.setdefault(dep, []).append(key)
+        running = {}  # task -> node key
+
+        def release(key):
+            for child in children.get(key, ()):
+                waiting[child].discard(key)
+                if not waiting[child]:
+                    start(child)
+
+        def skip(key):
+            for child in children.get(key, ()):
+                if waiting.pop(child, None) is not None:
+                    self.skipped.append(by_key[child])
+                    skip(child)
+
+        def start(key):
+            del waiting[key]
+            running[asyncio.create_task(self._run_node(by_key[key]))] = key
+
+        for key in [k for k, deps in waiting.items() if not deps]:
+            start(key)
+        try:
+            while running:
+                done, _ = await asyncio.wait(
+                    running, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    key = running.pop(task)
+                    error = task.exception()
+                    if error is None:
+                        release(key)
+                        continue
+                    if not isinstance(error, discord.HTTPException):
+                        raise error
+                    self.failed.append((by_key[key], error))
+                    if by_key[key].kind == "role":
+                        release(
+                            key
+                        )  # the category is still created without that overwrite
+                    else:
+                        skip(key)
+                await self._save()
+        finally:
+            # On an unexpected error (or cancellation) stop the sibling nodes
+            # instead of leaving them running without an owner.
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+            await self._save(force=True)
+
+    def summary(self) -> str:
+        text = describe_plan_counts(self.created) or "no changes"
+        if self.reused:
+            text += f", {self.reused} already existed"
+        if self.failed or self.skipped:
+            text += f", {len(self.failed)} failed, {len(self.skipped)} skipped"
+        return text
+
+
+PLAN_LABELS = (
+    ("role", "roles"),
+    ("category", "categories"),
+    ("text", "text channels"),
+    ("voice", "voice channels"),
+    ("forum", "forum channels"),
+    ("stage", "stage channels"),
+    ("overwrites", "permission updates"),
+    ("delete", "deletions"),
+    ("update", "updates"),
+    ("positions", "role reorders"),
+)
+
+
+def count_plan(nodes) -> dict:
+    counts = {}
+    for node in nodes:
+        counts[node.kind] = counts.get(node.kind, 0) + 1
+    return counts
+
+
+def plan_embed(title: str, nodes, hint: str) -> discord.Embed:
+    """Embed listing a plan's nodes by kind, with a request/time estimate."""
+    embed = discord.Embed(title=title, color=discord.Color.orange())
+    for kind, label in PLAN_LABELS:
+        names = [n.name for n in nodes if n.kind == kind]
+        if names:
+            shown = ", ".join(f"`{n}`" for n in names[:15])
+            more = f" (+{len(names) - 15} more)" if len(names) > 15 else ""
+            embed.add_field(name=label.capitalize(), value=shown + more, inline=False)
+    embed.set_footer(
+        text=f"{len(nodes)} API requests, about {estimate_plan(nodes):.0f}s. {hint}"
+    )
+    return embed
+
+
+def describe_plan_counts(counts: dict) -> str:
+    return ", ".join(
+        f"{counts[k]} {label}" for k, label in PLAN_LABELS if counts.get(k)
+    )
+
+
+def describe_plan_failures(failed) -> str:
+    return "\n".join(
+        f"• {node.kind} `{node.name}`: "
+        + ("missing permission" if isinstance(e, discord.Forbidden) else str(e))
+        for node, e in failed[:10]
+    )
+
+
+def estimate_plan(nodes) -> float:
+    """Rough seconds to run a plan: dependency depth or concurrency, whichever dominates."""
+    depth = {}
+    for node in nodes:  # plans list parents before children
+        depth[node.key] = 1 + max((depth.get(d, 0) for d in node.deps), default=0)
+    waves = max(max(depth.values(), default=0), -(-len(nodes) // SETUP_CONCURRENCY))
+    return waves * SETUP_REQUEST_SECONDS
+
+
+def text_channel_name(name: str) -> str:
+    # Discord stores text channel names lowercased with dashes for spaces
+    return name.strip().lower().replace(" ", "-")
+
+
+def _overwrite_values(overwrites: dict) -> dict:
+    return {
+        target.id: tuple(p.value for p in ow.pair())
+        for target, ow in overwrites.items()
+    }
+
+
+def diff_template(guild: discord.Guild, template: dict, prune: bool = False) -> list:
+    """Plan nodes that bring the guild in line with a template.
+
+    Roles and categories are matched by name and channels by name within
+    their category, so only missing objects are created. Category overwrites
+    are compared and merged only for the targets the template names, so
+    Muted-role denies and hand-made overwrites are left alone and a repeat
+    run is a no-op. With `prune`, channels in the template's categories that
+    the template does not list are deleted.
+    An empty list means the guild already matches.
+    """
+    roles = {r.name: r for r in guild.roles}
+    categories = {}
+    for category in guild.categories:
+        categories.setdefault(category.name, category)
+    nodes = {}
+
+    def add(key, *args):
+        base, n = key, 2
+        while key in nodes:
+            key, n = f"{base}#{n}", n + 1
+        nodes[key] = SetupNode(key, *args)
+        return key
+
+    wanted_roles = [r.strip() for r in template.get("roles", [])]
+    for c in template.get("categories", []):
+        wanted_roles += c.get("permissions", {}).get("allow", [])
+    for name in dict.fromkeys(wanted_roles):
+        if name and name != "@everyone" and name not in roles:
+            add(f"role:{name}", "role", name)
+
+    for c in template.get("categories", []):
+        perms = c.get("permissions", {})
+        allow = perms.get("allow", [])
+        deny = perms.get("deny", [])
+        deps = [f"role:{n}" for n in allow + deny if f"role:{n}" in nodes]
+        category = categories.get(c["name"])
+        if category is None:
+            cat_key = add(
+                f"category:{c['name']}",
+                "category",
+                c["name"],
+                deps,
+                {"allow": allow, "deny": deny},
+            )
+            for kind in ("text", "voice"):
+                for name in c.get(f"{kind}_channels", []):
+                    add(f"{kind}:{c['name']}/{name}", kind, name, [cat_key])
+            continue
+
+        current = _overwrite_values(category.overwrites)
+        desired = _overwrite_values(category_overwrites(guild, roles, allow, deny))
+        if deps or any(current.get(t) != v for t, v in desired.items()):
+            add(
+                f"overwrites:{category.id}",
+                "overwrites",
+                category.name,
+                deps,
+                {"allow": allow, "deny": deny, "category_id": category.id},
+            )
+
+        live = {
+            "text": {ch.name: ch for ch in category.text_channels},
+            "voice": {ch.name: ch for ch in category.voice_channels},
+        }
+        for kind in ("text", "voice"):
+            wanted = set()
+            for name in c.get(f"{kind}_channels", []):
+                key_name = text_channel_name(name) if kind == "text" else name
+                wanted.add(key_name)
+                if key_name not in live[kind]:
+                    add(
+                        f"{kind}:{category.name}/{name}",
+                        kind,
+                        name,
+                        (),
+                        {"category_id": category.id},
+                    )
+            if prune:
+                for name, channel in live[kind].items():
+                    if name not in wanted:
+                        add(
+                            f"delete:{channel.id}",
+                            "delete",
+                            name,
+                            (),
+                            {"channel_id": channel.id},
+                        )
+    return list(nodes.values())
+
+
+async def execute_setup_session(ctx, session, log_channel) -> bool:
+    """Create everything in the session; return True once nothing is left.
+
+    Sessions loaded from a template are diffed against the guild, so roles,
+    categories and channels that already exist by name are reused.
+    """
+    gid = str(ctx.guild.id)
+    runner = SetupPlanRunner(ctx.guild, session)
+    if session.get("template"):
+        nodes = diff_template(ctx.guild, session)
+    else:
+        nodes = compile_setup_plan(session)
+    started = time.monotonic()
+    await runner.run(nodes)
+    log_sink.post_line(
+        log_channel,
+        f"🧱 Setup plan ({runner.summary()}) finished in {time.monotonic() - started:.1f}s.",
+    )
+
+    setup_sessions[gid] = session
+    if runner.failed:
+        save_sessions()
+        await ctx.send(
+            "⚠️ Some items could not be created:\n"
+            + describe_plan_failures(runner.failed)
+            + "\nFix the cause and run `!setup confirm` to retry; finished items are skipped."
+        )
+        return False
+
+    session["finished"] = True
+    save_sessions()
+    return True
+
+
 # --- setup command group ---
-@bot.group(name="setup", invoke_without_command=True)
-@commands.has_permissions(administrator=True)
+@bot.group(
+    name="setup",
+    invoke_without_command=True,
+    extras={"section": "Server Setup / Utilities"},
+)
+@require_permissions(administrator=True)
 async def setup_group(ctx):
     """Base group for modular setup commands. Use `!setupserver` for guided wizard."""
     await ctx.send(
@@ -2223,28 +5200,25 @@ async def setup_group(ctx):
 
 
 # ---------- Guided wizard with auto-resume ----------
-@bot.command(name="setupserver")
-@commands.has_permissions(administrator=True)
+@bot.command(name="setupserver", extras={"section": "Server Setup / Utilities"})
+@require_permissions(administrator=True)
 async def setupserver(ctx):
     """
     Start or resume the interactive server setup wizard.
     Sessions are persisted in setup_sessions.json so they can be resumed after bot restarts.
     """
     guild_id = str(ctx.guild.id)
-    author = ctx.author
 
     # if there's an existing unfinished session, ask whether to resume
     if guild_id in setup_sessions and not setup_sessions[guild_id].get(
         "finished", False
     ):
-        await ctx.send(
-            f"🔁 An unfinished setup exists for this server. Do you want to resume it? (yes / no)"
-        )
         try:
-            msg = await bot.wait_for(
-                "message",
-                check=lambda m: m.author == author and m.channel == ctx.channel,
+            msg = await conversations.ask(
+                ctx,
+                "🔁 An unfinished setup exists for this server. Do you want to resume it? (yes / no)",
                 timeout=60,
+                cancel=False,
             )
             if msg.content.strip().lower() in ("yes", "y"):
                 session = setup_sessions[guild_id]
@@ -2283,13 +5257,9 @@ async def run_wizard(ctx, session, resume=False):
     """
     Core interactive flow. If resume=True, it will continue from current session state.
     """
-    author = ctx.author
     guild: discord.Guild = ctx.guild
     gid = str(guild.id)
 
-    def check(m):
-        return m.author == author and m.channel == ctx.channel
-
     try:
         # ---------- Ensure log channel ----------
         log_channel = discord.utils.get(
@@ -2300,7 +5270,9 @@ async def run_wizard(ctx, session, resume=False):
                 log_channel = await guild.create_text_channel(
                     session.get("log_channel", LOG_CHANNEL_NAME)
                 )
-                await log_channel.send("📝 Log channel created by setup wizard.")
+                log_sink.post_line(
+                    log_channel, "📝 Log channel created by setup wizard."
+                )
             except discord.Forbidden:
                 await ctx.send(
                     "⚠️ I cannot create the log channel. Please ensure I have Manage Channels permission."
@@ -2317,10 +5289,9 @@ async def run_wizard(ctx, session, resume=False):
                 try:
                     created = await guild.create_role(name=base)
                     existing_roles[created.name] = created
-                    if log_channel:
-                        await log_channel.send(
-                            f"🆕 Created default role `{created.name}`"
-                        )
+                    log_sink.post_line(
+                        log_channel, f"🆕 Created default role `{created.name}`"
+                    )
                 except discord.Forbidden:
                     await ctx.send(
                         f"⚠️ Missing permission to create default role `{base}`. Please create it manually or give the bot Manage Roles."
@@ -2330,14 +5301,10 @@ async def run_wizard(ctx, session, resume=False):
 
         # ---------- ROLES CREATION (first major step) ----------
         if not session["roles"]:
-            await ctx.send(
-                "🎭 **Step 1 — Roles**\nHow many roles would you like to create? (type a number, or 0 to skip)\nType `cancel` to abort."
+            msg = await conversations.ask(
+                ctx,
+                "🎭 **Step 1 — Roles**\nHow many roles would you like to create? (type a number, or 0 to skip)\nType `cancel` to abort.",
             )
-            msg = await bot.wait_for("message", check=check, timeout=120)
-            if is_cancel_or_stop(msg.content):
-                del setup_sessions[gid]
-                save_sessions()
-                return await ctx.send("❌ Setup cancelled.")
             try:
                 num_roles = int(msg.content)
             except:
@@ -2346,14 +5313,10 @@ async def run_wizard(ctx, session, resume=False):
                 )
             if num_roles > 0:
                 for i in range(num_roles):
-                    await ctx.send(
-                        f"📝 Enter a name for role **{i+1}/{num_roles}** (or type `cancel`):"
+                    rmsg = await conversations.ask(
+                        ctx,
+                        f"📝 Enter a name for role **{i+1}/{num_roles}** (or type `cancel`):",
                     )
-                    rmsg = await bot.wait_for("message", check=check, timeout=120)
-                    if is_cancel_or_stop(rmsg.content):
-                        del setup_sessions[gid]
-                        save_sessions()
-                        return await ctx.send("❌ Setup cancelled.")
                     session["roles"].append(rmsg.content.strip())
                     setup_sessions[gid] = session
                     save_sessions()
@@ -2364,34 +5327,13 @@ async def run_wizard(ctx, session, resume=False):
                 "🎭 Roles already defined in session; skipping role creation step."
             )
 
-        # Create roles now (some may exist already)
-        created_role_objs = {}
-        for role_name in session["roles"]:
-            role = discord.utils.find(lambda r: r.name == role_name, guild.roles)
-            if not role:
-                try:
-                    role = await guild.create_role(name=role_name)
-                    if log_channel:
-                        await log_channel.send(f"➕ Created role `{role_name}`")
-                except discord.Forbidden:
-                    await ctx.send(
-                        f"⚠️ Missing permission to create role `{role_name}`. Please create it manually and re-run."
-                    )
-                    # continue trying others
-                    continue
-            created_role_objs[role_name] = role
-
         # ---------- CATEGORIES / CHANNELS ----------
         # Ask how many categories
         if not session["categories"]:
-            await ctx.send(
-                "📂 **Step 2 — Categories & Channels**\nHow many categories would you like to create? (0 to skip)"
+            msg = await conversations.ask(
+                ctx,
+                "📂 **Step 2 — Categories & Channels**\nHow many categories would you like to create? (0 to skip)",
             )
-            msg = await bot.wait_for("message", check=check, timeout=120)
-            if is_cancel_or_stop(msg.content):
-                del setup_sessions[gid]
-                save_sessions()
-                return await ctx.send("❌ Setup cancelled.")
             try:
                 num_cats = int(msg.content)
             except:
@@ -2399,14 +5341,10 @@ async def run_wizard(ctx, session, resume=False):
                     "❌ Invalid number. Start over with `!setupserver`."
                 )
             for ci in range(num_cats):
-                await ctx.send(
-                    f"🗂️ Enter a name for category **{ci+1}/{num_cats}** (or `cancel`):"
+                name_msg = await conversations.ask(
+                    ctx,
+                    f"🗂️ Enter a name for category **{ci+1}/{num_cats}** (or `cancel`):",
                 )
-                name_msg = await bot.wait_for("message", check=check, timeout=120)
-                if is_cancel_or_stop(name_msg.content):
-                    del setup_sessions[gid]
-                    save_sessions()
-                    return await ctx.send("❌ Setup cancelled.")
                 cat_name = name_msg.content.strip()
                 cat_entry = {
                     "name": cat_name,
@@ -2415,14 +5353,10 @@ async def run_wizard(ctx, session, resume=False):
                     "permissions": {},
                 }  # permissions: role_name -> {view:bool, send:bool}
                 # text channels
-                await ctx.send(
-                    f"💬 How many text channels under **{cat_name}**? (0 to skip)"
+                tmsg = await conversations.ask(
+                    ctx,
+                    f"💬 How many text channels under **{cat_name}**? (0 to skip)",
                 )
-                tmsg = await bot.wait_for("message", check=check, timeout=120)
-                if is_cancel_or_stop(tmsg.content):
-                    del setup_sessions[gid]
-                    save_sessions()
-                    return await ctx.send("❌ Setup cancelled.")
                 try:
                     num_text = int(tmsg.content)
                 except:
@@ -2431,25 +5365,17 @@ async def run_wizard(ctx, session, resume=False):
                     )
                     num_text = 0
                 for ti in range(num_text):
-                    await ctx.send(
-                        f"📝 Name for text channel #{ti+1} in **{cat_name}** (no #):"
+                    chmsg = await conversations.ask(
+                        ctx,
+                        f"📝 Name for text channel #{ti+1} in **{cat_name}** (no #):",
                     )
-                    chmsg = await bot.wait_for("message", check=check, timeout=120)
-                    if is_cancel_or_stop(chmsg.content):
-                        del setup_sessions[gid]
-                        save_sessions()
-                        return await ctx.send("❌ Setup cancelled.")
                     cat_entry["text_channels"].append(chmsg.content.strip())
 
                 # voice channels
-                await ctx.send(
-                    f"🔊 How many voice channels under **{cat_name}**? (0 to skip)"
+                vmsg = await conversations.ask(
+                    ctx,
+                    f"🔊 How many voice channels under **{cat_name}**? (0 to skip)",
                 )
-                vmsg = await bot.wait_for("message", check=check, timeout=120)
-                if is_cancel_or_stop(vmsg.content):
-                    del setup_sessions[gid]
-                    save_sessions()
-                    return await ctx.send("❌ Setup cancelled.")
                 try:
                     num_vc = int(vmsg.content)
                 except:
@@ -2458,49 +5384,34 @@ async def run_wizard(ctx, session, resume=False):
                     )
                     num_vc = 0
                 for vi in range(num_vc):
-                    await ctx.send(
-                        f"📝 Name for voice channel #{vi+1} in **{cat_name}**:"
+                    vcmsg = await conversations.ask(
+                        ctx,
+                        f"📝 Name for voice channel #{vi+1} in **{cat_name}**:",
                     )
-                    vcmsg = await bot.wait_for("message", check=check, timeout=120)
-                    if is_cancel_or_stop(vcmsg.content):
-                        del setup_sessions[gid]
-                        save_sessions()
-                        return await ctx.send("❌ Setup cancelled.")
                     cat_entry["voice_channels"].append(vcmsg.content.strip())
 
                 # permissions for this category - interactive
                 # Ask if admin wants to set custom overwrites
-                await ctx.send(
-                    f"🔐 Do you want to set **custom permissions** for category **{cat_name}**? (yes/no)"
+                perm_choice = await conversations.ask(
+                    ctx,
+                    f"🔐 Do you want to set **custom permissions** for category **{cat_name}**? (yes/no)",
                 )
-                perm_choice = await bot.wait_for("message", check=check, timeout=120)
-                if is_cancel_or_stop(perm_choice.content):
-                    del setup_sessions[gid]
-                    save_sessions()
-                    return await ctx.send("❌ Setup cancelled.")
                 if perm_choice.content.strip().lower() in ("yes", "y"):
-                    await ctx.send(
-                        "📋 Enter role names (comma-separated) that should **HAVE** access (view & send) to this category.\nExample: `Member, Moderator` or `@everyone` to allow everyone."
+                    allow_msg = await conversations.ask(
+                        ctx,
+                        "📋 Enter role names (comma-separated) that should **HAVE** access (view & send) to this category.\nExample: `Member, Moderator` or `@everyone` to allow everyone.",
+                        timeout=180,
                     )
-                    allow_msg = await bot.wait_for("message", check=check, timeout=180)
-                    if is_cancel_or_stop(allow_msg.content):
-                        del setup_sessions[gid]
-                        save_sessions()
-                        return await ctx.send("❌ Setup cancelled.")
                     allow_roles = [
                         r.strip() for r in allow_msg.content.split(",") if r.strip()
                     ]
                     # record permissions as allow list — we'll convert to overwrites at creation time
                     cat_entry["permissions"]["allow"] = allow_roles
                     # Optionally we can ask for denied roles
-                    await ctx.send(
-                        "📋 (Optional) Enter role names (comma-separated) to explicitly DENY view/send (leave blank to skip):"
+                    deny_msg = await conversations.ask(
+                        ctx,
+                        "📋 (Optional) Enter role names (comma-separated) to explicitly DENY view/send (leave blank to skip):",
                     )
-                    deny_msg = await bot.wait_for("message", check=check, timeout=120)
-                    if is_cancel_or_stop(deny_msg.content):
-                        del setup_sessions[gid]
-                        save_sessions()
-                        return await ctx.send("❌ Setup cancelled.")
                     deny_roles = [
                         r.strip() for r in deny_msg.content.split(",") if r.strip()
                     ]
@@ -2552,12 +5463,7 @@ async def run_wizard(ctx, session, resume=False):
             text="Type `confirm` to create everything, `cancel` to abort. You can also use modular commands (see !setup)."
         )
 
-        await ctx.send(embed=embed)
-        confirm_msg = await bot.wait_for("message", check=check, timeout=180)
-        if is_cancel_or_stop(confirm_msg.content):
-            del setup_sessions[gid]
-            save_sessions()
-            return await ctx.send("❌ Setup cancelled.")
+        confirm_msg = await conversations.ask(ctx, embed=embed, timeout=180)
         if confirm_msg.content.strip().lower() not in ("confirm", "yes", "y"):
             return await ctx.send(
                 "❌ Setup aborted by user. Run `!setupserver` again to restart."
@@ -2567,105 +5473,19 @@ async def run_wizard(ctx, session, resume=False):
         await ctx.send(
             "⚙️ Creating roles, categories and channels now. I will post progress in the log channel."
         )
-        # create roles (again, in case something changed)
-        created_roles_map = {r.name: r for r in guild.roles}
-        for rname in session["roles"]:
-            if rname not in created_roles_map:
-                try:
-                    r = await guild.create_role(name=rname)
-                    created_roles_map[r.name] = r
-                    if log_channel:
-                        await log_channel.send(f"➕ Created role `{r.name}`")
-                except discord.Forbidden:
-                    await ctx.send(
-                        f"⚠️ Could not create role `{rname}` (missing Manage Roles). Continuing with other creations."
-                    )
-        # create categories and their channels with overwrites
-        for c in session["categories"]:
-            cname = c["name"]
-            # prepare overwrites
-            overwrites = {}
-            # default: everyone no special deny - we'll later set allow for those in allow list
-            overwrites[guild.default_role] = discord.PermissionOverwrite(
-                view_channel=False
-            )  # default lock, then we allow specific roles per config
-            allow_list = c.get("permissions", {}).get("allow", [])
-            deny_list = c.get("permissions", {}).get("deny", [])
-            # allow selected roles
-            for rn in allow_list:
-                # ensure role exists
-                role_obj = discord.utils.find(lambda rr: rr.name == rn, guild.roles)
-                if not role_obj:
-                    try:
-                        role_obj = await guild.create_role(name=rn)
-                        if log_channel:
-                            await log_channel.send(
-                                f"🆕 Created role `{rn}` for permission setup."
-                            )
-                    except discord.Forbidden:
-                        role_obj = None
-                if role_obj:
-                    overwrites[role_obj] = discord.PermissionOverwrite(
-                        view_channel=True, send_messages=True
-                    )
-            # explicit denies
-            for rn in deny_list:
-                role_obj = discord.utils.find(lambda rr: rr.name == rn, guild.roles)
-                if role_obj:
-                    overwrites[role_obj] = discord.PermissionOverwrite(
-                        view_channel=False, send_messages=False
-                    )
-
-            try:
-                cat = await guild.create_category(cname, overwrites=overwrites)
-                if log_channel:
-                    await log_channel.send(f"📁 Created category `{cname}`")
-            except discord.Forbidden:
-                await ctx.send(
-                    f"⚠️ Missing permission to create category `{cname}`. Skipping."
-                )
-                continue
-
-            # create text channels under this category
-            for tc in c.get("text_channels", []):
-                try:
-                    ch = await guild.create_text_channel(tc, category=cat)
-                    if log_channel:
-                        await log_channel.send(
-                            f"💬 Created text channel `{tc}` in `{cname}`"
-                        )
-                except discord.Forbidden:
-                    if log_channel:
-                        await log_channel.send(
-                            f"⚠️ Could not create text channel `{tc}` (missing permission)."
-                        )
-
-            # create voice channels
-            for vc in c.get("voice_channels", []):
-                try:
-                    vch = await guild.create_voice_channel(vc, category=cat)
-                    if log_channel:
-                        await log_channel.send(
-                            f"🔊 Created voice channel `{vc}` in `{cname}`"
-                        )
-                except discord.Forbidden:
-                    if log_channel:
-                        await log_channel.send(
-                            f"⚠️ Could not create voice channel `{vc}` (missing permission)."
-                        )
-
-        # final: mark session finished and save summary to log channel
-        session["finished"] = True
-        setup_sessions[gid] = session
-        save_sessions()
+        if not await execute_setup_session(ctx, session, log_channel):
+            return
 
-        if log_channel:
-            await log_channel.send("✅ Server setup completed successfully.")
-            await log_channel.send(embed=embed)
+        log_sink.post_line(log_channel, "✅ Server setup completed successfully.")
+        log_sink.post_embed(log_channel, embed)
 
         await ctx.send(
             "✅ Server setup complete! Check the admin/mod log channel for details."
         )
+    except ConversationCancelled:
+        setup_sessions.pop(gid, None)
+        save_sessions()
+        await ctx.send("❌ Setup cancelled.")
     except asyncio.TimeoutError:
         await ctx.send(
             "⌛ Setup timed out. Your progress is saved and you can resume with `!setupserver`."
@@ -2679,7 +5499,7 @@ async def run_wizard(ctx, session, resume=False):
 
 # ---------- Modular subcommands ----------
 @setup_group.command(name="addrole")
-@commands.has_permissions(administrator=True)
+@require_permissions(administrator=True)
 async def setup_addrole(ctx, *, role_name: str):
     """Add a role manually to the server immediately (and save to session if active)."""
     guild = ctx.guild
@@ -2697,7 +5517,7 @@ async def setup_addrole(ctx, *, role_name: str):
 
 
 @setup_group.command(name="addcategory")
-@commands.has_permissions(administrator=True)
+@require_permissions(administrator=True)
 async def setup_addcategory(ctx, *, category_name: str):
     """Add a category immediately (no channels)."""
     guild = ctx.guild
@@ -2722,7 +5542,7 @@ async def setup_addcategory(ctx, *, category_name: str):
 
 
 @setup_group.command(name="addchannel")
-@commands.has_permissions(administrator=True)
+@require_permissions(administrator=True)
 async def setup_addchannel(
     ctx, category_name: str, channel_type: str, *, channel_name: str
 ):
@@ -2731,9 +5551,11 @@ async def setup_addchannel(
     Usage: !setup addchannel <category_name> <text|voice> <channel_name>
     """
     guild = ctx.guild
-    cat = discord.utils.find(lambda c: c.name == category_name, guild.categories)
+    cat = name_index.channel(guild, category_name, discord.CategoryChannel)
     if not cat:
-        return await ctx.send("⚠️ Category not found.")
+        return await ctx.send(
+            name_index.not_found(guild, "channels", "Category", category_name)
+        )
     try:
         if channel_type.lower() == "text":
             ch = await guild.create_text_channel(channel_name, category=cat)
@@ -2751,7 +5573,7 @@ async def setup_addchannel(
         gid = str(guild.id)
         if gid in setup_sessions and not setup_sessions[gid].get("finished", False):
             for c in setup_sessions[gid]["categories"]:
-                if c["name"] == category_name:
+                if c["name"] == cat.name:
                     if channel_type.lower() == "text":
                         c["text_channels"].append(channel_name)
                     else:
@@ -2762,7 +5584,7 @@ async def setup_addchannel(
 
 
 @setup_group.command(name="permissions")
-@commands.has_permissions(administrator=True)
+@require_permissions(administrator=True)
 async def setup_permissions(ctx, category_name: str):
     """
     Edit permissions stored in the active session for a category.
@@ -2780,40 +5602,30 @@ async def setup_permissions(ctx, category_name: str):
     if not target:
         return await ctx.send("⚠️ Category not found in session.")
 
-    await ctx.send(
-        "📋 Enter role names (comma-separated) to ALLOW (view & send) for this category:"
-    )
     try:
-        msg = await bot.wait_for(
-            "message",
-            check=lambda m: m.author == ctx.author and m.channel == ctx.channel,
-            timeout=120,
+        msg = await conversations.ask(
+            ctx,
+            "📋 Enter role names (comma-separated) to ALLOW (view & send) for this category:",
         )
-        if is_cancel_or_stop(msg.content):
-            return await ctx.send("❌ Permissions edit cancelled.")
         allow = [r.strip() for r in msg.content.split(",") if r.strip()]
-        await ctx.send(
-            "📋 Enter role names (comma-separated) to DENY (optional, blank to skip):"
-        )
-        msg2 = await bot.wait_for(
-            "message",
-            check=lambda m: m.author == ctx.author and m.channel == ctx.channel,
-            timeout=120,
+        msg2 = await conversations.ask(
+            ctx,
+            "📋 Enter role names (comma-separated) to DENY (optional, blank to skip):",
         )
-        if is_cancel_or_stop(msg2.content):
-            return await ctx.send("❌ Permissions edit cancelled.")
         deny = [r.strip() for r in msg2.content.split(",") if r.strip()]
         target["permissions"] = {"allow": allow, "deny": deny}
         save_sessions()
         await ctx.send(
             "✅ Permissions saved to the session. They will be applied on confirm/create."
         )
+    except ConversationCancelled:
+        await ctx.send("❌ Permissions edit cancelled.")
     except asyncio.TimeoutError:
         await ctx.send("⌛ Timed out. Try `!setup permissions <category_name>` again.")
 
 
 @setup_group.command(name="summary")
-@commands.has_permissions(administrator=True)
+@require_permissions(administrator=True)
 async def setup_summary(ctx):
     """Show the summary of the active session for this guild."""
     gid = str(ctx.guild.id)
@@ -2838,21 +5650,28 @@ async def setup_summary(ctx):
 
 
 @setup_group.command(name="confirm")
-@commands.has_permissions(administrator=True)
+@require_permissions(administrator=True)
 async def setup_confirm(ctx):
     """Confirm and create using the active session (alias for final confirmation if user aborted earlier)."""
     gid = str(ctx.guild.id)
     if gid not in setup_sessions:
         return await ctx.send("⚠️ No active setup session.")
     session = setup_sessions[gid]
-    # reuse the run_wizard creation phase by marking as if resuming and user typed confirm
-    # Quick and safe approach: call run_wizard but ensure it goes straight to creation summary
+    if not session.get("roles") and not session.get("categories"):
+        return await ctx.send(
+            "ℹ️ The session is empty. Add items with `!setup` or run `!setupserver`."
+        )
+    log_channel = discord.utils.get(
+        ctx.guild.text_channels, name=session.get("log_channel", LOG_CHANNEL_NAME)
+    )
     await ctx.send("⚙️ Starting creation from the saved session...")
-    await run_wizard(ctx, session, resume=True)
+    if await execute_setup_session(ctx, session, log_channel):
+        log_sink.post_line(log_channel, "✅ Server setup completed successfully.")
+        await ctx.send("✅ Server setup complete!")
 
 
 @setup_group.command(name="cancel")
-@commands.has_permissions(administrator=True)
+@require_permissions(administrator=True)
 async def setup_cancel(ctx):
     """Cancel and delete an active session."""
     gid = str(ctx.guild.id)
@@ -2865,19 +5684,25 @@ async def setup_cancel(ctx):
 
 
 @setup_group.command(name="template")
-@commands.has_permissions(administrator=True)
+@require_permissions(administrator=True)
 async def setup_template(ctx, action: str = None, *, name: str = None):
     """
     Manage templates.
     Use: !setup template save <name>  (saves the current active session as a template)
          !setup template use <name>   (loads the template into an active session)
+         !setup template plan <name> [--prune]  (shows what apply would change)
+         !setup template apply <name> [--prune] (applies only those changes)
          !setup template list         (lists saved templates)
          !setup template delete <name>
     """
     gid = str(ctx.guild.id)
     if action is None:
-        return await ctx.send("Usage: `!setup template save|use|list|delete <name>`")
+        return await ctx.send(
+            "Usage: `!setup template save|use|plan|apply|list|delete <name>`"
+        )
     action = action.lower()
+    if action in ("plan", "apply"):
+        return await apply_template(ctx, name, dry_run=action == "plan")
     if action == "list":
         if not templates:
             return await ctx.send("No templates saved.")
@@ -2887,7 +5712,10 @@ async def setup_template(ctx, action: str = None, *, name: str = None):
             return await ctx.send("Provide a name: `!setup template save <name>`")
         if gid not in setup_sessions:
             return await ctx.send("No active session to save as template.")
-        templates[name] = setup_sessions[gid]
+        template = copy.deepcopy(setup_sessions[gid])
+        for key in ("guild_id", "creator_id", "progress", "finished"):
+            template.pop(key, None)
+        templates[name] = template
         save_templates()
         await ctx.send(f"✅ Template `{name}` saved.")
     elif action == "use":
@@ -2895,7 +5723,15 @@ async def setup_template(ctx, action: str = None, *, name: str = None):
             return await ctx.send("Provide a name to use.")
         if name not in templates:
             return await ctx.send("Template not found.")
-        setup_sessions[gid] = templates[name]
+        session = copy.deepcopy(templates[name])
+        session.pop("progress", None)
+        session.update(
+            guild_id=ctx.guild.id,
+            creator_id=ctx.author.id,
+            template=name,
+            finished=False,
+        )
+        setup_sessions[gid] = session
         save_sessions()
         await ctx.send(
             f"✅ Template `{name}` loaded into active session. Use `!setup summary` to review and `!setup confirm` to create."
@@ -2913,9 +5749,497 @@ async def setup_template(ctx, action: str = None, *, name: str = None):
         await ctx.send("Unknown action. Use save/use/list/delete.")
 
 
+async def apply_template(ctx, name, dry_run):
+    """Diff a saved template against the guild, then show or apply the plan."""
+    prune = False
+    if name and name.endswith("--prune"):
+        name, prune = name[: -len("--prune")].strip(), True
+    if not name:
+        return await ctx.send("Provide a name: `!setup template plan <name> [--prune]`")
+    if name not in templates:
+        return await ctx.send("Template not found.")
+
+    nodes = diff_template(ctx.guild, templates[name], prune=prune)
+    if not nodes:
+        return await ctx.send(f"✅ This server already matches template `{name}`.")
+
+    if dry_run:
+        hint = (
+            f"Run `!setup template apply {name}{' --prune' if prune else ''}` to apply."
+        )
+        return await ctx.send(
+            embed=plan_embed(f"🧮 Template plan: {name}", nodes, hint)
+        )
+
+    await ctx.send(
+        f"⚙️ Applying template `{name}`: {describe_plan_counts(count_plan(nodes))} "
+        f"(about {estimate_plan(nodes):.0f}s)..."
+    )
+    runner = SetupPlanRunner(ctx.guild, {}, persist=False)
+    await runner.run(nodes)
+    log_sink.post_line(
+        guild_config.log_channel(ctx.guild),
+        f"🧱 Template `{name}` applied by {ctx.author}: {runner.summary()}.",
+    )
+    if runner.failed:
+        return await ctx.send(
+            "⚠️ Template partly applied:\n"
+            + describe_plan_failures(runner.failed)
+            + f"\nRun `!setup template apply {name}` again to retry what is left."
+        )
+    await ctx.send(f"✅ Template `{name}` applied ({runner.summary()}).")
+
+
 # ---------- End of setup system ----------
 
 
+# ---------------- Guild Snapshots ----------------
+SNAPSHOT_DIR = "snapshots"
+SNAPSHOT_VERSION = 2  # v2 adds forum and stage channels
+SNAPSHOT_KEEP = 10  # newest snapshots kept per guild
+
+ROLE_FIELDS = ("name", "permissions", "colour", "hoist", "mentionable")
+CATEGORY_FIELDS = ("name", "position", "overwrites")
+TEXT_FIELDS = ("name", "topic", "slowmode_delay", "nsfw", "overwrites")
+VOICE_FIELDS = ("name", "bitrate", "user_limit", "overwrites")
+PLACEMENT_FIELDS = ("category", "position")
+# snapshot type -> (channel class, restored fields, Guild create method)
+SNAPSHOT_CHANNELS = {
+    "text": (discord.TextChannel, TEXT_FIELDS, "create_text_channel"),
+    "voice": (discord.VoiceChannel, VOICE_FIELDS, "create_voice_channel"),
+    "forum": (discord.ForumChannel, TEXT_FIELDS, "create_forum"),
+    "stage": (discord.StageChannel, VOICE_FIELDS, "create_stage_channel"),
+}
+
+
+def _snapshot_overwrites(channel) -> list:
+    return [
+        [
+            target.id,
+            "role" if isinstance(target, discord.Role) else "member",
+            *(p.value for p in ow.pair()),
+        ]
+        for target, ow in channel.overwrites.items()
+    ]
+
+
+def capture_snapshot(guild: discord.Guild) -> dict:
+    """Serialize roles, categories and text/voice/forum/stage channels of a guild."""
+    channels = []
+    for ch in guild.channels:
+        kind = next(
+            (k for k, (cls, _, _) in SNAPSHOT_CHANNELS.items() if isinstance(ch, cls)),
+            None,
+        )
+        if kind is None:
+            continue
+        entry = {"type": kind}
+        for field in SNAPSHOT_CHANNELS[kind][1]:
+            if field not in ("name", "overwrites"):
+                entry[field] = getattr(ch, field)
+        entry.update(
+            id=ch.id,
+            name=ch.name,
+            category=ch.category_id,
+            position=ch.position,
+            overwrites=_snapshot_overwrites(ch),
+        )
+        channels.append(entry)
+
+    return {
+        "version": SNAPSHOT_VERSION,
+        "guild_id": guild.id,
+        "taken_at": int(time.time()),
+        "roles": [
+            {
+                "id": r.id,
+                "name": r.name,
+                "permissions": r.permissions.value,
+                "colour": r.colour.value,
+                "hoist": r.hoist,
+                "mentionable": r.mentionable,
+                "position": r.position,
+                "managed": r.managed,
+                "default": r.is_default(),
+            }
+            for r in guild.roles
+        ],
+        "categories": [
+            {
+                "id": c.id,
+                "name": c.name,
+                "position": c.position,
+                "overwrites": _snapshot_overwrites(c),
+            }
+            for c in guild.categories
+        ],
+        "channels": channels,
+    }
+
+
+def snapshot_files(guild_id: int) -> list:
+    """Snapshot names of a guild, newest first."""
+    folder = os.path.join(SNAPSHOT_DIR, str(guild_id))
+    if not os.path.isdir(folder):
+        return []
+    names = [
+        f[: -len(".json.gz")] for f in os.listdir(folder) if f.endswith(".json.gz")
+    ]
+    return sorted(names, reverse=True)
+
+
+def write_snapshot(guild_id: int, data: dict) -> str:
+    folder = os.path.join(SNAPSHOT_DIR, str(guild_id))
+    os.makedirs(folder, exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S", time.gmtime(data["taken_at"]))
+    name, n = stamp, 1
+    while True:
+        # "x" mode: two snapshots in the same second get -2, -3, ... suffixes
+        try:
+            f = gzip.open(
+                os.path.join(folder, f"{name}.json.gz"), "xt", encoding="utf-8"
+            )
+        except FileExistsError:
+            n += 1
+            name = f"{stamp}-{n}"
+            continue
+        with f:
+            json.dump(data, f, separators=(",", ":"), ensure_ascii=False)
+        break
+    for old in snapshot_files(guild_id)[SNAPSHOT_KEEP:]:
+        os.remove(os.path.join(folder, f"{old}.json.gz"))
+    return name
+
+
+def read_snapshot(guild_id: int, name: str) -> dict:
+    path = os.path.join(SNAPSHOT_DIR, str(guild_id), f"{name}.json.gz")
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        data = json.load(f)
+    if data.get("version", 0) > SNAPSHOT_VERSION:
+        raise ValueError(f"snapshot format v{data['version']} is newer than this bot")
+    return data
+
+
+class SnapshotRestore:
+    """Plan the restore of a snapshot onto the live guild.
+
+    Objects are matched by ID first and by name second, so only what was
+    deleted gets recreated and only what drifted gets edited, including a
+    channel's category and position. The result is a
+    list of plan nodes for `SetupPlanRunner`: recreated roles come first (and
+    are put back in order with one position update), categories depend on
+    the roles in their overwrites, and channels on their category.
+    """
+
+    def __init__(self, guild: discord.Guild, snapshot: dict):
+        self.guild = guild
+        self.snapshot = snapshot
+        self.roles = {}  # snapshot role id -> live role
+        self.categories = {}  # snapshot category id -> live category
+        self.recreated = {}  # snapshot role id -> snapshot entry
+        self.nodes = {}
+
+    def plan(self) -> list:
+        self._plan_roles()
+        self._plan_categories()
+        self._plan_channels()
+        return list(self.nodes.values())
+
+    def _add(self, key, kind, name, deps, run):
+        self.nodes[key] = SetupNode(key, kind, name, deps, {"run": run})
+        return key
+
+    # --- diffing ---
+    def _overwrites(self, entries) -> dict:
+        result = {}
+        for target_id, target_type, allow, deny in entries:
+            if target_type == "role":
+                target = self.roles.get(target_id)
+            else:
+                target = self.guild.get_member(target_id) or discord.Object(
+                    id=target_id, type=discord.Member
+                )
+            if target is not None:
+                result[target] = discord.PermissionOverwrite.from_pair(
+                    discord.Permissions(allow), discord.Permissions(deny)
+                )
+        return result
+
+    def _role_deps(self, entries) -> list:
+        keys = (f"role:{e[0]}" for e in entries if e[1] == "role")
+        return [k for k in keys if k in self.nodes]
+
+    def _kwargs(self, data, fields) -> dict:
+        kwargs = {}
+        for field in fields:
+            value = data[field]
+            if field == "permissions":
+                value = discord.Permissions(value)
+            elif field == "colour":
+                value = discord.Colour(value)
+            elif field == "overwrites":
+                value = self._overwrites(value)
+            elif field == "category":
+                value = self.categories.get(value)
+            kwargs[field] = value
+        return kwargs
+
+    def _changed(self, obj, data, fields) -> list:
+        changed = []
+        for field in fields:
+            if field == "overwrites":
+                differs = self._role_deps(data["overwrites"]) or _overwrite_values(
+                    obj.overwrites
+                ) != _overwrite_values(self._overwrites(data["overwrites"]))
+            elif field == "category":
+                if f"category:{data['category']}" in self.nodes:
+                    differs = True  # its category is being recreated
+                else:
+                    parent = self.categories.get(data["category"])
+                    differs = obj.category_id != (parent.id if parent else None)
+            elif field in ("permissions", "colour"):
+                differs = getattr(obj, field).value != data[field]
+            else:
+                differs = getattr(obj, field) != data[field]
+            if differs:
+                changed.append(field)
+        return changed
+
+    def _plan_update(self, obj, data, fields):
+        changed = self._changed(obj, data, fields)
+        if changed:
+
+            async def run():
+                await obj.edit(**self._kwargs(data, changed), reason="Snapshot restore")
+                return obj
+
+            self._add(f"update:{obj.id}", "update", obj.name, self._deps(data), run)
+
+    def _deps(self, data) -> list:
+        deps = self._role_deps(data.get("overwrites", []))
+        if f"category:{data.get('category')}" in self.nodes:
+            deps.append(f"category:{data['category']}")
+        return deps
+
+    def _plan_roles(self):
+        by_name = {}
+        for role in self.guild.roles:
+            by_name.setdefault(role.name, role)
+        top = self.guild.me.top_role
+        for data in self.snapshot["roles"]:
+            if data["default"]:
+                role = self.guild.default_role
+            else:
+                role = self.guild.get_role(data["id"]) or by_name.get(data["name"])
+            if role is not None:
+                self.roles[data["id"]] = role
+                if not role.managed and role < top:
+                    fields = ("permissions",) if data["default"] else ROLE_FIELDS
+                    self._plan_update(role, data, fields)
+            elif not data["managed"]:
+                self.recreated[data["id"]] = data
+                self._add(
+                    f"role:{data['id']}",
+                    "role",
+                    data["name"],
+                    (),
+                    functools.partial(self._create_role, data),
+                )
+        if self.recreated:
+            deps = [f"role:{rid}" for rid in self.recreated]
+            self._add(
+                "positions", "positions", "role order", deps, self._sync_positions
+            )
+
+    def _plan_categories(self):
+        by_name = {}
+        for category in self.guild.categories:
+            by_name.setdefault(category.name, category)
+        for data in self.snapshot["categories"]:
+            category = self.guild.get_channel(data["id"]) or by_name.get(data["name"])
+            if category is None:
+                self._add(
+                    f"category:{data['id']}",
+                    "category",
+                    data["name"],
+                    self._deps(data),
+                    functools.partial(self._create_category, data),
+                )
+            else:
+                self.categories[data["id"]] = category
+                self._plan_update(category, data, CATEGORY_FIELDS)
+
+    def _plan_channels(self):
+        uncategorized = [c for c in self.guild.channels if c.category is None]
+        for data in self.snapshot["channels"]:
+            cls, fields, _ = SNAPSHOT_CHANNELS[data["type"]]
+            channel = self.guild.get_channel(data["id"])
+            if channel is None and f"category:{data['category']}" not in self.nodes:
+                parent = self.categories.get(data["category"])
+                pool = parent.channels if parent else uncategorized
+                channel = next(
+                    (c for c in pool if c.name == data["name"] and isinstance(c, cls)),
+                    None,
+                )
+            if channel is not None:
+                self._plan_update(channel, data, fields + PLACEMENT_FIELDS)
+                continue
+            self._add(
+                f"{data['type']}:{data['id']}",
+                data["type"],
+                data["name"],
+                self._deps(data),
+                functools.partial(self._create_channel, data),
+            )
+
+    # --- execution ---
+    async def _create_role(self, data):
+        role = await self.guild.create_role(
+            **self._kwargs(data, ROLE_FIELDS), reason="Snapshot restore"
+        )
+        self.roles[data["id"]] = role
+        return role
+
+    async def _sync_positions(self):
+        top = self.guild.me.top_role.position
+        positions = {
+            self.roles[rid]: max(1, min(data["position"], top - 1))
+            for rid, data in self.recreated.items()
+            if rid in self.roles
+        }
+        if positions:
+            await self.guild.edit_role_positions(
+                positions=positions, reason="Snapshot restore"
+            )
+        return self.guild
+
+    async def _create_category(self, data):
+        category = await self.guild.create_category(
+            data["name"],
+            overwrites=self._overwrites(data["overwrites"]),
+            position=data["position"],
+            reason="Snapshot restore",
+        )
+        self.categories[data["id"]] = category
+        return category
+
+    async def _create_channel(self, data):
+        _, fields, method = SNAPSHOT_CHANNELS[data["type"]]
+        create = getattr(self.guild, method)
+        kwargs = self._kwargs(data, fields[1:])
+        return await create(
+            data["name"],
+            category=self.categories.get(data["category"]),
+            position=data["position"],
+            reason="Snapshot restore",
+            **kwargs,
+        )
+
+
+async def load_guild_snapshot(ctx, name):
+    names = snapshot_files(ctx.guild.id)
+    if not names:
+        await ctx.send("ℹ️ No snapshots saved for this server. Use `!snapshot save`.")
+        return None, None
+    name = name or names[0]
+    if name not in names:
+        await ctx.send(f"❌ Snapshot `{name}` not found. See `!snapshot list`.")
+        return None, None
+    try:
+        return name, await asyncio.to_thread(read_snapshot, ctx.guild.id, name)
+    except (OSError, ValueError) as e:
+        await ctx.send(f"❌ Could not read snapshot `{name}`: {e}")
+        return None, None
+
+
+@bot.group(
+    name="snapshot",
+    invoke_without_command=True,
+    extras={"section": "Server Setup / Utilities"},
+)
+@require_permissions(administrator=True)
+async def snapshot_group(ctx):
+    """Save and restore the server's role/channel structure."""
+    await ctx.send(
+        "Usage: `!snapshot save`, `!snapshot list`, `!snapshot plan [name]`, `!snapshot restore [name]`."
+    )
+
+
+@snapshot_group.command(name="save")
+@require_permissions(administrator=True)
+async def snapshot_save(ctx):
+    """Snapshot roles, categories, channels, overwrites and slowmode."""
+    data = capture_snapshot(ctx.guild)
+    name = await asyncio.to_thread(write_snapshot, ctx.guild.id, data)
+    await ctx.send(
+        f"📸 Snapshot `{name}` saved: {len(data['roles'])} roles, "
+        f"{len(data['categories'])} categories, {len(data['channels'])} channels."
+    )
+
+
+@snapshot_group.command(name="list")
+@require_permissions(administrator=True)
+async def snapshot_list(ctx):
+    """List saved snapshots, newest first."""
+    names = snapshot_files(ctx.guild.id)
+    if not names:
+        return await ctx.send("ℹ️ No snapshots saved for this server.")
+    await ctx.send(
+        "📚 Snapshots (newest first):\n" + "\n".join(f"`{n}`" for n in names)
+    )
+
+
+@snapshot_group.command(name="plan")
+@require_permissions(administrator=True)
+async def snapshot_plan(ctx, name: str = None):
+    """Show what restoring a snapshot would change."""
+    name, data = await load_guild_snapshot(ctx, name)
+    if data is None:
+        return
+    nodes = SnapshotRestore(ctx.guild, data).plan()
+    if not nodes:
+        return await ctx.send(f"✅ This server already matches snapshot `{name}`.")
+    await ctx.send(
+        embed=plan_embed(
+            f"🧮 Restore plan: {name}",
+            nodes,
+            f"Run `!snapshot restore {name}` to apply.",
+        )
+    )
+
+
+@snapshot_group.command(name="restore")
+@require_permissions(administrator=True)
+async def snapshot_restore(ctx, name: str = None):
+    """Recreate what is missing and revert what changed since a snapshot."""
+    name, data = await load_guild_snapshot(ctx, name)
+    if data is None:
+        return
+    nodes = SnapshotRestore(ctx.guild, data).plan()
+    if not nodes:
+        return await ctx.send(f"✅ This server already matches snapshot `{name}`.")
+
+    await ctx.send(
+        f"⚙️ Restoring snapshot `{name}`: {describe_plan_counts(count_plan(nodes))} "
+        f"(about {estimate_plan(nodes):.0f}s)..."
+    )
+    started = time.monotonic()
+    runner = SetupPlanRunner(ctx.guild, {}, persist=False)
+    await runner.run(nodes)
+    log_sink.post_line(
+        guild_config.log_channel(ctx.guild),
+        f"📸 Snapshot `{name}` restored by {ctx.author}: {runner.summary()} "
+        f"in {time.monotonic() - started:.1f}s.",
+    )
+    if runner.failed:
+        return await ctx.send(
+            "⚠️ Snapshot partly restored:\n"
+            + describe_plan_failures(runner.failed)
+            + f"\nRun `!snapshot restore {name}` again to retry what is left."
+        )
+    await ctx.send(f"✅ Snapshot `{name}` restored ({runner.summary()}).")
+
+
 # ---------------- ERROR HANDLING ----------------
 @add_role.error
 @add_text_channel.error
@@ -2938,21 +6262,121 @@ async def dynamic_error(ctx, error):
 # ==================== MODERATION COMMANDS ENDS====================
 
 
+# ---------------- Command Suggestions ----------------
+SUGGESTION_CACHE_TTL = 60.0  # seconds a looked-up token is remembered
+SUGGESTION_CACHE_SIZE = 1000
+
+
+def _edit_distance(a: str, b: str) -> int:
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(
+                min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb))
+            )
+        previous = current
+    return previous[-1]
+
+
+class CommandSuggester:
+    """BK-tree over command names, aliases and qualified subcommand names.
+
+    The tree is rebuilt only when the bot's command registry changes, so a
+    typo costs a handful of edit-distance checks instead of a difflib pass
+    over every command. Results per token (including "no match") are cached
+    for `SUGGESTION_CACHE_TTL` seconds to absorb typo spam.
+    """
+
+    def __init__(self):
+        self._tree = None  # [word, {distance: child}]
+        self._version = None
+        self._cache = {}  # token -> (expiry, suggestions)
+
+    def _build(self):
+        names = set()
+        for command in bot.walk_commands():
+            names.add(command.qualified_name)
+            parent = command.full_parent_name
+            for alias in command.aliases:
+                names.add(f"{parent} {alias}".strip())
+        self._tree = None
+        for name in sorted(names):
+            self._insert(name)
+        self._version = bot.registry_version
+        self._cache.clear()
+
+    def _insert(self, word):
+        if self._tree is None:
+            self._tree = [word, {}]
+            return
+        node = self._tree
+        while True:
+            d = _edit_distance(word, node[0])
+            if d == 0:
+                return
+            child = node[1].get(d)
+            if child is None:
+                node[1][d] = [word, {}]
+                return
+            node = child
+
+    def _search(self, word, max_distance):
+        found = []
+        stack = [self._tree] if self._tree else []
+        while stack:
+            name, children = stack.pop()
+            d = _edit_distance(word, name)
+            if d <= max_distance:
+                found.append((d, abs(len(name) - len(word)), name))
+            for dist, child in children.items():
+                if d - max_distance <= dist <= d + max_distance:
+                    stack.append(child)
+        return found
+
+    def suggest(self, *tokens, limit: int = 3) -> list:
+        """Closest command names for `tokens` (e.g. the first one or two words)."""
+        if self._version != bot.registry_version:
+            self._build()
+        key = " ".join(tokens).lower()
+        now = time.monotonic()
+        cached = self._cache.get(key)
+        if cached and cached[0] > now:
+            return cached[1]
+
+        found = []
+        for n in range(1, len(tokens) + 1):
+            word = " ".join(tokens[:n]).lower()
+            found += self._search(word, max(1, min(3, len(word) // 3)))
+        suggestions = [name for _, _, name in sorted(found)[:limit]]
+
+        if len(self._cache) >= SUGGESTION_CACHE_SIZE:
+            self._cache = {k: v for k, v in self._cache.items() if v[0] > now}
+        self._cache[key] = (now + SUGGESTION_CACHE_TTL, suggestions)
+        return suggestions
+
+
+command_suggester = CommandSuggester()
+
+
 # Global error handler
 @bot.event
 async def on_command_error(ctx, error):
     """Global error handler for incorrect commands and common issues."""
 
+    # BadArgument raised from inside a command body (e.g. massrole filters)
+    if isinstance(error, commands.CommandInvokeError) and isinstance(
+        error.original, commands.BadArgument
+    ):
+        error = error.original
+
     # Handle unknown command errors
     if isinstance(error, commands.CommandNotFound):
-        # Extract the command user tried
-        invalid_command = ctx.message.content.split()[0].replace(ctx.prefix, "")
-
-        # Get list of all available commands
-        all_commands = [cmd.name for cmd in bot.commands]
-
-        # Find the closest match (if any)
-        closest = get_close_matches(invalid_command, all_commands, n=1, cutoff=0.5)
+        # The word the user typed after the prefix, plus the next one so
+        # misspelt subcommands can be matched too
+        invalid_command = ctx.invoked_with
+        words = ctx.view.buffer[ctx.view.index :].split(maxsplit=1)[:1]
+        closest = command_suggester.suggest(invalid_command, *words, limit=1)
         suggestion = closest[0] if closest else None
 
         # Build a clean and friendly embed
@@ -3000,6 +6424,10 @@ async def on_command_error(ctx, error):
             f"⚠️ Missing argument: `{error.param.name}`.\nType `{ctx.prefix}help {ctx.command}` for usage info."
         )
 
+    # Handle unresolvable or ambiguous arguments (members, roles, filters)
+    elif isinstance(error, commands.BadArgument):
+        await ctx.send(f"⚠️ {error}")
+
     # Handle any other error gracefully
     else:
         print(f"[ERROR] {type(error).__name__}: {error}")
@@ -3008,6 +6436,356 @@ async def on_command_error(ctx, error):
         )
 
 
+# ------------------ Metrics ------------------
+# Prometheus text format on http://SX2_METRICS_HOST:SX2_METRICS_PORT/metrics.
+# Counters are plain dict increments; gauges are read only when scraped.
+METRICS_PORT = int(os.getenv("SX2_METRICS_PORT") or 0)  # 0 disables the endpoint
+METRICS_HOST = os.getenv("SX2_METRICS_HOST", "127.0.0.1")
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LOOP_LAG_INTERVAL = 1.0  # seconds between event-loop lag probes
+# Route segments followed by a free-form key rather than an ID
+METRICS_KEY_SEGMENTS = {
+    "invites": "{code}",
+    "templates": "{code}",
+    "reactions": "{emoji}",
+}
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _metric_labels(labels, extra=()) -> str:
+    pairs = tuple(labels) + tuple(extra)
+    if not pairs:
+        return ""
+    escaped = (
+        (k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in pairs
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+def metrics_route(path: str) -> str:
+    """REST path with variable segments replaced, e.g. /channels/{id}/messages.
+
+    IDs, tokens, invite/template codes and emoji are replaced and only
+    Discord's fixed lowercase segments survive, so the route label has a
+    bounded set of values.
+    """
+    parts = []
+    previous = None
+    for part in re.sub(r"^/api/v\d+", "", path).split("/"):
+        if previous in METRICS_KEY_SEGMENTS:
+            normalised = METRICS_KEY_SEGMENTS[previous]
+        elif part.isdigit():
+            normalised = "{id}"
+        elif len(part) > 32:
+            normalised = "{token}"  # webhook and interaction tokens
+        elif not re.fullmatch(r"[a-z0-9@._-]*", part):
+            normalised = "{key}"
+        else:
+            normalised = part
+        parts.append(normalised)
+        previous = part
+    return "/".join(parts)
+
+
+class Metrics:
+    """In-process metrics registry and a tiny HTTP endpoint serving it."""
+
+    def __init__(self):
+        self.meta = {}  # name -> (type, help)
+        self.counters = {}  # (name, labels) -> value
+        self.histograms = {}  # (name, labels) -> Histogram
+        self.gauges = []  # (name, callable -> number or [(labels, number)])
+        self.server = None
+        self.lag_task = None
+        self.last_lag = 0.0
+
+    def describe(self, name: str, kind: str, text: str):
+        self.meta[name] = (kind, text)
+
+    def inc(self, name: str, labels=(), value: float = 1):
+        key = (name, tuple(labels))
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, labels=()):
+        key = (name, tuple(labels))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram()
+        histogram.observe(value)
+
+    def gauge(self, name: str, text: str, read):
+        self.describe(name, "gauge", text)
+        self.gauges.append((name, read))
+
+    def render(self) -> str:
+        samples = {}  # name -> [line]
+        for (name, labels), value in self.counters.items():
+            samples.setdefault(name, []).append(
+                f"{name}{_metric_labels(labels)} {value}"
+            )
+        for (name, labels), hist in self.histograms.items():
+            lines = samples.setdefault(name, [])
+            running = 0
+            for bound, count in zip(hist.buckets + ("+Inf",), hist.counts):
+                running += count
+                le = _metric_labels(labels, (("le", bound),))
+                lines.append(f"{name}_bucket{le} {running}")
+            lines.append(f"{name}_sum{_metric_labels(labels)} {hist.sum:.6f}")
+            lines.append(f"{name}_count{_metric_labels(labels)} {hist.count}")
+        for name, read in self.gauges:
+            try:
+                value = read()
+            except Exception as e:
+                print(f"⚠️ Metric {name} failed: {e}")
+                continue
+            if isinstance(value, list):
+                samples[name] = [f"{name}{_metric_labels(l)} {v}" for l, v in value]
+            else:
+                samples[name] = [f"{name} {value}"]
+
+        out = []
+        for name, lines in samples.items():
+            kind, text = self.meta.get(name, ("untyped", name))
+            out.append(f"# HELP {name} {text}")
+            out.append(f"# TYPE {name} {kind}")
+            out.extend(lines)
+        return "\n".join(out) + "\n"
+
+    async def _handle(self, reader, writer):
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), 5)
+            method, _, rest = head.decode("latin-1").partition(" ")
+            path = rest.split(" ", 1)[0].split("?", 1)[0]
+            if method == "GET" and path in ("/", "/metrics"):
+                status, body = "200 OK", self.render().encode()
+                ctype = "text/plain; version=0.0.4; charset=utf-8"
+            else:
+                status, body, ctype = "404 Not Found", b"not found\n", "text/plain"
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: {ctype}\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode()
+                + body
+            )
+            await writer.drain()
+        except (
+            asyncio.TimeoutError,
+            asyncio.IncompleteReadError,
+            asyncio.LimitOverrunError,  # oversized request head
+            ConnectionError,
+        ):
+            pass
+        finally:
+            writer.close()
+
+    async def _watch_loop_lag(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(LOOP_LAG_INTERVAL)
+            lag = max(0.0, loop.time() - started - LOOP_LAG_INTERVAL)
+            self.last_lag = lag
+            self.observe("sx2_event_loop_lag_seconds", lag)
+
+    async def start(self, host: str, port: int):
+        if self.server is not None:
+            return
+        self.lag_task = asyncio.create_task(self._watch_loop_lag())
+        # Gateway events are only counted while the endpoint is enabled.
+        bot.add_listener(self._on_socket_event_type, "on_socket_event_type")
+        try:
+            self.server = await asyncio.start_server(self._handle, host, port)
+        except OSError as e:
+            print(f"⚠️ Metrics endpoint could not bind {host}:{port}: {e}")
+            return
+        print(f"📈 Metrics served on http://{host}:{port}/metrics")
+
+    async def stop(self):
+        if self.lag_task is not None:
+            self.lag_task.cancel()
+            self.lag_task = None
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+    async def _on_socket_event_type(self, event_type):
+        self.inc("sx2_gateway_events_total", (("event", event_type),))
+
+
+metrics = Metrics()
+metrics.describe("sx2_commands_total", "counter", "Command invocations by outcome.")
+metrics.describe(
+    "sx2_command_duration_seconds", "histogram", "Command run time in seconds."
+)
+metrics.describe(
+    "sx2_gateway_events_total", "counter", "Gateway dispatch events by type."
+)
+metrics.describe(
+    "sx2_http_requests_total", "counter", "Discord REST requests by route and status."
+)
+metrics.describe(
+    "sx2_http_ratelimited_total", "counter", "REST responses with status 429 by route."
+)
+metrics.describe(
+    "sx2_http_request_duration_seconds", "histogram", "REST request time by route."
+)
+metrics.describe(
+    "sx2_event_loop_lag_seconds", "histogram", "Delay of a 1s sleep on the event loop."
+)
+
+
+@bot.listen("on_command")
+async def _metrics_command_started(ctx):
+    ctx.metrics_started = time.perf_counter()
+
+
+def _record_command(ctx, status: str):
+    name = ctx.command.qualified_name if ctx.command else "unknown"
+    metrics.inc("sx2_commands_total", (("command", name), ("status", status)))
+    started = getattr(ctx, "metrics_started", None)
+    if started is not None:
+        metrics.observe(
+            "sx2_command_duration_seconds",
+            time.perf_counter() - started,
+            (("command", name),),
+        )
+
+
+@bot.listen("on_command_completion")
+async def _metrics_command_completed(ctx):
+    _record_command(ctx, "ok")
+
+
+@bot.listen("on_command_error")
+async def _metrics_command_failed(ctx, error):
+    if isinstance(error, commands.CommandNotFound):
+        metrics.inc(
+            "sx2_commands_total", (("command", "unknown"), ("status", "not_found"))
+        )
+    else:
+        _record_command(ctx, "error")
+
+
+async def _trace_request_start(session, context, params):
+    context.started = time.perf_counter()
+
+
+async def _trace_request_end(session, context, params):
+    route = metrics_route(params.url.path)
+    status = params.response.status
+    metrics.inc(
+        "sx2_http_requests_total",
+        (("method", params.method), ("route", route), ("status", status)),
+    )
+    if status == 429:
+        metrics.inc("sx2_http_ratelimited_total", (("route", route),))
+    metrics.observe(
+        "sx2_http_request_duration_seconds",
+        time.perf_counter() - context.started,
+        (("route", route),),
+    )
+
+
+async def _trace_request_exception(session, context, params):
+    route = metrics_route(params.url.path)
+    metrics.inc(
+        "sx2_http_requests_total",
+        (("method", params.method), ("route", route), ("status", "error")),
+    )
+
+
+http_trace.on_request_start.append(_trace_request_start)
+http_trace.on_request_end.append(_trace_request_end)
+http_trace.on_request_exception.append(_trace_request_exception)
+
+
+def _scheduler_overdue():
+    now = time.time()
+    return sum(1 for job in scheduler.jobs.values() if job["run_at"] <= now)
+
+
+def _log_buffered():
+    return log_sink.queue_depth
+
+
+metrics.gauge("sx2_guilds", "Guilds the bot is in.", lambda: bot_stats.guilds)
+metrics.gauge("sx2_users", "Members across all guilds.", lambda: bot_stats.users)
+metrics.gauge(
+    "sx2_gateway_latency_seconds", "Heartbeat latency.", lambda: f"{bot.latency:.4f}"
+)
+metrics.gauge(
+    "sx2_event_loop_lag_last_seconds",
+    "Most recent event-loop lag probe.",
+    lambda: f"{metrics.last_lag:.4f}",
+)
+metrics.gauge(
+    "sx2_resource_percent",
+    "Latest sampled host CPU and RAM usage.",
+    lambda: (
+        [
+            ((("resource", "cpu"),), bot_stats.snapshot["cpu"]),
+            ((("resource", "ram"),), bot_stats.snapshot["ram"]),
+        ]
+        if bot_stats.snapshot
+        else []
+    ),
+)
+metrics.gauge(
+    "sx2_queue_depth",
+    "Items waiting in the bot's work queues.",
+    lambda: [
+        ((("queue", "dm"),), dm_dispatcher.queue.qsize() if dm_dispatcher.queue else 0),
+        ((("queue", "mod_log"),), _log_buffered()),
+        ((("queue", "role_edits"),), len(role_edits.pending)),
+        ((("queue", "guild_chunks"),), len(chunk_queue.pending)),
+        ((("queue", "journal"),), len(journal.pending)),
+        ((("queue", "conversations"),), len(conversations.pending)),
+    ],
+)
+metrics.gauge(
+    "sx2_scheduler_jobs",
+    "Scheduled expiry jobs, and how many are already due.",
+    lambda: [
+        ((("state", "pending"),), len(scheduler.jobs)),
+        ((("state", "overdue"),), _scheduler_overdue()),
+    ],
+)
+metrics.gauge(
+    "sx2_bulk_role_jobs", "Mass role jobs in progress.", lambda: len(bulk_roles.jobs)
+)
+metrics.gauge(
+    "sx2_cache_entries",
+    "Entries held by the bot's caches and indexes.",
+    lambda: [
+        ((("cache", "users"),), len(bot.users)),
+        ((("cache", "member_lru"),), len(member_fetcher.cache)),
+        ((("cache", "help_pages"),), len(help_catalog.pages)),
+        ((("cache", "command_suggestions"),), len(command_suggester._cache)),
+        ((("cache", "name_index_guilds"),), len(name_index._guilds)),
+        ((("cache", "member_index_guilds"),), len(member_index._guilds)),
+        ((("cache", "ban_index_guilds"),), len(ban_index._guilds)),
+        ((("cache", "dm_closed"),), len(dm_dispatcher.closed)),
+    ],
+)
+
+
+startup.mark("module initialised")
+
 # ------------------ Run Bot ------------------
 
 